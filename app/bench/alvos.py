@@ -0,0 +1,214 @@
+"""alvos.py
+
+Contém os alvos locais usados pelo benchmark, que substituem os serviços reais:
+
+    - um servidor HTTP com rotas rápidas (/fast), lentas (/slow), com erro (/error),
+      que nunca respondem (/hang), com corpo enorme (/huge) e no formato do teste SIZE (/size);
+    - stubs da api de webhooks do discord e da api da statuspage, no mesmo servidor;
+    - portas TCP aberta (aceita e fecha a conexão), fechada (recusa a conexão) e
+      filtrada (a fila de conexões está cheia, então os SYNs são descartados e o connect
+      somente termina pelo timeout).
+
+Pode ser executado sozinho (`python bench/alvos.py`), e imprime um JSON com os endereços
+dos alvos, usado pelo gerador de configurações.
+"""
+import sys
+import json
+import random
+import socket
+import asyncio
+import argparse
+from aiohttp import web
+
+from typing import Dict, List, Optional
+
+TAMANHO_HUGE = 8 * 1024 * 1024      # tamanho (bytes) do corpo de /huge
+ESPERA_SLOW = 0.5                   # espera (s) de /slow
+ESPERA_HANG = 3600                  # espera (s) de /hang
+
+
+class Contadores:
+    """Quantidade de requests recebidos em cada rota"""
+
+    def __init__(self):
+        self.valores: Dict[str, int] = {}
+
+    def somar(self, rota: str):
+        self.valores[rota] = self.valores.get(rota, 0) + 1
+
+
+def criar_app(contadores: Optional[Contadores] = None) -> web.Application:
+    """Cria a aplicação com as rotas HTTP e os stubs do discord e da statuspage"""
+    contadores = contadores if contadores is not None else Contadores()
+
+    async def fast(request: web.Request) -> web.Response:
+        contadores.somar('fast')
+        return web.Response(text='ok')
+
+    async def slow(request: web.Request) -> web.Response:
+        contadores.somar('slow')
+        await asyncio.sleep(float(request.query.get('delay', ESPERA_SLOW)))
+        return web.Response(text='ok')
+
+    async def error(request: web.Request) -> web.Response:
+        contadores.somar('error')
+        return web.Response(status=500, text='erro')
+
+    async def hang(request: web.Request) -> web.Response:
+        contadores.somar('hang')
+        await asyncio.sleep(ESPERA_HANG)
+        return web.Response(text='ok')
+
+    async def huge(request: web.Request) -> web.StreamResponse:
+        contadores.somar('huge')
+        resposta = web.StreamResponse()
+        resposta.content_length = TAMANHO_HUGE
+        await resposta.prepare(request)
+        bloco = b'x' * 65536
+        try:
+            for _ in range(TAMANHO_HUGE // len(bloco)):
+                await resposta.write(bloco)
+        except (ConnectionError, asyncio.CancelledError):
+            # o cliente fecha a conexão ao passar do limite de corpo
+            pass
+        return resposta
+
+    async def size(request: web.Request) -> web.Response:
+        contadores.somar('size')
+        return web.json_response({'porcentagem': random.uniform(0, 1)})
+
+    async def discord(request: web.Request) -> web.Response:
+        contadores.somar('discord')
+        await request.read()
+        # com `wait=true` (como o discord_webhook envia), o Discord responde com a mensagem criada
+        return web.json_response({'id': '0', 'type': 0, 'content': '', 'channel_id': '0'})
+
+    async def statuspage(request: web.Request) -> web.Response:
+        contadores.somar('statuspage')
+        await request.read()
+        return web.json_response({'id': request.match_info['componente']})
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(contadores.valores)
+
+    app = web.Application()
+    app.router.add_route('*', '/fast', fast)
+    app.router.add_route('*', '/slow', slow)
+    app.router.add_route('*', '/error', error)
+    app.router.add_route('*', '/hang', hang)
+    app.router.add_route('*', '/huge', huge)
+    app.router.add_route('*', '/size', size)
+    app.router.add_post('/api/webhooks/{ident}/{token}', discord)
+    app.router.add_put('/v1/pages/{pagina}/components/{componente}', statuspage)
+    app.router.add_get('/stats', stats)
+    return app
+
+
+def _porta_fechada() -> socket.socket:
+    """Socket associado a uma porta sem listen: connects são recusados (RST).
+    O socket deve ficar aberto para que a porta não seja usada por outro processo
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    return sock
+
+
+def _porta_filtrada() -> List[socket.socket]:
+    """Porta com a fila de conexões cheia e que nunca aceita conexões: os novos SYNs
+    são descartados pelo kernel, como em uma porta filtrada por um firewall
+
+    Returns:
+        O socket em listen seguido dos sockets que ocupam a fila (devem ficar abertos)
+    """
+    servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    servidor.bind(('127.0.0.1', 0))
+    servidor.listen(0)
+    sockets = [servidor]
+    # com backlog 0, o Linux aceita uma conexão na fila; as seguintes ficam sem resposta
+    for _ in range(2):
+        cliente = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        cliente.setblocking(False)
+        cliente.connect_ex(servidor.getsockname())
+        sockets.append(cliente)
+    return sockets
+
+
+class Alvos:
+    """Todos os alvos locais do benchmark"""
+
+    def __init__(self, host: str = '127.0.0.1', porta_http: int = 0):
+        """Inicializa os alvos, sem iniciá-los
+
+        Args:
+            host (str): endereço do servidor HTTP
+            porta_http (int): porta do servidor HTTP. Default (0) é uma porta livre
+        """
+        self.host: str = host
+        self.porta_http: int = porta_http
+        self.contadores: Contadores = Contadores()
+        self._runner: Optional[web.AppRunner] = None
+        self._servidor_aberto: Optional[asyncio.AbstractServer] = None
+        self._sockets: List[socket.socket] = []
+        self.enderecos: Dict[str, object] = {}
+
+    async def iniciar(self) -> Dict[str, object]:
+        """Inicia os alvos
+
+        Returns:
+            Os endereços de cada alvo
+        """
+        self._runner = web.AppRunner(criar_app(self.contadores), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.porta_http, backlog=4096)
+        await site.start()
+        porta_http = self._runner.addresses[0][1]
+
+        async def aceitar(_leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+            escritor.close()
+
+        self._servidor_aberto = await asyncio.start_server(aceitar, '127.0.0.1', 0, backlog=4096)
+        fechada = _porta_fechada()
+        filtradas = _porta_filtrada()
+        self._sockets = [fechada] + filtradas
+
+        base = f'http://{self.host}:{porta_http}'
+        self.enderecos = {
+            'http': base,
+            'discord': f'{base}/api/webhooks',
+            'statuspage': f'{base}/v1',
+            'port_open': ['127.0.0.1', self._servidor_aberto.sockets[0].getsockname()[1]],
+            'port_closed': ['127.0.0.1', fechada.getsockname()[1]],
+            'port_filtered': ['127.0.0.1', filtradas[0].getsockname()[1]],
+        }
+        return self.enderecos
+
+    async def parar(self):
+        """Para todos os alvos"""
+        if self._servidor_aberto is not None:
+            self._servidor_aberto.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+        for sock in self._sockets:
+            sock.close()
+        self._sockets = []
+
+
+async def _executar(host: str, porta: int):
+    alvos = Alvos(host, porta)
+    enderecos = await alvos.iniciar()
+    print(json.dumps(enderecos), flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await alvos.parar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alvos locais do benchmark")
+    parser.add_argument('--host', default='127.0.0.1', help="endereço do servidor HTTP")
+    parser.add_argument('--port', type=int, default=0, help="porta do servidor HTTP (0 é uma porta livre)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_executar(args.host, args.port))
+    except KeyboardInterrupt:
+        sys.exit(0)
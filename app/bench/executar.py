@@ -0,0 +1,311 @@
+"""executar.py
+
+Contém o benchmark do monitor completo (agendamento, testes, redis, notificações e métricas).
+
+Para cada quantidade de módulos pedida, o benchmark:
+
+    1. inicia os alvos locais (ver alvos.py) e um redis falso (fakeredis), caso nenhum seja fornecido;
+    2. gera um config.toml (ver gerar.py) em um diretório temporário;
+    3. executa o monitor (`src/main.py`) nesse diretório, com o log em `monitor.log`;
+    4. espera todos os módulos serem testados ao menos uma vez, e mais um intervalo de aquecimento;
+    5. lê as métricas do monitor no início e no fim da medição, e o RSS e a quantidade de threads
+       (somando todos os processos do monitor) durante a medição.
+
+O relatório contém, por rodada: testes por segundo (e o esperado pela configuração), atraso do
+agendamento (p50, p99 e máximo entre os módulos), p99 da duração dos testes, uso de CPU, RSS
+máximo e quantidade máxima de threads, além dos requests recebidos pelos stubs do discord e da statuspage.
+
+O RSS, as threads e a CPU são lidos do /proc, então somente funcionam no Linux.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from prometheus_client.parser import text_string_to_metric_families
+
+from gerar import gerar, MISTURA_PADRAO, ler_mistura
+
+from typing import Dict, List, Optional, Tuple
+
+_DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+_MAIN = os.path.join(_DIRETORIO, '..', 'src', 'main.py')
+
+
+def _porta_livre() -> int:
+    """Porta TCP livre no momento"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _iniciar_redis() -> Tuple[str, object]:
+    """Inicia um redis falso (fakeredis) em uma thread
+
+    Returns:
+        O endereço (host:porta) e o servidor
+    """
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit("fakeredis não está instalado: instale requirements-dev.txt ou use --redis")
+    porta = _porta_livre()
+    servidor = TcpFakeServer(('127.0.0.1', porta), server_type='redis')
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return f'127.0.0.1:{porta}', servidor
+
+
+def _iniciar_alvos() -> Tuple[subprocess.Popen, Dict[str, object]]:
+    """Inicia os alvos locais em outro processo
+
+    Returns:
+        O processo e os endereços dos alvos
+    """
+    processo = subprocess.Popen([sys.executable, os.path.join(_DIRETORIO, 'alvos.py')],
+                                stdout=subprocess.PIPE, text=True)
+    linha = processo.stdout.readline()
+    if not linha:
+        sys.exit("Os alvos locais não puderam ser iniciados")
+    return processo, json.loads(linha)
+
+
+def _ler_url(url: str, timeout: float = 10) -> Optional[str]:
+    """Conteúdo de uma url, ou None em caso de erro"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resposta:
+            return resposta.read().decode()
+    except OSError:
+        return None
+
+
+def _processos(raiz: int) -> List[int]:
+    """Pid do processo e de todos os seus descendentes"""
+    filhos: Dict[int, List[int]] = {}
+    for nome in os.listdir('/proc'):
+        if not nome.isdigit():
+            continue
+        try:
+            with open(f'/proc/{nome}/stat') as f:
+                # o nome do processo (entre parênteses) pode conter espaços
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(nome))
+    pids, pendentes = [], [raiz]
+    while pendentes:
+        pid = pendentes.pop()
+        pids.append(pid)
+        pendentes.extend(filhos.get(pid, []))
+    return pids
+
+
+def _recursos(raiz: int) -> Tuple[int, int, float]:
+    """RSS (bytes), threads e tempo de CPU (s) somando o processo e os seus descendentes"""
+    rss, threads, cpu = 0, 0, 0.0
+    tick = os.sysconf('SC_CLK_TCK')
+    for pid in _processos(raiz):
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for linha in f:
+                    if linha.startswith('VmRSS:'):
+                        rss += int(linha.split()[1]) * 1024
+                    elif linha.startswith('Threads:'):
+                        threads += int(linha.split()[1])
+            with open(f'/proc/{pid}/stat') as f:
+                campos = f.read().rsplit(')', 1)[1].split()
+                cpu += (int(campos[11]) + int(campos[12])) / tick
+        except (OSError, IndexError, ValueError):
+            continue
+    return rss, threads, cpu
+
+
+class _Amostra:
+    """Métricas do monitor em um instante"""
+
+    def __init__(self, texto: str):
+        self.testes: float = 0
+        self.testados: int = 0
+        self.buckets: Dict[float, float] = {}
+        self.atrasos: List[float] = []
+        for familia in text_string_to_metric_families(texto):
+            if familia.name == 'monitor_test_duration_seconds':
+                for s in familia.samples:
+                    if s.name.endswith('_count'):
+                        self.testes += s.value
+                        self.testados += s.value > 0
+                    elif s.name.endswith('_bucket'):
+                        limite = float(s.labels['le'])
+                        self.buckets[limite] = self.buckets.get(limite, 0) + s.value
+            elif familia.name == 'monitor_schedule_lag':
+                self.atrasos = [s.value for s in familia.samples]
+
+
+def _coletar(url: str) -> Tuple[_Amostra, float]:
+    """Lê as métricas do monitor
+
+    Returns:
+        A amostra e o instante (monotonic) que ela representa: o meio da leitura, pois
+        com muitos módulos a geração das métricas leva alguns segundos
+    """
+    antes = time.monotonic()
+    texto = _ler_url(url, timeout=60) or ''
+    return _Amostra(texto), (antes + time.monotonic()) / 2
+
+
+def _percentil(valores: List[float], fracao: float) -> Optional[float]:
+    """Percentil de uma lista de valores"""
+    if not valores:
+        return None
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(fracao * len(valores)))]
+
+
+def _percentil_histograma(inicio: _Amostra, fim: _Amostra, fracao: float) -> Optional[float]:
+    """Limite superior do bucket com o percentil das durações observadas entre as duas amostras"""
+    limites = sorted(fim.buckets)
+    diferencas = [fim.buckets[b] - inicio.buckets.get(b, 0) for b in limites]
+    if not diferencas or diferencas[-1] <= 0:
+        return None
+    alvo = fracao * diferencas[-1]
+    for limite, acumulado in zip(limites, diferencas):
+        if acumulado >= alvo:
+            return limite
+    return None
+
+
+def rodada(modulos: int, args: argparse.Namespace, enderecos: Dict[str, object], redis: str,
+           diretorio: str) -> Dict[str, object]:
+    """Executa o monitor com uma quantidade de módulos e mede o seu desempenho
+
+    Returns:
+        O resultado da rodada
+    """
+    porta = _porta_livre()
+    with open(os.path.join(diretorio, 'config.toml'), 'w') as f:
+        f.write(gerar(modulos, enderecos, redis, args.interval, args.concurrency, args.workers,
+                      porta, args.timeout, args.mix, args.seed))
+
+    url_metricas = f'http://127.0.0.1:{porta}/metrics'
+    contadores_antes = json.loads(_ler_url(f'{enderecos["http"]}/stats') or '{}')
+    with open(os.path.join(diretorio, 'monitor.log'), 'w') as log:
+        monitor = subprocess.Popen([sys.executable, os.path.abspath(_MAIN)], cwd=diretorio,
+                                   stdout=log, stderr=subprocess.STDOUT)
+    try:
+        # aquecimento: o primeiro teste de cada módulo acontece em algum momento do primeiro intervalo
+        # após o módulo ser carregado, então a medição somente começa após todos terem sido testados
+        limite_inicio = time.monotonic() + 60 + 10 * args.interval
+        while True:
+            texto = _ler_url(url_metricas)
+            if texto is not None and _Amostra(texto).testados >= modulos:
+                break
+            if monitor.poll() is not None or time.monotonic() > limite_inicio:
+                raise RuntimeError(f"O monitor não iniciou os testes (ver {diretorio}/monitor.log)")
+            time.sleep(1)
+        time.sleep(args.warmup if args.warmup is not None else args.interval)
+
+        inicio, _, cpu_inicio = _recursos(monitor.pid)
+        amostra_inicio, instante_inicio = _coletar(url_metricas)
+        rss_max, threads_max = 0, 0
+        while time.monotonic() - instante_inicio < args.duration:
+            if monitor.poll() is not None:
+                raise RuntimeError(f"O monitor terminou (ver {diretorio}/monitor.log)")
+            rss, threads, _ = _recursos(monitor.pid)
+            rss_max, threads_max = max(rss_max, rss), max(threads_max, threads)
+            time.sleep(args.sample)
+        amostra_fim, instante_fim = _coletar(url_metricas)
+        _, _, cpu_fim = _recursos(monitor.pid)
+    finally:
+        monitor.terminate()
+        try:
+            monitor.wait(15)
+        except subprocess.TimeoutExpired:
+            monitor.kill()
+            monitor.wait()
+
+    segundos = instante_fim - instante_inicio
+    contadores = json.loads(_ler_url(f'{enderecos["http"]}/stats') or '{}')
+    return {
+        'modules': modulos,
+        'workers': args.workers,
+        'seconds': round(segundos, 1),
+        'probes_per_second': round((amostra_fim.testes - amostra_inicio.testes) / segundos, 1),
+        'expected_probes_per_second': round(modulos / args.interval, 1),
+        'schedule_lag_p50': _percentil(amostra_fim.atrasos, 0.5),
+        'schedule_lag_p99': _percentil(amostra_fim.atrasos, 0.99),
+        'schedule_lag_max': max(amostra_fim.atrasos, default=None),
+        'duration_p99': _percentil_histograma(amostra_inicio, amostra_fim, 0.99),
+        'cpu_percent': round(100 * (cpu_fim - cpu_inicio) / segundos, 1),
+        'rss_max_mb': round(max(rss_max, inicio) / 2 ** 20, 1),
+        'threads_max': threads_max,
+        'discord_requests': contadores.get('discord', 0) - contadores_antes.get('discord', 0),
+        'statuspage_requests': contadores.get('statuspage', 0) - contadores_antes.get('statuspage', 0),
+    }
+
+
+def _formatar(valor: object) -> str:
+    if valor is None:
+        return '-'
+    if isinstance(valor, float):
+        return f'{valor:.3f}' if valor < 10 else f'{valor:.1f}'
+    return str(valor)
+
+
+def imprimir(resultados: List[Dict[str, object]]):
+    """Imprime os resultados em uma tabela"""
+    if not resultados:
+        return
+    colunas = list(resultados[0])
+    linhas = [colunas] + [[_formatar(r[c]) for c in colunas] for r in resultados]
+    larguras = [max(len(linha[i]) for linha in linhas) for i in range(len(colunas))]
+    for linha in linhas:
+        print('  '.join(v.rjust(larguras[i]) for i, v in enumerate(linha)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark do monitor com alvos locais")
+    parser.add_argument('--modules', type=int, nargs='+', default=[100, 1000, 10000],
+                        help="quantidades de módulos (uma rodada para cada)")
+    parser.add_argument('--interval', type=float, default=30, help="intervalo (s) dos testes")
+    parser.add_argument('--concurrency', type=int, default=1000, help="testes simultâneos por processo")
+    parser.add_argument('--workers', type=int, default=1, help="processos que executam os testes")
+    parser.add_argument('--timeout', type=float, default=5, help="tempo (s) máximo de cada teste")
+    parser.add_argument('--warmup', type=float, help="aquecimento (s) antes da medição. Default é um intervalo")
+    parser.add_argument('--duration', type=float, default=60, help="duração (s) da medição")
+    parser.add_argument('--sample', type=float, default=1, help="intervalo (s) entre as leituras de RSS e threads")
+    parser.add_argument('--mix', type=ler_mistura, default=dict(MISTURA_PADRAO),
+                        help="pesos dos alvos, como fast=90,hang=10")
+    parser.add_argument('--seed', type=int, default=0, help="semente do sorteio dos alvos")
+    parser.add_argument('--redis', help="endereço (host:porta) de um redis. Default é um fakeredis local")
+    parser.add_argument('--keep', action='store_true', help="mantém os diretórios com a config e o log")
+    parser.add_argument('--json', action='store_true', help="imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    redis, _servidor_redis = (args.redis, None) if args.redis else _iniciar_redis()
+    alvos, _enderecos = _iniciar_alvos()
+    resultados = []
+    try:
+        for _modulos in args.modules:
+            _diretorio = tempfile.mkdtemp(prefix=f'bench-{_modulos}-')
+            try:
+                resultados.append(rodada(_modulos, args, _enderecos, redis, _diretorio))
+            finally:
+                if not args.keep:
+                    shutil.rmtree(_diretorio, ignore_errors=True)
+            if not args.json:
+                print(f"Rodada com {_modulos} módulos terminada", file=sys.stderr)
+    finally:
+        alvos.terminate()
+        alvos.wait()
+        if _servidor_redis is not None:
+            _servidor_redis.shutdown()
+
+    if args.json:
+        print(json.dumps(resultados, indent=2))
+    else:
+        imprimir(resultados)
@@ -0,0 +1,165 @@
+"""gerar.py
+
+Contém o gerador de arquivos config.toml para o benchmark, com uma quantidade
+qualquer de módulos (de 100 a 50 mil, ou mais) apontando para os alvos locais.
+
+Os tipos de alvo são sorteados com os pesos de MISTURA_PADRAO (ou os fornecidos),
+e cada módulo HTTP/SIZE usa uma url própria (`?m=<índice>`), de forma que nenhum
+teste é igual a outro.
+"""
+import sys
+import json
+import random
+import argparse
+
+from typing import Dict, List, Optional
+
+# pesos de cada tipo de alvo
+MISTURA_PADRAO: Dict[str, float] = {
+    'fast': 50,
+    'slow': 10,
+    'error': 10,
+    'hang': 2,
+    'huge': 3,
+    'size': 10,
+    'port_open': 10,
+    'port_closed': 3,
+    'port_filtered': 2,
+}
+
+_ROTAS_HTTP = ('fast', 'slow', 'error', 'hang', 'huge')
+
+
+def _texto(valor: str) -> str:
+    """String no formato do TOML"""
+    return json.dumps(valor)
+
+
+def _modulo(indice: int, tipo: str, enderecos: Dict[str, object]) -> List[str]:
+    """Linhas do TOML de um módulo"""
+    linhas = [
+        '[[modules]]',
+        f'    name = "bench-{indice:05d}-{tipo}"',
+        f'    statuspage_id = "componente-{indice}"',
+        '    notify = ["1"]',
+        '[[modules.test]]',
+    ]
+    if tipo in _ROTAS_HTTP or tipo == 'size':
+        url = f"{enderecos['http']}/{tipo}?m={indice}"
+        linhas += [
+            f'    type = "{"size" if tipo == "size" else "http"}"',
+            f'    url = {_texto(url)}',
+            '    method = "get"',
+        ]
+    else:
+        host, porta = enderecos[tipo]
+        linhas += [
+            '    type = "port"',
+            f'    host = {_texto(host)}',
+            f'    port = {porta}',
+        ]
+    return linhas
+
+
+def gerar(modulos: int,
+          enderecos: Dict[str, object],
+          redis: str = '127.0.0.1:6379',
+          intervalo: float = 30,
+          concorrencia: int = 1000,
+          trabalhadores: int = 1,
+          porta_metricas: int = 2112,
+          timeout: float = 5,
+          mistura: Optional[Dict[str, float]] = None,
+          semente: int = 0) -> str:
+    """Gera o conteúdo de um config.toml
+
+    Args:
+        modulos (int): quantidade de módulos
+        enderecos (Dict[str, object]): endereços dos alvos (ver alvos.Alvos.iniciar)
+        redis (str): endereço (host:porta) do redis
+        intervalo (float): intervalo (em segundos) dos testes
+        concorrencia (int): quantidade máxima de testes executando ao mesmo tempo (por processo)
+        trabalhadores (int): quantidade de processos que executam os testes
+        porta_metricas (int): porta do servidor de métricas
+        timeout (float): tempo (em segundos) máximo de cada teste
+        mistura (Dict[str, float], optional): peso de cada tipo de alvo. Default é MISTURA_PADRAO
+        semente (int): semente do sorteio dos tipos, para configurações reproduzíveis
+
+    Returns:
+        O conteúdo do arquivo
+    """
+    mistura = mistura if mistura is not None else MISTURA_PADRAO
+    tipos = [t for t, peso in mistura.items() if peso > 0]
+    pesos = [mistura[t] for t in tipos]
+    sorteio = random.Random(semente)
+    redis_host, redis_porta = redis.rsplit(':', 1)
+
+    linhas = [
+        'version = 1.0',
+        f'interval = {intervalo}',
+        f'port = {porta_metricas}',
+        f'concurrency = {concorrencia}',
+        f'workers = {trabalhadores}',
+        'jitter = 0',
+        'reload_interval = 3600',
+        '',
+        '[statuspage]',
+        '    apikey = "bench"',
+        '    pageid = "bench"',
+        f'    url = {_texto(enderecos["statuspage"])}',
+        '',
+        '[discord]',
+        '    role_id = "bench"',
+        '    id = "bench"',
+        '    token = "bench"',
+        f'    url = {_texto(enderecos["discord"])}',
+        '',
+        '[redis]',
+        f'    host = {_texto(redis_host)}',
+        f'    port = {int(redis_porta)}',
+        '',
+        '[http]',
+        f'    pool_size = {max(100, concorrencia)}',
+        '    pool_size_per_host = 0',
+        f'    timeout = {timeout}',
+        f'    connect_timeout = {timeout}',
+        '',
+        '[metrics]',
+        f'    max_series = {modulos * 40 + 1000}',
+        '',
+    ]
+    for i, tipo in enumerate(sorteio.choices(tipos, pesos, k=modulos)):
+        linhas += _modulo(i, tipo, enderecos)
+        linhas.append('')
+    return '\n'.join(linhas)
+
+
+def ler_mistura(texto: str) -> Dict[str, float]:
+    """Lê uma mistura no formato `tipo=peso,tipo=peso`"""
+    mistura = {t: 0.0 for t in MISTURA_PADRAO}
+    for parte in texto.split(','):
+        tipo, peso = parte.split('=')
+        if tipo not in MISTURA_PADRAO:
+            raise argparse.ArgumentTypeError(f"tipo de alvo desconhecido: {tipo}")
+        mistura[tipo] = float(peso)
+    return mistura
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um config.toml para o benchmark")
+    parser.add_argument('modules', type=int, help="quantidade de módulos")
+    parser.add_argument('targets', help="arquivo JSON com os endereços dos alvos (saída de alvos.py)")
+    parser.add_argument('--redis', default='127.0.0.1:6379', help="endereço (host:porta) do redis")
+    parser.add_argument('--interval', type=float, default=30, help="intervalo (s) dos testes")
+    parser.add_argument('--concurrency', type=int, default=1000, help="testes simultâneos por processo")
+    parser.add_argument('--workers', type=int, default=1, help="processos que executam os testes")
+    parser.add_argument('--port', type=int, default=2112, help="porta do servidor de métricas")
+    parser.add_argument('--timeout', type=float, default=5, help="tempo (s) máximo de cada teste")
+    parser.add_argument('--mix', type=ler_mistura, help="pesos dos alvos, como fast=90,hang=10")
+    parser.add_argument('--seed', type=int, default=0, help="semente do sorteio dos alvos")
+    args = parser.parse_args()
+
+    with open(args.targets) as f:
+        _enderecos = json.load(f)
+    sys.stdout.write(gerar(args.modules, _enderecos, args.redis, args.interval, args.concurrency,
+                           args.workers, args.port, args.timeout, args.mix, args.seed))
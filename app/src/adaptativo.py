@@ -0,0 +1,88 @@
+"""adaptativo.py
+
+Contém a implementação da FrequenciaAdaptativa, que ajusta o intervalo de cada módulo
+de acordo com a estabilidade do seu status.
+
+Enquanto o módulo está disponível e o status não muda, o intervalo é multiplicado por
+`factor` a cada `stable_probes` testes, até `max_interval`. Quando um teste encontra o
+módulo indisponível, o intervalo volta imediatamente para o mais rápido (`fast_interval`,
+ou o intervalo do módulo) até que ele se recupere, quando volta ao intervalo do módulo e
+recomeça a espaçar os testes. Testes sem resultado (UNKNOWN) não alteram o intervalo.
+"""
+from enums import Status
+from historico import DISPONIVEIS
+from models import ConfigAdaptativo
+from prom import TipoPrometheus, Prometheus
+
+from typing import Dict, Hashable, Optional
+
+
+class _Estado:
+    """Intervalo atual e status recente de um módulo"""
+    __slots__ = ('intervalo', 'status', 'estaveis')
+
+    def __init__(self, intervalo: float):
+        self.intervalo: float = intervalo
+        self.status: Optional[Status] = None
+        self.estaveis: int = 0
+
+
+class FrequenciaAdaptativa:
+    """Intervalo adaptativo de cada módulo"""
+
+    def __init__(self, config: ConfigAdaptativo):
+        """Inicializa sem módulos
+
+        Args:
+            config (ConfigAdaptativo): configurações do intervalo adaptativo
+        """
+        self.config: ConfigAdaptativo = config
+        self._estados: Dict[Hashable, _Estado] = {}
+
+    def intervalo(self, chave: Hashable) -> Optional[float]:
+        """Intervalo atual de um módulo, ou None caso ele ainda não tenha testes"""
+        estado = self._estados.get(chave)
+        return estado.intervalo if estado is not None else None
+
+    def registrar(self, chave: Hashable, nome: str, status: Optional[Status], intervalo: float) -> Optional[float]:
+        """Registra o resultado de um teste, calculando o próximo intervalo do módulo
+
+        Args:
+            chave (Hashable): identificador do módulo (como o seu testador)
+            nome (str): nome do módulo, para as métricas
+            status (Status, optional): status do teste
+            intervalo (float): intervalo (em segundos) configurado para o módulo
+
+        Returns:
+            O novo intervalo (em segundos), ou None caso o intervalo não mude
+        """
+        estado = self._estados.get(chave)
+        if estado is None:
+            estado = self._estados[chave] = _Estado(intervalo)
+        if status is None or status == Status.UNKNOWN:
+            return None
+
+        anterior = estado.intervalo
+        rapido = min(self.config.intervalo_rapido or intervalo, intervalo)
+        if status not in DISPONIVEIS:
+            # falha: testa no intervalo mais rápido até o módulo se recuperar
+            estado.intervalo, estado.estaveis = rapido, 0
+        elif estado.status is not None and estado.status not in DISPONIVEIS:
+            # recuperado: volta ao intervalo do módulo
+            estado.intervalo, estado.estaveis = intervalo, 0
+        elif status == estado.status:
+            estado.estaveis += 1
+            if estado.estaveis >= self.config.estaveis:
+                maximo = max(self.config.intervalo_maximo, intervalo)
+                estado.intervalo, estado.estaveis = min(estado.intervalo * self.config.fator, maximo), 0
+        else:
+            # mudou entre status disponíveis (como de operacional para degradado)
+            estado.intervalo, estado.estaveis = min(estado.intervalo, intervalo), 0
+        estado.status = status
+
+        Prometheus.get(TipoPrometheus.PROBE_INTERVAL, nome).set(estado.intervalo)
+        return estado.intervalo if estado.intervalo != anterior else None
+
+    def esquecer(self, chave: Hashable):
+        """Descarta o estado de um módulo"""
+        self._estados.pop(chave, None)
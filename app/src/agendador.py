@@ -0,0 +1,115 @@
+"""agendador.py
+
+Contém a implementação do Agendador, uma fila de prioridade (heap) com
+os próximos prazos de execução de cada testador.
+
+Cada testador possui o seu próprio intervalo. Os prazos são calculados a partir
+de uma base que avança exatamente um intervalo por vez, de forma que o jitter
+não acumula e os testes não se deslocam com o tempo.
+"""
+import heapq
+import random
+
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Agendador:
+    """Heap com os prazos dos itens agendados"""
+
+    def __init__(self):
+        # cada entrada é (prazo, sequencia, base, geracao, item)
+        # a geração identifica o agendamento, permitindo remover e adicionar o mesmo item
+        self._heap: List[Tuple[float, int, float, int, Any]] = []
+        self._intervalos: Dict[Any, Tuple[float, float, int]] = {}
+        self._sequencia: int = 0
+
+    def __len__(self) -> int:
+        return len(self._intervalos)
+
+    def _inserir(self, item: Any, base: float):
+        """Insere o item no heap, com prazo igual à base mais um jitter aleatório"""
+        _, jitter, geracao = self._intervalos[item]
+        prazo = base + (random.uniform(0, jitter) if jitter > 0 else 0)
+        self._sequencia += 1
+        heapq.heappush(self._heap, (prazo, self._sequencia, base, geracao, item))
+
+    def adicionar(self, item: Any, agora: float, intervalo: float, jitter: float = 0, fase: float = 0):
+        """Agenda um item para ser executado periodicamente
+
+        Args:
+            item (Any): item a ser agendado
+            agora (float): tempo atual, no relógio do chamador
+            intervalo (float): intervalo (em segundos) entre as execuções
+            jitter (float): atraso aleatório máximo (em segundos) somado a cada prazo
+            fase (float): fração do intervalo (entre 0 e 1) a esperar antes da primeira execução
+        """
+        self._sequencia += 1
+        self._intervalos[item] = (intervalo, jitter, self._sequencia)
+        self._inserir(item, agora + intervalo * fase)
+
+    def intervalo(self, item: Any) -> Optional[float]:
+        """Intervalo (em segundos) atual de um item, ou None caso ele não esteja agendado"""
+        agendado = self._intervalos.get(item)
+        return agendado[0] if agendado is not None else None
+
+    def reagendar(self, item: Any, base: float, intervalo: float):
+        """Altera o intervalo de um item agendado
+
+        O próximo prazo do item passa a ser `base + intervalo` (como a partir do prazo da
+        execução atual), descartando o prazo calculado com o intervalo anterior.
+        Itens que não estão agendados são ignorados.
+
+        Args:
+            item (Any): item agendado
+            base (float): tempo a partir do qual o novo intervalo é contado, no relógio do chamador
+            intervalo (float): novo intervalo (em segundos) entre as execuções
+        """
+        if item not in self._intervalos:
+            return
+        _, jitter, _ = self._intervalos[item]
+        self._sequencia += 1
+        self._intervalos[item] = (intervalo, jitter, self._sequencia)
+        self._inserir(item, base + intervalo)
+
+    def remover(self, item: Any):
+        """Remove um item da agenda. A entrada no heap é descartada quando chegar ao topo"""
+        self._intervalos.pop(item, None)
+
+    def proximo_prazo(self) -> Optional[float]:
+        """Retorna o prazo do próximo item, ou None se a agenda estiver vazia"""
+        self._descartar_removidos()
+        return self._heap[0][0] if self._heap else None
+
+    def _descartar_removidos(self):
+        """Remove do topo do heap os itens que não estão mais agendados"""
+        while self._heap:
+            _, _, _, geracao, item = self._heap[0]
+            if item in self._intervalos and self._intervalos[item][2] == geracao:
+                return
+            heapq.heappop(self._heap)
+
+    def retirar(self, agora: float) -> Optional[Tuple[Any, float]]:
+        """Retira o próximo item cujo prazo já passou, agendando a sua próxima execução
+
+        Caso o item esteja tão atrasado que perdeu prazos inteiros, esses prazos
+        são pulados, sem execuções acumuladas.
+
+        Args:
+            agora (float): tempo atual, no relógio do chamador
+
+        Returns:
+            (item, prazo) do item retirado, ou None se nenhum prazo passou
+        """
+        self._descartar_removidos()
+        if not self._heap or self._heap[0][0] > agora:
+            return None
+
+        prazo, _, base, _, item = heapq.heappop(self._heap)
+        intervalo, _, _ = self._intervalos[item]
+
+        base += intervalo
+        if base <= agora:
+            base += intervalo * ((agora - base) // intervalo + 1)
+        self._inserir(item, base)
+
+        return item, prazo
@@ -0,0 +1,68 @@
+"""anel.py
+
+Contém a implementação do AnelHash, um anel de hashing consistente usado
+para distribuir os módulos entre processos.
+
+Cada nó ocupa vários pontos do anel, e um módulo pertence ao primeiro nó
+encontrado a partir do hash do seu nome. Ao adicionar ou remover um nó,
+somente os módulos daquele nó mudam de dono.
+"""
+import bisect
+import hashlib
+
+from typing import Dict, Iterable, List
+
+
+def _hash(chave: str) -> int:
+    """Hash estável (igual em todos os processos) de uma chave"""
+    return int.from_bytes(hashlib.blake2b(chave.encode(), digest_size=8).digest(), 'big')
+
+
+class AnelHash:
+    """Anel de hashing consistente"""
+
+    def __init__(self, nos: Iterable[str], replicas: int = 100):
+        """Inicializa o anel
+
+        Args:
+            nos (Iterable[str]): identificadores dos nós
+            replicas (int): quantidade de pontos de cada nó no anel. Mais pontos
+                distribuem os módulos de forma mais uniforme
+        """
+        self.replicas: int = replicas
+        self._pontos: List[int] = []
+        self._nos: Dict[int, str] = {}
+        for no in nos:
+            self.adicionar(no)
+
+    @property
+    def nos(self) -> List[str]:
+        """Nós presentes no anel"""
+        return sorted(set(self._nos.values()))
+
+    def adicionar(self, no: str):
+        """Adiciona um nó ao anel"""
+        for i in range(self.replicas):
+            ponto = _hash(f'{no}#{i}')
+            if ponto not in self._nos:
+                bisect.insort(self._pontos, ponto)
+            self._nos[ponto] = no
+
+    def remover(self, no: str):
+        """Remove um nó do anel"""
+        for i in range(self.replicas):
+            ponto = _hash(f'{no}#{i}')
+            if self._nos.get(ponto) == no:
+                del self._nos[ponto]
+                self._pontos.pop(bisect.bisect_left(self._pontos, ponto))
+
+    def no(self, chave: str) -> str:
+        """Retorna o nó responsável por uma chave
+
+        Raises:
+            LookupError: caso o anel esteja vazio
+        """
+        if not self._pontos:
+            raise LookupError("Anel sem nós")
+        i = bisect.bisect(self._pontos, _hash(chave)) % len(self._pontos)
+        return self._nos[self._pontos[i]]
@@ -2,27 +2,69 @@
 
 Contém a implementação do armazenamento de informações para o projeto.
 
-Utiliza o banco de dados Redis
+Utiliza o banco de dados Redis. Uma única instância deve ser compartilhada
+por todos os testadores, pois ela mantém o pool de conexões com o Redis.
+
+Também contém as concessões (chaves com validade) usadas para coordenar vários
+nós do monitor: a presença de cada nó, e o nó que notifica cada módulo.
 """
 
-from redis import Redis
+from redis import Redis, ConnectionPool, BlockingConnectionPool
 
 from enums import Status
+from instrumentacao import SERVICO_REDIS, medido
+
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+# renova a concessão caso já pertença ao nó, ou a adquire caso esteja livre
+_LUA_ADQUIRIR = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
 
-from typing import Optional, Union
+# remove a concessão somente se ela pertencer ao nó
+_LUA_LIBERAR = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
 
 
 class Armazenamento:
-    def __init__(self, host: str, port: int, identificador: str = 'monitor'):
-        """Inicia uma conexão com o armazenamento
+    def __init__(self,
+                 host: str,
+                 port: int,
+                 identificador: str = 'monitor',
+                 max_conexoes: Optional[int] = None,
+                 cliente: Optional[Redis] = None
+                 ):
+        """Inicia um pool de conexões com o armazenamento
 
         Args:
             host (str): host de conexão com o redis
             port (str): porta de conexão com o redis
             identificador (str): identificador a ser usado no redis
+            max_conexoes (int, optional): quantidade máxima de conexões do pool. Quando atingida,
+                os comandos esperam uma conexão ser liberada. Default é ilimitado.
+            cliente (Redis, optional): cliente já criado (como um fakeredis), usado
+                no lugar do pool. Nesse caso, host e port são ignorados.
         """
-        self._client: Redis = Redis(host=host, port=port)
+        if cliente is None:
+            if max_conexoes is None:
+                pool = ConnectionPool(host=host, port=port)
+            else:
+                pool = BlockingConnectionPool(host=host, port=port, max_connections=max_conexoes)
+            cliente = Redis(connection_pool=pool)
+        self._client: Redis = cliente
         self._identificador = identificador
+        self._adquirir = self._client.register_script(_LUA_ADQUIRIR)
+        self._liberar = self._client.register_script(_LUA_LIBERAR)
 
     def _get_redis_key(self, chave: str) -> str:
         """Retorna a chave a ser usada no Redis
@@ -32,6 +74,7 @@ class Armazenamento:
         """
         return f'{self._identificador}:{chave}'
 
+    @medido(SERVICO_REDIS)
     def coletar(self, chave) -> Optional[Status]:
         """Coleta um status do banco de dados
 
@@ -41,15 +84,26 @@ class Armazenamento:
         Args:
             chave (str): chave para ser coletada do banco de dados
         """
-        x: Optional[bytes] = self._client.get(self._get_redis_key(chave))
-        ret: Optional[Status] = None
-        if x is not None and x.isdigit():
-            try:
-                ret = Status(int(x))
-            except ValueError:
-                pass
-        return ret
+        return self._para_status(self._client.get(self._get_redis_key(chave)))
+
+    @medido(SERVICO_REDIS)
+    def coletar_muitos(self, chaves: Iterable[str]) -> Dict[str, Optional[Status]]:
+        """Coleta os status de várias chaves com um único comando (MGET)
+
+        Args:
+            chaves (Iterable[str]): chaves para serem coletadas do banco de dados
+
+        Returns:
+            Dicionário de cada chave para o seu status, ou None caso seja
+            um valor inválido ou inexistente
+        """
+        chaves = list(chaves)
+        if not chaves:
+            return {}
+        valores = self._client.mget([self._get_redis_key(c) for c in chaves])
+        return {c: self._para_status(v) for c, v in zip(chaves, valores)}
 
+    @medido(SERVICO_REDIS)
     def guardar(self, chave: str, valor: Union[Status, int]):
         """Armazena um status no banco de dados
 
@@ -64,10 +118,121 @@ class Armazenamento:
         """
         if valor is None:
             return
+        self._client.set(self._get_redis_key(chave), self._para_valor(valor))
+
+    @medido(SERVICO_REDIS)
+    def guardar_muitos(self, valores: Dict[str, Union[Status, int]]):
+        """Armazena vários status com um único comando (MSET)
+
+        Valores None são ignorados
+
+        Args:
+            valores (Dict[str, Status]): dicionário de cada chave para o seu valor
+
+        Raises:
+            RuntimeError: Se algum valor for um objeto inválido
+        """
+        mapa = {
+            self._get_redis_key(c): self._para_valor(v) for c, v in valores.items() if v is not None
+        }
+        if mapa:
+            self._client.mset(mapa)
+
+    @medido(SERVICO_REDIS)
+    def trocar(self, chave: str, valor: Union[Status, int]) -> Optional[Status]:
+        """Armazena um status, retornando o status que estava armazenado antes
+
+        A leitura e a escrita são enviadas juntas (pipeline), em uma única ida ao banco.
+        Se valor for None, somente a leitura é feita
+
+        Args:
+            chave (str): chave a ser usada para armazenar o valor
+            valor (Status): valor a ser armazenado no banco de dados
+
+        Raises:
+            RuntimeError: Se `valor` for um objeto inválido
+        """
+        if valor is None:
+            return self.coletar(chave)
+
+        redis_key = self._get_redis_key(chave)
+        pipe = self._client.pipeline(transaction=False)
+        pipe.get(redis_key)
+        pipe.set(redis_key, self._para_valor(valor))
+        anterior, _ = pipe.execute()
+        return self._para_status(anterior)
+
+    @medido(SERVICO_REDIS)
+    def renovar_no(self, no: str, validade: float):
+        """Marca um nó como vivo pelo tempo fornecido
+
+        Args:
+            no (str): identificador do nó
+            validade (float): tempo (em segundos) até o nó ser considerado morto
+        """
+        self._client.set(self._get_redis_key(f'no:{no}'), no, px=int(validade * 1000))
+
+    @medido(SERVICO_REDIS)
+    def remover_no(self, no: str):
+        """Remove a marcação de um nó, que passa a ser considerado morto imediatamente"""
+        self._client.delete(self._get_redis_key(f'no:{no}'))
+
+    @medido(SERVICO_REDIS)
+    def listar_nos(self) -> List[str]:
+        """Retorna os identificadores dos nós vivos"""
+        prefixo = self._get_redis_key('no:')
+        return sorted(
+            chave.decode()[len(prefixo):] for chave in self._client.scan_iter(match=f'{prefixo}*', count=1000)
+        )
+
+    @medido(SERVICO_REDIS)
+    def adquirir(self, chaves: Iterable[str], no: str, validade: float) -> Set[str]:
+        """Adquire (ou renova) as concessões das chaves fornecidas para um nó
+
+        Uma concessão pertence a um único nó até expirar ou ser liberada.
+
+        Args:
+            chaves (Iterable[str]): chaves das concessões
+            no (str): identificador do nó
+            validade (float): validade (em segundos) das concessões
+
+        Returns:
+            chaves cujas concessões pertencem ao nó
+        """
+        chaves = list(chaves)
+        pipe = self._client.pipeline(transaction=False)
+        for c in chaves:
+            self._adquirir(keys=[self._get_redis_key(f'lider:{c}')], args=[no, int(validade * 1000)], client=pipe)
+        return {c for c, ok in zip(chaves, pipe.execute()) if ok}
+
+    @medido(SERVICO_REDIS)
+    def liberar(self, chaves: Iterable[str], no: str):
+        """Libera as concessões das chaves fornecidas, caso pertençam ao nó"""
+        pipe = self._client.pipeline(transaction=False)
+        for c in chaves:
+            self._liberar(keys=[self._get_redis_key(f'lider:{c}')], args=[no], client=pipe)
+        pipe.execute()
+
+    @staticmethod
+    def _para_status(x: Optional[bytes]) -> Optional[Status]:
+        """Converte um valor lido do redis para um status, ou None se for inválido"""
+        ret: Optional[Status] = None
+        if x is not None and x.isdigit():
+            try:
+                ret = Status(int(x))
+            except ValueError:
+                pass
+        return ret
+
+    @staticmethod
+    def _para_valor(valor: Union[Status, int]) -> int:
+        """Converte um status para o valor a ser armazenado no redis
+
+        Raises:
+            RuntimeError: Se `valor` for um objeto inválido
+        """
         if isinstance(valor, Status):
-            v = valor.value
+            return valor.value
         elif isinstance(valor, int):
-            v = valor
-        else:
-            raise RuntimeError(f"Valor inválido para ser armazenado: {valor}")
-        self._client.set(self._get_redis_key(chave), v)
+            return valor
+        raise RuntimeError(f"Valor inválido para ser armazenado: {valor}")
@@ -0,0 +1,102 @@
+"""cache.py
+
+Contém a implementação do CacheStatus, um cache em memória dos últimos status
+de cada módulo, posicionado na frente do Armazenamento.
+
+As leituras são respondidas localmente, e as escritas são enviadas ao Redis
+em lotes periódicos (write-behind). Assim, o tráfego com o Redis é proporcional
+às mudanças de status, e uma falha no Redis não atrasa os testes.
+"""
+import asyncio
+import logging
+
+from enums import Status
+from armazenamento import Armazenamento
+
+from typing import Dict, Iterable, Optional
+
+
+class CacheStatus:
+    """Cache dos status armazenados, com a mesma interface de leitura e escrita do Armazenamento"""
+
+    def __init__(self, armazenamento: Armazenamento, intervalo_escrita: float = 5):
+        """Inicializa o cache vazio
+
+        Args:
+            armazenamento (Armazenamento): armazenamento por trás do cache
+            intervalo_escrita (float): intervalo (em segundos) entre as escritas no armazenamento
+        """
+        self.armazenamento: Armazenamento = armazenamento
+        self.intervalo_escrita: float = intervalo_escrita
+        self._status: Dict[str, Optional[Status]] = {}
+        self._pendentes: Dict[str, Status] = {}
+
+    def aquecer(self, chaves: Iterable[str]):
+        """Carrega do armazenamento os status das chaves fornecidas
+
+        Chaves que já possuem escritas pendentes não são sobrescritas.
+        Essa função é bloqueante
+
+        Args:
+            chaves (Iterable[str]): chaves a serem carregadas
+        """
+        for chave, status in self.armazenamento.coletar_muitos(chaves).items():
+            if chave not in self._pendentes:
+                self._status[chave] = status
+
+    def coletar(self, chave: str) -> Optional[Status]:
+        """Retorna o último status conhecido da chave, ou None se não houver"""
+        return self._status.get(chave)
+
+    def guardar(self, chave: str, valor: Optional[Status]):
+        """Armazena um status no cache, para ser escrito no próximo lote
+
+        Se valor for None, ou igual ao valor já armazenado, nada é feito
+        """
+        if valor is None or self._status.get(chave) == valor:
+            return
+        self._status[chave] = valor
+        self._pendentes[chave] = valor
+
+    def trocar(self, chave: str, valor: Optional[Status]) -> Optional[Status]:
+        """Armazena um status no cache, retornando o status anterior"""
+        anterior = self.coletar(chave)
+        self.guardar(chave, valor)
+        return anterior
+
+    def esquecer(self, chave: str):
+        """Remove uma chave do cache, sem removê-la do armazenamento
+
+        Uma escrita pendente da chave ainda é enviada, para que outro nó que
+        passe a testar o módulo encontre o último status
+        """
+        self._status.pop(chave, None)
+
+    @property
+    def pendentes(self) -> int:
+        """Quantidade de escritas ainda não enviadas ao armazenamento"""
+        return len(self._pendentes)
+
+    async def descarregar(self):
+        """Envia as escritas pendentes ao armazenamento em um único lote
+
+        Em caso de erro, as escritas voltam a ficar pendentes (sem sobrescrever
+        escritas mais novas) e são enviadas no próximo lote
+        """
+        if not self._pendentes:
+            return
+
+        lote, self._pendentes = self._pendentes, {}
+        try:
+            await asyncio.to_thread(self.armazenamento.guardar_muitos, lote)
+        except Exception as e:  # noqa
+            logging.error("Erro ao escrever %d status no armazenamento: %s", len(lote), e)
+            lote.update(self._pendentes)
+            self._pendentes = lote
+
+    async def executar(self):
+        """Loop de escrita periódica no armazenamento"""
+        while True:
+            await asyncio.sleep(self.intervalo_escrita)
+            await self.descarregar()
+
@@ -0,0 +1,140 @@
+"""cluster.py
+
+Contém a implementação do Coordenador, que divide os módulos entre vários
+nós do monitor através do Redis.
+
+Cada nó renova periodicamente uma concessão (chave com validade) no Redis. Os
+nós com concessão válida formam um anel de hashing consistente, e cada nó testa
+somente os módulos que o anel lhe atribui. Quando um nó para de renovar a sua
+concessão, os seus módulos passam para os nós restantes.
+
+As notificações de cada módulo são enviadas somente pelo nó que possui a
+concessão de notificador daquele módulo, evitando notificações duplicadas
+enquanto dois nós testam o mesmo módulo (por exemplo, durante uma troca).
+"""
+import asyncio
+import logging
+from time import monotonic
+
+from anel import AnelHash
+from models import Modulo, ConfigCluster
+from armazenamento import Armazenamento
+
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+
+class Coordenador:
+    """Coordena a divisão dos módulos entre os nós do monitor"""
+
+    def __init__(self, armazenamento: Armazenamento, config: ConfigCluster, ident: Optional[str] = None):
+        """Inicializa o coordenador, com um anel contendo somente este nó
+
+        Args:
+            armazenamento (Armazenamento): armazenamento onde as concessões são mantidas
+            config (ConfigCluster): configurações da divisão entre nós
+            ident (str, optional): identificador deste nó. Default é o identificador da configuração.
+        """
+        self.armazenamento: Armazenamento = armazenamento
+        self.config: ConfigCluster = config
+        self.ident: str = ident if ident is not None else config.ident
+        self.renovacao: float = config.lease / 3
+
+        # módulos testados por este nó, cujas notificações ele disputa
+        self.nomes: Callable[[], Iterable[str]] = lambda: ()
+        # chamado quando os nós do anel mudam, para reaplicar a divisão dos módulos
+        self.ao_mudar: Optional[Callable[[], Awaitable]] = None
+        # chave de distribuição (grupo de dependências ou de endpoint) dos módulos que não usam o próprio nome
+        self.grupos: Dict[str, str] = {}
+
+        self._nos: List[str] = [self.ident]
+        self._anel: AnelHash = AnelHash(self._nos)
+        self._liderancas: Set[str] = set()
+        self._disputados: Set[str] = set()
+        self._validade_liderancas: float = 0
+        self._disponivel: bool = False
+
+    @property
+    def nos(self) -> List[str]:
+        """Nós vivos conhecidos"""
+        return self._nos
+
+    def responsavel(self, modulo: Modulo) -> bool:
+        """Indica se este nó deve testar o módulo. Módulos ligados por dependências ficam no mesmo nó"""
+        return self._anel.no(modulo.chave_distribuicao) == self.ident
+
+    def notificador(self, nome: str) -> bool:
+        """Indica se este nó deve enviar as notificações do módulo
+
+        Caso o Redis esteja indisponível, ou a concessão do módulo ainda não tenha sido
+        disputada (módulo recém-assumido), cada nó notifica os módulos que testa
+        """
+        if not self._disponivel or nome not in self._disputados:
+            return self._anel.no(self.grupos.get(nome, nome)) == self.ident
+        return nome in self._liderancas and monotonic() < self._validade_liderancas
+
+    def atualizar_nos(self) -> bool:
+        """Renova a concessão deste nó, e atualiza o anel com os nós vivos. Essa função é bloqueante
+
+        Returns:
+            True caso os nós do anel tenham mudado
+        """
+        try:
+            self.armazenamento.renovar_no(self.ident, self.config.lease)
+            nos = self.armazenamento.listar_nos()
+            self._disponivel = True
+        except Exception as e:  # noqa
+            if self._disponivel:
+                logging.error("Erro ao renovar a concessão do nó %s, mantendo os nós conhecidos: %s", self.ident, e)
+            self._disponivel = False
+            return False
+
+        if self.ident not in nos:
+            nos.append(self.ident)
+        nos.sort()
+        if nos == self._nos:
+            return False
+
+        logging.info("Nós do monitor alterados: %s -> %s", ', '.join(self._nos), ', '.join(nos))
+        self._nos = nos
+        self._anel = AnelHash(nos)
+        return True
+
+    def atualizar_liderancas(self):
+        """Adquire as concessões de notificador dos módulos deste nó, e libera as dos demais.
+        Essa função é bloqueante
+        """
+        if not self._disponivel:
+            return
+        nomes = set(self.nomes())
+        inicio = monotonic()
+        try:
+            perdidos = self._liderancas - nomes
+            if perdidos:
+                self.armazenamento.liberar(perdidos, self.ident)
+            self._liderancas = self.armazenamento.adquirir(nomes, self.ident, self.config.lease)
+            self._validade_liderancas = inicio + self.config.lease
+            self._disputados = nomes
+        except Exception as e:  # noqa
+            logging.error("Erro ao renovar as concessões de notificador: %s", e)
+
+    def sair(self):
+        """Remove este nó e libera as suas concessões, para que os outros nós assumam imediatamente.
+        Essa função é bloqueante
+        """
+        try:
+            self.armazenamento.liberar(self._liderancas, self.ident)
+            self.armazenamento.remover_no(self.ident)
+        except Exception as e:  # noqa
+            logging.error("Erro ao remover o nó %s: %s", self.ident, e)
+        self._liderancas = set()
+
+    async def executar(self):
+        """Loop de renovação das concessões"""
+        try:
+            while True:
+                if await asyncio.to_thread(self.atualizar_nos) and self.ao_mudar is not None:
+                    await self.ao_mudar()
+                await asyncio.to_thread(self.atualizar_liderancas)
+                await asyncio.sleep(self.renovacao)
+        finally:
+            await asyncio.to_thread(self.sair)
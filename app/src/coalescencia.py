@@ -0,0 +1,111 @@
+"""coalescencia.py
+
+Contém a implementação da CoalescenciaTestes, que une os testes de módulos que testam
+o mesmo endpoint (mesmo tipo de teste, url e método, ou os mesmos host:porta).
+
+Um único teste é feito por endpoint: os módulos que chegam enquanto ele está em andamento
+aguardam o seu resultado, e os que chegam até `janela_coalescencia` segundos depois do seu
+fim reaproveitam o resultado. Assim, a carga nos alvos e as conexões do monitor crescem com
+a quantidade de endpoints, e não com a quantidade de módulos.
+"""
+import asyncio
+
+from enums import TipoModulo
+from models import Modulo, ConfigTeste, ResultadoTeste
+from prom import TipoPrometheus, Prometheus
+
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+def chave_teste(modulo: Modulo) -> Optional[Hashable]:
+    """Identifica o endpoint testado pelo módulo, ou None caso o teste não possa ser compartilhado
+
+    Testes frios (que não reutilizam conexões) só são unidos a outros testes frios
+    """
+    if modulo.tipo in (TipoModulo.HTTP, TipoModulo.SIZE):
+        return modulo.tipo, modulo.params.metodo, modulo.params.url, modulo.frio
+    elif modulo.tipo == TipoModulo.PORT:
+        alvos = tuple(modulo.params.alvos) or ((modulo.params.host, modulo.params.port),)
+        return modulo.tipo, alvos, modulo.params.minimo
+    return None
+
+
+def chaves_endpoints(modulo: Modulo) -> List[Hashable]:
+    """Endpoints testados pelo módulo, incluindo os de cada teste de um módulo composto"""
+    if modulo.tipo == TipoModulo.COMPOSITE:
+        return [c for m in modulo.params.testes for c in chaves_endpoints(m)]
+    chave = chave_teste(modulo)
+    return [chave] if chave is not None else []
+
+
+class CoalescenciaTestes:
+    """Testes em andamento e resultados recentes de cada endpoint"""
+
+    def __init__(self, config: ConfigTeste):
+        """Inicializa sem nenhum teste
+
+        Args:
+            config (ConfigTeste): configurações dos testes, com a janela de reaproveitamento
+        """
+        self.config: ConfigTeste = config
+        self._em_andamento: Dict[Hashable, asyncio.Future] = {}
+        self._resultados: Dict[Hashable, Tuple[float, ResultadoTeste]] = {}  # (fim do teste, resultado)
+
+    def _recente(self, chave: Hashable, agora: float) -> Optional[ResultadoTeste]:
+        """Resultado do endpoint, caso ele ainda esteja dentro da janela"""
+        guardado = self._resultados.get(chave)
+        if guardado is None:
+            return None
+        if agora - guardado[0] < self.config.janela_coalescencia:
+            return guardado[1]
+        del self._resultados[chave]
+        return None
+
+    def guardar(self, chave: Hashable, resultado: ResultadoTeste):
+        """Guarda o resultado de um endpoint (como o de uma confirmação que encontrou o endpoint disponível)"""
+        if self.config.janela_coalescencia <= 0:
+            return
+        agora = asyncio.get_running_loop().time()
+        # descarta os resultados vencidos, para não acumular endpoints que deixaram de ser testados
+        for c in [c for c, (fim, _) in self._resultados.items() if agora - fim >= self.config.janela_coalescencia]:
+            del self._resultados[c]
+        self._resultados[chave] = agora, resultado
+
+    def _concluir(self, chave: Hashable, tarefa: asyncio.Future, guardar: bool):
+        """Remove o teste terminado, guardando o seu resultado caso ele possa ser reaproveitado"""
+        if self._em_andamento.get(chave) is tarefa:
+            del self._em_andamento[chave]
+        if guardar and not tarefa.cancelled() and tarefa.exception() is None:
+            self.guardar(chave, tarefa.result())
+
+    async def obter(self, chave: Hashable, testar: Callable[[], Awaitable[ResultadoTeste]],
+                    timeout: float, reaproveitar: bool = True) -> ResultadoTeste:
+        """Retorna o resultado do endpoint: o recente, o do teste em andamento, ou o de um novo teste
+
+        O teste é executado em uma tarefa própria, que continua caso quem o iniciou seja cancelado,
+        já que outros módulos podem estar aguardando o resultado
+
+        Args:
+            chave (Hashable): endpoint (ver `chave_teste`)
+            testar (Callable[[], Awaitable[ResultadoTeste]]): faz um novo teste do endpoint
+            timeout (float): tempo (s) máximo de espera pelo resultado
+            reaproveitar (bool): se False, o resultado recente não é usado, somente o do teste em andamento
+                (como nas confirmações de falha, que precisam de um teste novo)
+
+        Raises:
+            asyncio.TimeoutError: caso o teste não termine dentro do timeout
+        """
+        recente = self._recente(chave, asyncio.get_running_loop().time()) if reaproveitar else None
+        if recente is not None:
+            Prometheus.incrementar(TipoPrometheus.COALESCED_PROBES, 'cached')
+            return recente
+
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            Prometheus.incrementar(TipoPrometheus.COALESCED_PROBES, 'probe')
+            tarefa = asyncio.ensure_future(testar())
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._concluir(chave, t, reaproveitar))
+        else:
+            Prometheus.incrementar(TipoPrometheus.COALESCED_PROBES, 'inflight')
+        return await asyncio.wait_for(asyncio.shield(tarefa), timeout)
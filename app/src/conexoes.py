@@ -0,0 +1,218 @@
+"""conexoes.py
+
+Contém a implementação do pool de conexões HTTP compartilhado pelos testadores.
+
+As conexões são mantidas abertas (keep-alive) entre os testes, de forma que
+o tempo de teste não inclua os handshakes TCP e TLS. Módulos configurados
+como "frios" usam uma conexão nova a cada teste, medindo também o handshake.
+
+Cada request pode medir a duração das suas fases (dns, connect e ttfb) através
+dos eventos de trace do aiohttp. O aiohttp não separa o handshake TLS da conexão
+TCP, então a fase connect inclui o TLS em urls https.
+
+Os corpos das respostas nunca são lidos por completo sem limite: `ler_corpo` lê
+aos poucos até um tamanho máximo, e `descartar_corpo` só lê corpos pequenos (para
+manter a conexão aberta), fechando a conexão nos demais.
+
+Os nomes são resolvidos pelo ResolvedorDNS do pool, com cache compartilhado por
+todos os testadores (inclusive pelos módulos frios e pelo testador PORT).
+"""
+from time import perf_counter
+from types import SimpleNamespace
+from contextlib import asynccontextmanager
+from aiohttp import ClientSession, ClientTimeout, TCPConnector, ClientResponse, TraceConfig
+
+from models import ConfigHTTP
+from resolvedor import ResolvedorDNS
+
+from typing import AsyncIterator, Dict, Optional
+
+
+async def _inicio_request(_sessao, contexto: SimpleNamespace, _params):
+    contexto.inicio = contexto.pronto = perf_counter()
+
+
+async def _inicio_dns(_sessao, contexto: SimpleNamespace, _params):
+    contexto.inicio_dns = perf_counter()
+
+
+async def _fim_dns(_sessao, contexto: SimpleNamespace, _params):
+    if contexto.trace_request_ctx is not None:
+        contexto.trace_request_ctx['dns'] = perf_counter() - contexto.inicio_dns
+
+
+async def _inicio_conexao(_sessao, contexto: SimpleNamespace, _params):
+    contexto.inicio_conexao = perf_counter()
+
+
+async def _fim_conexao(_sessao, contexto: SimpleNamespace, _params):
+    contexto.pronto = perf_counter()
+    fases = contexto.trace_request_ctx
+    if fases is not None:
+        # a criação da conexão inclui a resolução do dns
+        fases['connect'] = contexto.pronto - contexto.inicio_conexao - fases.get('dns', 0)
+
+
+async def _reuso_conexao(_sessao, contexto: SimpleNamespace, _params):
+    contexto.pronto = perf_counter()
+
+
+async def _fim_request(_sessao, contexto: SimpleNamespace, _params):
+    if contexto.trace_request_ctx is not None:
+        contexto.trace_request_ctx['ttfb'] = perf_counter() - contexto.pronto
+
+
+class CorpoMuitoGrande(ValueError):
+    """Corpo da resposta maior que o tamanho máximo permitido"""
+    pass
+
+
+async def ler_corpo(resposta: ClientResponse, limite: int) -> bytes:
+    """Lê o corpo da resposta aos poucos, sem ultrapassar o tamanho máximo
+
+    Args:
+        resposta (ClientResponse): resposta com o corpo ainda não lido
+        limite (int): tamanho (em bytes) máximo do corpo
+
+    Raises:
+        CorpoMuitoGrande: caso o corpo (ou o seu Content-Length) seja maior que o limite. A conexão
+            é fechada, sem ler o restante do corpo
+    """
+    if resposta.content_length is not None and resposta.content_length > limite:
+        resposta.close()
+        raise CorpoMuitoGrande(f"Corpo da resposta maior que {limite} bytes ({resposta.content_length})")
+
+    corpo = bytearray()
+    async for pedaco in resposta.content.iter_any():
+        corpo += pedaco
+        if len(corpo) > limite:
+            resposta.close()
+            raise CorpoMuitoGrande(f"Corpo da resposta maior que {limite} bytes")
+    return bytes(corpo)
+
+
+async def descartar_corpo(resposta: ClientResponse, limite: int) -> bool:
+    """Descarta o corpo da resposta
+
+    Corpos de tamanho conhecido até o limite são lidos (e descartados), para que a conexão
+    possa ser reutilizada. Nos demais casos, a conexão é fechada sem ler o corpo.
+
+    Args:
+        resposta (ClientResponse): resposta com o corpo ainda não lido
+        limite (int): tamanho (em bytes) máximo do corpo lido
+
+    Returns:
+        True caso o corpo tenha sido lido, mantendo a conexão
+    """
+    if resposta.method == 'HEAD':
+        # respostas a HEAD não têm corpo, mesmo com Content-Length
+        return True
+    if resposta.content_length is None or resposta.content_length > limite:
+        resposta.close()
+        return False
+    while await resposta.content.readany():
+        pass
+    return True
+
+
+def _criar_trace() -> TraceConfig:
+    """Cria o TraceConfig que preenche o dicionário de fases passado como `trace_request_ctx`"""
+    trace = TraceConfig()
+    trace.on_request_start.append(_inicio_request)
+    trace.on_dns_resolvehost_start.append(_inicio_dns)
+    trace.on_dns_resolvehost_end.append(_fim_dns)
+    trace.on_connection_create_start.append(_inicio_conexao)
+    trace.on_connection_create_end.append(_fim_conexao)
+    trace.on_connection_reuseconn.append(_reuso_conexao)
+    trace.on_request_end.append(_fim_request)
+    return trace
+
+
+class PoolHTTP:
+    """Pool de conexões HTTP, com limite de conexões por host e keep-alive"""
+
+    def __init__(self, config: Optional[ConfigHTTP] = None, resolvedor: Optional[ResolvedorDNS] = None):
+        """Inicializa o pool. As conexões só são criadas após `iniciar`
+
+        Args:
+            config (ConfigHTTP, optional): configurações do pool. Default é ConfigHTTP().
+            resolvedor (ResolvedorDNS, optional): resolvedor de nomes compartilhado. Default é um
+                resolvedor próprio.
+        """
+        self.config: ConfigHTTP = config if config is not None else ConfigHTTP()
+        self.resolvedor: ResolvedorDNS = resolvedor if resolvedor is not None else ResolvedorDNS()
+        self._sessao: Optional[ClientSession] = None
+
+    def timeout(self, total: Optional[float] = None) -> ClientTimeout:
+        """Timeout dos requests
+
+        Args:
+            total (float, optional): tempo máximo do request. Default é o timeout configurado.
+        """
+        total = total if total is not None else self.config.timeout
+        return ClientTimeout(total=total, connect=min(total, self.config.connect_timeout))
+
+    @property
+    def sessao(self) -> ClientSession:
+        """Sessão compartilhada, para requests que não são testes
+
+        Raises:
+            RuntimeError: caso o pool não tenha sido iniciado
+        """
+        if self._sessao is None:
+            raise RuntimeError("Pool HTTP não iniciado")
+        return self._sessao
+
+    async def iniciar(self):
+        """Cria a sessão compartilhada. Precisa ser executado dentro do event loop"""
+        if self._sessao is not None:
+            return
+        self._sessao = ClientSession(
+            timeout=self.timeout(),
+            connector=TCPConnector(
+                limit=self.config.pool_size,
+                limit_per_host=self.config.pool_size_per_host,
+                keepalive_timeout=self.config.keepalive,
+                resolver=self.resolvedor,
+                use_dns_cache=False,
+            ),
+            trace_configs=[_criar_trace()]
+        )
+
+    async def fechar(self):
+        """Fecha a sessão compartilhada e todas as suas conexões"""
+        if self._sessao is not None:
+            await self._sessao.close()
+            self._sessao = None
+        await self.resolvedor.close()
+
+    @asynccontextmanager
+    async def requisitar(self,
+                         metodo: str,
+                         url: str,
+                         frio: bool = False,
+                         timeout: Optional[float] = None,
+                         fases: Optional[Dict[str, float]] = None
+                         ) -> AsyncIterator[ClientResponse]:
+        """Faz um request, retornando a resposta
+
+        Args:
+            metodo (str): método HTTP (GET, POST...)
+            url (str): url a ser consultada
+            frio (bool): se True, usa uma conexão nova, fechada ao final do request
+            timeout (float, optional): tempo máximo do request. Default é o timeout configurado.
+            fases (Dict[str, float], optional): dicionário preenchido com a duração (em segundos)
+                das fases do request. Fases que não aconteceram (como o dns ou a conexão,
+                quando a conexão é reutilizada) não são preenchidas.
+        """
+        _timeout = self.timeout(timeout)
+        if frio or self._sessao is None:
+            async with ClientSession(timeout=_timeout,
+                                     connector=TCPConnector(force_close=True, resolver=self.resolvedor,
+                                                            use_dns_cache=False),
+                                     trace_configs=[_criar_trace()]) as sessao:
+                async with sessao.request(metodo, url, trace_request_ctx=fases) as resposta:
+                    yield resposta
+        else:
+            async with self._sessao.request(metodo, url, timeout=_timeout, trace_request_ctx=fases) as resposta:
+                yield resposta
@@ -5,14 +5,20 @@ Contém a classe Configuracao, que permite criar todos os modelos de configuraç
 Um exemplo de arquivo TOML pode ser encontrado em `example.config.toml`
 """
 
+import os
+import heapq
 import tomli
+import socket
 import logging
 
-from enums import TipoModulo, TipoMetodoHTTP
-from models import ParamsHTTP, ParamsPort, ParamsSize
-from models import Modulo, ConfigDiscord, ConfigStatuspage, ConfigRedis
+from enums import TipoModulo, TipoMetodoHTTP, TipoPolitica
+from tabela import NOME_MAX
+from models import ParamsHTTP, ParamsPort, ParamsSize, ParamsComposto
+from models import Modulo, ConfigDiscord, ConfigStatuspage, ConfigRedis, ConfigHTTP, ConfigMetricas, ConfigCluster
+from models import ConfigDNS, ConfigHistorico, ConfigAdaptativo, ConfigTeste
+from coalescencia import chaves_endpoints
 
-from typing import Dict, List, Optional
+from typing import Dict, Hashable, List, Optional, Tuple
 
 
 class InvalidConfigFile(BaseException):
@@ -20,6 +26,178 @@ class InvalidConfigFile(BaseException):
     pass
 
 
+def _numero(valor, nome: str, minimo: float = 0, inclusivo: bool = False, inteiro: bool = False):
+    """Valida um valor numérico da configuração
+
+    Args:
+        valor: valor lido do arquivo
+        nome (str): nome da chave, para a mensagem de erro
+        minimo (float): limite inferior do valor
+        inclusivo (bool): o valor pode ser igual ao limite inferior
+        inteiro (bool): o valor precisa ser inteiro
+
+    Raises:
+        ValueError: caso o valor não seja um número válido
+    """
+    tipos = (int,) if inteiro else (int, float)
+    if isinstance(valor, bool) or not isinstance(valor, tipos):
+        raise ValueError(f"{nome} precisa ser um número{' inteiro' if inteiro else ''}: {valor!r}")
+    if valor < minimo or (valor == minimo and not inclusivo):
+        raise ValueError(f"{nome} fora do intervalo permitido: {valor!r}")
+    return valor
+
+
+def _metodo(valor, nome: str, permitidos=(TipoMetodoHTTP.GET, TipoMetodoHTTP.POST, TipoMetodoHTTP.HEAD)):
+    """Valida o método HTTP de um teste
+
+    Raises:
+        ValueError: caso o método não seja um dos permitidos
+    """
+    for metodo in permitidos:
+        if isinstance(valor, str) and valor.upper() == metodo.name:
+            return metodo
+    raise ValueError(f"{nome} precisa ser um de {', '.join(m.name.lower() for m in permitidos)}: {valor!r}")
+
+
+def _politica(valor, nome: str) -> TipoPolitica:
+    """Valida a política de combinação dos testes de um módulo (worst, majority ou all)
+
+    Raises:
+        ValueError: caso a política não exista
+    """
+    for politica in TipoPolitica:
+        if isinstance(valor, str) and valor.upper() == politica.name:
+            return politica
+    raise ValueError(f"{nome} precisa ser um de {', '.join(p.name.lower() for p in TipoPolitica)}: {valor!r}")
+
+
+def _alvo(valor, nome: str) -> Tuple[str, int]:
+    """Valida um alvo de um teste PORT, no formato `host:porta` (ou `[ipv6]:porta`)
+
+    Raises:
+        ValueError: caso o alvo não esteja no formato esperado
+    """
+    if not isinstance(valor, str) or ':' not in valor:
+        raise ValueError(f"{nome} precisa estar no formato host:porta: {valor!r}")
+    host, porta = valor.rsplit(':', 1)
+    host = host[1:-1] if host.startswith('[') and host.endswith(']') else host
+    if not host or not porta.isdigit() or not 0 < int(porta) < 65536:
+        raise ValueError(f"{nome} precisa estar no formato host:porta: {valor!r}")
+    return host, int(porta)
+
+
+def _minimo(valor, nome: str, alvos: int) -> Optional[int]:
+    """Valida a quantidade de alvos de um teste PORT que precisam estar abertos (`require`)
+
+    Raises:
+        ValueError: caso não seja any, all ou um número entre 1 e a quantidade de alvos
+    """
+    if valor == 'any':
+        return 1
+    elif valor == 'all':
+        return None
+    valor = _numero(valor, nome, minimo=1, inclusivo=True, inteiro=True)
+    if valor > alvos:
+        raise ValueError(f"{nome} maior que a quantidade de alvos ({alvos}): {valor!r}")
+    return valor
+
+
+def _ordenar_dependencias(modulos: List[Modulo]) -> List[Modulo]:
+    """Valida as dependências (`depends_on`) dos módulos, ordenando-os de forma que cada módulo venha
+    depois das suas dependências (mantendo a ordem do arquivo entre os independentes)
+
+    Também define o grupo de cada módulo ligado por dependências: o primeiro nome (em ordem alfabética)
+    entre os módulos ligados a ele, direta ou indiretamente
+
+    Raises:
+        ValueError: caso um módulo dependa de um módulo inexistente, de si mesmo, ou de um ciclo
+    """
+    por_nome = {m.nome: m for m in modulos}
+    for m in modulos:
+        for d in m.dependencias:
+            if d not in por_nome or d == m.nome:
+                raise ValueError(f"depends_on do módulo {m.nome} inválido: {d!r}")
+
+    # ordenação topológica (Kahn), sempre escolhendo o primeiro módulo disponível na ordem do arquivo
+    posicoes = {m.nome: i for i, m in enumerate(modulos)}
+    dependentes: Dict[str, List[str]] = {}
+    for m in modulos:
+        for d in m.dependencias:
+            dependentes.setdefault(d, []).append(m.nome)
+    faltam = {m.nome: len(m.dependencias) for m in modulos}
+    prontos = [i for i, m in enumerate(modulos) if not m.dependencias]
+    ordenados: List[Modulo] = []
+    while prontos:
+        m = modulos[heapq.heappop(prontos)]
+        ordenados.append(m)
+        for nome in dependentes.get(m.nome, []):
+            faltam[nome] -= 1
+            if faltam[nome] == 0:
+                heapq.heappush(prontos, posicoes[nome])
+    if len(ordenados) < len(modulos):
+        ciclo = sorted(nome for nome, n in faltam.items() if n > 0)
+        raise ValueError(f"dependência circular entre os módulos: {', '.join(ciclo)}")
+
+    # grupos: componentes conexos do grafo de dependências
+    raizes = {m.nome: m.nome for m in modulos}
+
+    def raiz(nome: str) -> str:
+        while raizes[nome] != nome:
+            raizes[nome] = raizes[raizes[nome]]
+            nome = raizes[nome]
+        return nome
+
+    for m in modulos:
+        for d in m.dependencias:
+            a, b = sorted((raiz(m.nome), raiz(d)))
+            raizes[b] = a
+    for m in modulos:
+        m.grupo = raiz(m.nome) if m.dependencias or m.nome in dependentes else None
+    return ordenados
+
+
+def _agrupar_endpoints(modulos: List[Modulo]):
+    """Une aos grupos os módulos que testam o mesmo endpoint, para que eles sejam testados pelo mesmo
+    processo e compartilhem o teste (ver `CoalescenciaTestes`)
+
+    O grupo é o primeiro nome (em ordem alfabética) entre os módulos ligados, por dependências ou endpoints
+    """
+    raizes = {m.nome: m.nome for m in modulos}
+
+    def raiz(nome: str) -> str:
+        while raizes[nome] != nome:
+            raizes[nome] = raizes[raizes[nome]]
+            nome = raizes[nome]
+        return nome
+
+    def unir(a: str, b: str):
+        a, b = sorted((raiz(a), raiz(b)))
+        raizes[b] = a
+
+    primeiros: Dict[Hashable, str] = {}     # primeiro módulo de cada grupo e de cada endpoint
+    for m in modulos:
+        chaves = chaves_endpoints(m)
+        if m.grupo is not None:
+            chaves.append(m.grupo)
+        for chave in chaves:
+            if chave in primeiros:
+                unir(primeiros[chave], m.nome)
+            else:
+                primeiros[chave] = m.nome
+    ligados = {}
+    for m in modulos:
+        ligados.setdefault(raiz(m.nome), []).append(m)
+    for nome, grupo in ligados.items():
+        if len(grupo) > 1:
+            for m in grupo:
+                m.grupo = nome
+
+
+def _opcional(valor, nome: str, **kwargs):
+    """Valida um valor numérico opcional da configuração (None é aceito)"""
+    return None if valor is None else _numero(valor, nome, **kwargs)
+
+
 class Configuracao:
     """Classe que implementa a leitura do arquivo de configuração"""
     def __init__(self, path_para_arquivo: str):
@@ -40,72 +218,229 @@ class Configuracao:
         except FileNotFoundError:
             logging.error("Arquivo %s não encontrado", path_para_arquivo)
             exit(-1)
+        except tomli.TOMLDecodeError as e:
+            logging.error("Arquivo %s não é um TOML válido: %s", path_para_arquivo, e)
+            raise InvalidConfigFile()
 
         # prepara as variaveis
         self._versao: str = ""
         self._porta: int = -2
         self._interval: int = -1
+        self._concorrencia: int = 100
+        self._recarregamento: float = 5
+        self._processos: int = 1
         self._statuspage: Optional[ConfigStatuspage] = None
         self._discord: Optional[ConfigDiscord] = None
         self._redis: Optional[ConfigRedis] = None
+        self._http: ConfigHTTP = ConfigHTTP()
+        self._metricas: ConfigMetricas = ConfigMetricas()
+        self._dns: ConfigDNS = ConfigDNS()
+        self._cluster: Optional[ConfigCluster] = None
+        self._historico: Optional[ConfigHistorico] = None
+        self._adaptativo: Optional[ConfigAdaptativo] = None
+        self._teste: ConfigTeste = ConfigTeste()
         self._modules: List[Modulo] = []
 
         # faz o parsing do json
         try:
             self._versao = self._json['version']
-            self._interval = self._json['interval']
-            self._porta = self._json['port']
+            self._interval = _numero(self._json['interval'], 'interval')
+            self._porta = _numero(self._json['port'], 'port', inteiro=True)
+            self._concorrencia = _numero(self._json.get('concurrency', self._concorrencia), 'concurrency',
+                                         minimo=1, inclusivo=True, inteiro=True)
+            self._recarregamento = _numero(self._json.get('reload_interval', self._recarregamento), 'reload_interval')
+            self._processos = _numero(self._json.get('workers', self._processos), 'workers',
+                                      inclusivo=True, inteiro=True)
+            if self._processos == 0:
+                self._processos = os.cpu_count() or 1
             self._statuspage = ConfigStatuspage(
-                page_id=self._json['statuspage']['apikey'],
-                api_key=self._json['statuspage']['pageid']
+                page_id=self._json['statuspage']['pageid'],
+                api_key=self._json['statuspage']['apikey'],
+                url=self._json['statuspage'].get('url', ConfigStatuspage.url)
             )
             self._discord = ConfigDiscord(
                 infra_role=self._json['discord']['role_id'],
                 ident=self._json['discord']['id'],
-                token=self._json['discord']['token']
+                token=self._json['discord']['token'],
+                histerese=_numero(self._json['discord'].get('hysteresis', 0), 'hysteresis', inclusivo=True),
+                janela=_numero(self._json['discord'].get('batch_window', 2), 'batch_window'),
+                url=self._json['discord'].get('url', ConfigDiscord.url)
             )
             self._redis = ConfigRedis(
                 host=self._json['redis']['host'],
-                port=self._json['redis']['port']
+                port=_numero(self._json['redis']['port'], 'redis.port', inteiro=True),
+                pool_size=_opcional(self._json['redis'].get('pool_size'), 'redis.pool_size', inteiro=True),
+                flush_interval=_numero(self._json['redis'].get('flush_interval', 5), 'flush_interval')
+            )
+            # configurações do pool http são opcionais
+            _http = self._json.get('http', {})
+            self._http = ConfigHTTP(
+                pool_size=_numero(_http.get('pool_size', self._http.pool_size), 'http.pool_size', inteiro=True),
+                pool_size_per_host=_numero(_http.get('pool_size_per_host', self._http.pool_size_per_host),
+                                           'http.pool_size_per_host', inclusivo=True, inteiro=True),
+                keepalive=_numero(_http.get('keepalive', self._http.keepalive), 'http.keepalive', inclusivo=True),
+                timeout=_numero(_http.get('timeout', self._http.timeout), 'http.timeout'),
+                connect_timeout=_numero(_http.get('connect_timeout', self._http.connect_timeout),
+                                        'http.connect_timeout'),
+                max_body=_numero(_http.get('max_body', self._http.max_body), 'http.max_body', inteiro=True)
             )
-            # salvando a versao
+
+            # configurações do resolvedor de nomes são opcionais
+            _dns = self._json.get('dns', {})
+            self._dns = ConfigDNS(
+                ttl=_numero(_dns.get('ttl', self._dns.ttl), 'dns.ttl', inclusivo=True),
+                negative_ttl=_numero(_dns.get('negative_ttl', self._dns.negative_ttl), 'dns.negative_ttl',
+                                     inclusivo=True),
+                timeout=_numero(_dns.get('timeout', self._dns.timeout), 'dns.timeout'),
+                max_falhas=_numero(_dns.get('max_failures', self._dns.max_falhas), 'dns.max_failures',
+                                   inclusivo=True, inteiro=True)
+            )
+
+            # configurações das métricas são opcionais
+            _metricas = self._json.get('metrics', {})
+            self._metricas = ConfigMetricas(
+                buckets=sorted(_numero(b, 'metrics.buckets') for b in _metricas['buckets'])
+                if 'buckets' in _metricas else None,
+                max_series=_opcional(_metricas.get('max_series'), 'metrics.max_series', inteiro=True)
+            )
+
+            # divisão entre vários nós é opcional
+            if 'cluster' in self._json:
+                _cluster = self._json['cluster']
+                self._cluster = ConfigCluster(
+                    ident=_cluster.get('node_id', socket.gethostname()),
+                    lease=_numero(_cluster.get('lease', ConfigCluster.lease), 'cluster.lease')
+                )
+                if self._cluster.lease > self._interval:
+                    logging.warning("cluster.lease maior que interval: a troca de um nó morto pode "
+                                    "demorar mais que um intervalo")
+
+            # histórico em disco é opcional
+            if 'history' in self._json:
+                _historico = self._json['history']
+                if not isinstance(_historico['path'], str) or not _historico['path']:
+                    raise ValueError(f"history.path inválido: {_historico['path']!r}")
+                self._historico = ConfigHistorico(
+                    path=_historico['path'],
+                    max_records=_numero(_historico.get('max_records', ConfigHistorico.max_records),
+                                        'history.max_records', inteiro=True)
+                )
+
+            # configurações das confirmações de falha e do timeout adaptativo são opcionais
+            _teste = self._json.get('probe', {})
+            self._teste = ConfigTeste(
+                tentativas=_numero(_teste.get('retries', self._teste.tentativas), 'probe.retries',
+                                   inclusivo=True, inteiro=True),
+                orcamento=_numero(_teste.get('budget', self._teste.orcamento), 'probe.budget'),
+                timeout_adaptativo=_teste.get('adaptive_timeout', self._teste.timeout_adaptativo),
+                percentil=_numero(_teste.get('timeout_percentile', self._teste.percentil), 'probe.timeout_percentile'),
+                fator=_numero(_teste.get('timeout_factor', self._teste.fator), 'probe.timeout_factor'),
+                timeout_minimo=_numero(_teste.get('min_timeout', self._teste.timeout_minimo), 'probe.min_timeout'),
+                amostras=_numero(_teste.get('min_samples', self._teste.amostras), 'probe.min_samples',
+                                 minimo=1, inclusivo=True, inteiro=True),
+                janela_coalescencia=_numero(_teste.get('coalesce_window', self._teste.janela_coalescencia),
+                                            'probe.coalesce_window', inclusivo=True)
+            )
+            if not isinstance(self._teste.timeout_adaptativo, bool):
+                raise ValueError(f"probe.adaptive_timeout precisa ser true ou false: "
+                                 f"{self._teste.timeout_adaptativo!r}")
+            if self._teste.percentil > 1 or self._teste.orcamento > 1:
+                raise ValueError("probe.timeout_percentile e probe.budget precisam estar entre 0 e 1")
+
+            # intervalo adaptativo é opcional
+            if 'adaptive' in self._json:
+                _adaptativo = self._json['adaptive']
+                self._adaptativo = ConfigAdaptativo(
+                    intervalo_maximo=_numero(_adaptativo['max_interval'], 'adaptive.max_interval'),
+                    fator=_numero(_adaptativo.get('factor', ConfigAdaptativo.fator), 'adaptive.factor', minimo=1),
+                    estaveis=_numero(_adaptativo.get('stable_probes', ConfigAdaptativo.estaveis),
+                                     'adaptive.stable_probes', inteiro=True),
+                    intervalo_rapido=_opcional(_adaptativo.get('fast_interval'), 'adaptive.fast_interval')
+                )
 
             # indo para cada modulo encontrado
+            nomes = set()
             for m in self._json['modules']:
                 nome = m['name']
+                if not isinstance(nome, str) or not nome or len(nome.encode()) > NOME_MAX:
+                    raise ValueError(f"nome de módulo inválido (vazio ou maior que {NOME_MAX} bytes): {nome}")
+                if nome in nomes:
+                    # os status, métricas e notificações são identificados pelo nome do módulo
+                    raise ValueError(f"nome de módulo repetido: {nome}")
+                nomes.add(nome)
                 statuspage_id = m['statuspage_id']
                 notify = m.get('notify')
+                frio = m.get('cold', False)
+                intervalo = _numero(m.get('interval', self._interval), f'interval do módulo {nome}')
+                timeout = _opcional(m.get('timeout'), f'timeout do módulo {nome}')
+                jitter = _numero(m.get('jitter', self._json.get('jitter', 0)), f'jitter do módulo {nome}',
+                                 inclusivo=True)
+                politica = _politica(m.get('policy', 'worst'), f'policy do módulo {nome}')
+                dependencias = m.get('depends_on', [])
+                if not isinstance(dependencias, list) or not all(isinstance(d, str) for d in dependencias):
+                    raise ValueError(f"depends_on do módulo {nome} precisa ser uma lista de nomes: "
+                                     f"{dependencias!r}")
+                dependencias = tuple(dict.fromkeys(dependencias))
+                adaptativo = m.get('adaptive', True)
+                if not isinstance(adaptativo, bool):
+                    raise ValueError(f"adaptive do módulo {nome} precisa ser true ou false: {adaptativo!r}")
 
                 # acessando cada teste dentro do modulo
+                testes: List[Modulo] = []
                 for t in m['test']:
                     if t['type'] == 'http':
                         tipo = TipoModulo.HTTP
                         params = ParamsHTTP(
                             url=t['url'],
-                            metodo=TipoMetodoHTTP.GET if t['method'].lower() == 'get' else TipoMetodoHTTP.POST
+                            metodo=_metodo(t['method'], f'method do módulo {nome}')
                         )
                     elif t['type'] == 'port':
                         tipo = TipoModulo.PORT
+                        # um único alvo (host e port), ou vários (targets)
+                        if 'targets' in t:
+                            alvos = [_alvo(a, f'targets do módulo {nome}') for a in t['targets']]
+                            if not alvos:
+                                raise ValueError(f"targets do módulo {nome} vazio")
+                        else:
+                            alvos = [(t['host'], _numero(t['port'], f'port do módulo {nome}', inteiro=True))]
                         params = ParamsPort(
-                            host=t['host'],
-                            port=t['port']
+                            host=alvos[0][0],
+                            port=alvos[0][1],
+                            alvos=alvos,
+                            minimo=_minimo(t.get('require', 'all'), f'require do módulo {nome}', len(alvos))
                         )
                     elif t['type'] == 'size':
                         tipo = TipoModulo.SIZE
                         params = ParamsSize(
                             url=t['url'],
-                            metodo=TipoMetodoHTTP.GET if t['method'].lower() == 'get' else TipoMetodoHTTP.POST
-
+                            # o teste size precisa do corpo da resposta
+                            metodo=_metodo(t['method'], f'method do módulo {nome}',
+                                           permitidos=(TipoMetodoHTTP.GET, TipoMetodoHTTP.POST))
                         )
                     else:
                         # tipo invalido. pulando...
                         continue
 
-                    # adicionando um modulo para cada teste
+                    testes.append(
+                        Modulo(nome, tipo, params, notify, statuspage_id,
+                               frio=frio, intervalo=intervalo, timeout=timeout, jitter=jitter,
+                               adaptativo=adaptativo, dependencias=dependencias)
+                    )
+
+                # um módulo com vários testes os executa juntos, publicando um único status
+                if len(testes) == 1:
+                    self._modules.append(testes[0])
+                elif testes:
                     self._modules.append(
-                        Modulo(nome, tipo, params, notify, statuspage_id)
+                        Modulo(nome, TipoModulo.COMPOSITE, ParamsComposto(testes, politica), notify, statuspage_id,
+                               frio=frio, intervalo=intervalo, timeout=timeout, jitter=jitter,
+                               adaptativo=adaptativo, dependencias=dependencias)
                     )
 
+            # os módulos são testados depois das suas dependências
+            self._modules = _ordenar_dependencias(self._modules)
+            _agrupar_endpoints(self._modules)
+
         except KeyError as e:
             logging.exception("Chave não encontrada na configuração: %s", e)
             raise InvalidConfigFile()
@@ -115,6 +450,10 @@ class Configuracao:
         except IndexError as e:
             logging.exception("Indice inválido na configuração: %s", e)
             raise InvalidConfigFile()
+        except (TypeError, AttributeError) as e:
+            # valor com o tipo errado (como uma tabela no lugar de um texto)
+            logging.exception("Tipo inválido na configuração: %s", e)
+            raise InvalidConfigFile()
 
     @property
     def version(self):
@@ -128,6 +467,21 @@ class Configuracao:
             raise RuntimeError("Configuração não efetuada com sucesso [interval é None]")
         return self._interval
 
+    @property
+    def concurrency(self) -> int:
+        """Quantidade máxima de testes executando ao mesmo tempo"""
+        return self._concorrencia
+
+    @property
+    def workers(self) -> int:
+        """Quantidade de processos que executam os testes"""
+        return self._processos
+
+    @property
+    def reload_interval(self) -> float:
+        """Intervalo entre as verificações de alteração do arquivo de configuração"""
+        return self._recarregamento
+
     @property
     def port(self):
         """Porta para servir o client para o prometheus"""
@@ -150,6 +504,41 @@ class Configuracao:
         """Configurações do redis"""
         return self._redis
 
+    @property
+    def http(self) -> ConfigHTTP:
+        """Configurações do pool de conexões HTTP"""
+        return self._http
+
+    @property
+    def dns(self) -> ConfigDNS:
+        """Configurações do resolvedor de nomes"""
+        return self._dns
+
+    @property
+    def metrics(self) -> ConfigMetricas:
+        """Configurações das métricas exportadas"""
+        return self._metricas
+
+    @property
+    def cluster(self) -> Optional[ConfigCluster]:
+        """Configurações da divisão entre nós, ou None caso o monitor execute sozinho"""
+        return self._cluster
+
+    @property
+    def history(self) -> Optional[ConfigHistorico]:
+        """Configurações do histórico em disco, ou None caso ele não seja guardado"""
+        return self._historico
+
+    @property
+    def probe(self) -> ConfigTeste:
+        """Configurações das confirmações de falha e do timeout adaptativo dos testes"""
+        return self._teste
+
+    @property
+    def adaptive(self) -> Optional[ConfigAdaptativo]:
+        """Configurações do intervalo adaptativo, ou None caso os intervalos sejam fixos"""
+        return self._adaptativo
+
     @property
     def modules(self) -> List[Modulo]:
         """Lista de módulos a serem testados"""
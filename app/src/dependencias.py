@@ -0,0 +1,82 @@
+"""dependencias.py
+
+Contém a implementação do GrafoDependencias, que acompanha o status dos módulos
+ligados por dependências (`depends_on`) testados neste processo.
+
+Enquanto uma dependência de um módulo está fora do ar, o módulo não é testado: ele é
+marcado como inacessível, com a dependência como causa. Quando a própria dependência
+está inacessível, a causa é a dependência dela (a causa raiz). Somente a causa raiz é
+notificada no Discord, com a lista dos módulos afetados.
+"""
+from enums import Status
+from models import Modulo
+from historico import DISPONIVEIS
+
+from typing import Dict, Iterable, List, Optional
+
+
+class GrafoDependencias:
+    """Dependências entre os módulos e os últimos status dos módulos ligados a elas"""
+
+    def __init__(self, modulos: Iterable[Modulo] = ()):
+        """Inicializa o grafo
+
+        Args:
+            modulos (Iterable[Modulo]): módulos da configuração
+        """
+        self._modulos: Dict[str, Modulo] = {}
+        self._dependentes: Dict[str, List[str]] = {}
+        self._status: Dict[str, Status] = {}
+        self._causas: Dict[str, str] = {}    # causa raiz de cada módulo inacessível
+        self.atualizar(modulos)
+
+    def atualizar(self, modulos: Iterable[Modulo]):
+        """Substitui as dependências pelas dos módulos fornecidos (como ao recarregar a configuração),
+        descartando o status dos módulos que deixaram de existir
+        """
+        self._modulos = {m.nome: m for m in modulos if m.grupo is not None}
+        self._dependentes = {}
+        for m in self._modulos.values():
+            for d in m.dependencias:
+                self._dependentes.setdefault(d, []).append(m.nome)
+        self._status = {n: s for n, s in self._status.items() if n in self._modulos}
+        self._causas = {n: c for n, c in self._causas.items() if n in self._modulos and c in self._modulos}
+
+    def registrar(self, nome: str, status: Optional[Status], causa: Optional[str] = None):
+        """Registra o resultado de um módulo
+
+        Args:
+            nome (str): nome do módulo
+            status (Status, optional): status do módulo. UNKNOWN (ou None) não altera o status conhecido
+            causa (str, optional): causa raiz, caso o módulo tenha sido marcado como inacessível
+        """
+        if nome not in self._modulos or status is None or status == Status.UNKNOWN:
+            return
+        self._status[nome] = status
+        if causa is not None:
+            self._causas[nome] = causa
+        else:
+            self._causas.pop(nome, None)
+
+    def causa(self, modulo: Modulo) -> Optional[str]:
+        """Causa raiz que torna o módulo inacessível, ou None caso ele deva ser testado
+
+        Uma dependência cujo status ainda não é conhecido não impede o teste
+        """
+        for d in modulo.dependencias:
+            status = self._status.get(d)
+            if status is not None and status not in DISPONIVEIS:
+                return self._causas.get(d, d)
+        return None
+
+    def afetados(self, nome: str) -> List[Modulo]:
+        """Módulos que dependem (direta ou indiretamente) do módulo, dos mais próximos aos mais distantes"""
+        vistos: Dict[str, Modulo] = {}
+        fila = list(self._dependentes.get(nome, []))
+        while fila:
+            atual = fila.pop(0)
+            if atual in vistos:
+                continue
+            vistos[atual] = self._modulos[atual]
+            fila.extend(self._dependentes.get(atual, []))
+        return list(vistos.values())
@@ -11,12 +11,21 @@ class TipoModulo(Enum):
     HTTP = 1
     PORT = 2
     SIZE = 3
+    COMPOSITE = 4   # vários testes combinados em um único status
+
+
+class TipoPolitica(Enum):
+    """Políticas para combinar os resultados dos testes de um módulo composto"""
+    WORST = 1       # o pior status entre os testes
+    MAJORITY = 2    # o status da maioria (disponível ou fora do ar) dos testes
+    ALL = 3         # todos os testes precisam estar disponíveis
 
 
 class TipoMetodoHTTP(Enum):
     """Tipos possíveis de método HTTP"""
     GET = 1
     POST = 2
+    HEAD = 3
 
 
 class Status(Enum):
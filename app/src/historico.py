@@ -0,0 +1,265 @@
+"""historico.py
+
+Contém a implementação do Historico, que guarda o resultado de todos os testes
+em disco, e permite consultar a disponibilidade de um módulo em qualquer janela.
+
+Cada módulo tem o seu próprio arquivo, mapeado em memória (mmap), com um cabeçalho
+e uma quantidade fixa de registros de tamanho fixo, usados como um buffer circular:
+quando o arquivo enche, os registros mais antigos são sobrescritos. Cada registro
+ocupa 18 bytes (horário, status, código http, ocupação, duração e dois contadores).
+
+Os contadores de cada registro acumulam, desde a criação do arquivo, quantos testes
+tiveram resultado (status diferente de UNKNOWN) e quantos deles encontraram o módulo
+disponível. Como os registros estão em ordem de horário, a disponibilidade de uma
+janela é calculada com duas buscas binárias e a diferença dos contadores, sem ler os
+registros dentro da janela.
+
+Os arquivos são escritos somente pelo processo que testa o módulo, e podem ser
+lidos por outros processos (como o processo principal no modo com vários trabalhadores).
+"""
+import os
+import mmap
+import struct
+import hashlib
+import logging
+from time import time
+
+from enums import Status
+from tabela import NOME_MAX
+from models import ConfigHistorico, RegistroHistorico
+
+from typing import Dict, Iterator, Optional, Tuple
+
+_MAGICO = b'MHST'
+_VERSAO = 1
+_CABECALHO = struct.Struct(f'<4sHHIQ{NOME_MAX}s')  # mágico, versão, tamanho do registro, capacidade, total, nome
+_REGISTRO = struct.Struct('<IBBHHII')   # horário, status, ocupação, código, duração, disponíveis, com resultado
+_MASCARA = 0xFFFFFFFF
+
+_SEM_OCUPACAO = 0xFF        # ocupação (%) ausente
+_DURACAO_MAX = 0xFFFF       # duração (ms) máxima armazenada
+
+# status em que o módulo é considerado disponível
+DISPONIVEIS = (Status.OPERATIONAL, Status.DEGRADED_PERFORMANCE)
+
+
+def _arquivo(diretorio: str, nome: str) -> str:
+    """Path do arquivo de histórico de um módulo"""
+    return os.path.join(diretorio, hashlib.blake2b(nome.encode(), digest_size=10).hexdigest() + '.hist')
+
+
+class LogHistorico:
+    """Arquivo de histórico de um módulo"""
+
+    def __init__(self, caminho: str, nome: Optional[str] = None, capacidade: Optional[int] = None):
+        """Abre um arquivo de histórico
+
+        Args:
+            caminho (str): path do arquivo
+            nome (str, optional): nome do módulo. Com o nome e a capacidade, o arquivo é aberto
+                para escrita, e criado caso não exista. Sem eles, é aberto somente para leitura
+            capacidade (int, optional): quantidade de registros de um arquivo novo. Um arquivo
+                existente mantém a sua capacidade
+
+        Raises:
+            OSError: caso o arquivo não possa ser aberto (ou não exista, na leitura)
+            ValueError: caso o arquivo não seja um histórico válido
+        """
+        escrita = capacidade is not None
+        if escrita and not os.path.exists(caminho):
+            with open(caminho, 'wb') as f:
+                f.write(_CABECALHO.pack(_MAGICO, _VERSAO, _REGISTRO.size, capacidade, 0, nome.encode()))
+                f.truncate(_CABECALHO.size + capacidade * _REGISTRO.size)
+
+        with open(caminho, 'r+b' if escrita else 'rb') as f:
+            self._mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if escrita else mmap.ACCESS_READ)
+        magico, versao, tamanho, self.capacidade, _, nome_arquivo = _CABECALHO.unpack_from(self._mapa, 0)
+        if magico != _MAGICO or versao != _VERSAO or tamanho != _REGISTRO.size:
+            self._mapa.close()
+            raise ValueError(f"{caminho} não é um arquivo de histórico válido")
+        self.nome: str = nome_arquivo.rstrip(b'\0').decode()
+        if escrita and capacidade != self.capacidade:
+            logging.warning("Histórico de %s mantém a capacidade de %d registros", self.nome, self.capacidade)
+
+    @property
+    def total(self) -> int:
+        """Quantidade de registros escritos desde a criação do arquivo"""
+        return struct.unpack_from('<Q', self._mapa, 12)[0]
+
+    def _limites(self) -> Tuple[int, int]:
+        """Índices (desde a criação do arquivo) do registro mais antigo ainda no arquivo, e do seguinte ao último"""
+        total = self.total
+        return max(0, total - self.capacidade), total
+
+    def _ler(self, indice: int) -> Tuple[int, int, int, int, int, int, int]:
+        """Lê o registro de um índice"""
+        return _REGISTRO.unpack_from(self._mapa, _CABECALHO.size + (indice % self.capacidade) * _REGISTRO.size)
+
+    def adicionar(self,
+                  status: Status,
+                  duracao: Optional[float] = None,
+                  codigo: Optional[int] = None,
+                  ocupacao: Optional[float] = None,
+                  horario: Optional[float] = None):
+        """Adiciona o resultado de um teste
+
+        Args:
+            status (Status): status do teste
+            duracao (float, optional): duração (em segundos) do teste
+            codigo (int, optional): código http da resposta
+            ocupacao (float, optional): ocupação (entre 0 e 1) de um teste SIZE
+            horario (float, optional): horário (unix) do teste. Default é agora.
+        """
+        inicio, total = self._limites()
+        disponiveis, com_resultado = self._ler(total - 1)[5:] if total else (0, 0)
+        if status != Status.UNKNOWN:
+            com_resultado += 1
+            if status in DISPONIVEIS:
+                disponiveis += 1
+
+        _REGISTRO.pack_into(
+            self._mapa, _CABECALHO.size + (total % self.capacidade) * _REGISTRO.size,
+            int(horario if horario is not None else time()),
+            status.value,
+            _SEM_OCUPACAO if ocupacao is None else max(0, min(100, round(ocupacao * 100))),
+            codigo or 0,
+            _DURACAO_MAX if duracao is None else min(_DURACAO_MAX - 1, round(duracao * 1000)),
+            disponiveis & _MASCARA,
+            com_resultado & _MASCARA
+        )
+        # o total só é atualizado após o registro, para leitores em outros processos
+        struct.pack_into('<Q', self._mapa, 12, total + 1)
+
+    def _buscar(self, horario: float) -> int:
+        """Índice do primeiro registro com horário maior ou igual ao fornecido"""
+        baixo, alto = self._limites()
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            if self._ler(meio)[0] < horario:
+                baixo = meio + 1
+            else:
+                alto = meio
+        return baixo
+
+    def _contadores_antes(self, indice: int) -> Tuple[int, int]:
+        """Contadores acumulados antes do registro de um índice"""
+        _, status, _, _, _, disponiveis, com_resultado = self._ler(indice)
+        if status != Status.UNKNOWN.value:
+            com_resultado -= 1
+            if Status(status) in DISPONIVEIS:
+                disponiveis -= 1
+        return disponiveis, com_resultado
+
+    def disponibilidade(self, inicio: float, fim: float) -> Optional[float]:
+        """Fração dos testes com resultado entre `inicio` e `fim` que encontraram o módulo disponível
+
+        Args:
+            inicio (float): horário (unix) inicial, inclusivo
+            fim (float): horário (unix) final, exclusivo
+
+        Returns:
+            A disponibilidade entre 0 e 1, ou None caso não haja testes com resultado na janela
+        """
+        primeiro, ultimo = self._buscar(inicio), self._buscar(fim) - 1
+        if primeiro > ultimo:
+            return None
+        disponiveis_antes, com_resultado_antes = self._contadores_antes(primeiro)
+        _, _, _, _, _, disponiveis, com_resultado = self._ler(ultimo)
+        com_resultado = (com_resultado - com_resultado_antes) & _MASCARA
+        if com_resultado == 0:
+            return None
+        return ((disponiveis - disponiveis_antes) & _MASCARA) / com_resultado
+
+    def registros(self, inicio: float, fim: float) -> Iterator[RegistroHistorico]:
+        """Registros entre `inicio` (inclusivo) e `fim` (exclusivo), em ordem"""
+        for i in range(self._buscar(inicio), self._buscar(fim)):
+            horario, status, ocupacao, codigo, duracao, _, _ = self._ler(i)
+            yield RegistroHistorico(
+                horario=horario,
+                status=Status(status),
+                duracao=None if duracao == _DURACAO_MAX else duracao / 1000,
+                codigo=codigo or None,
+                ocupacao=None if ocupacao == _SEM_OCUPACAO else ocupacao / 100
+            )
+
+    def fechar(self):
+        """Fecha o mapeamento do arquivo"""
+        self._mapa.close()
+
+
+class Historico:
+    """Histórico dos resultados de todos os módulos, um arquivo por módulo"""
+
+    def __init__(self, config: ConfigHistorico):
+        """Inicializa o histórico, criando o diretório dos arquivos caso necessário
+
+        Args:
+            config (ConfigHistorico): configurações do histórico
+        """
+        self.config: ConfigHistorico = config
+        os.makedirs(config.path, exist_ok=True)
+        self._logs: Dict[str, LogHistorico] = {}
+
+    def registrar(self,
+                  nome: str,
+                  status: Status,
+                  duracao: Optional[float] = None,
+                  codigo: Optional[int] = None,
+                  ocupacao: Optional[float] = None):
+        """Adiciona o resultado de um teste ao arquivo do módulo. Falhas de escrita são somente registradas no log
+
+        Args:
+            nome (str): nome do módulo
+            status (Status): status do teste
+            duracao (float, optional): duração (em segundos) do teste
+            codigo (int, optional): código http da resposta
+            ocupacao (float, optional): ocupação (entre 0 e 1) de um teste SIZE
+        """
+        try:
+            log = self._logs.get(nome)
+            if log is None:
+                log = LogHistorico(_arquivo(self.config.path, nome), nome, self.config.max_records)
+                self._logs[nome] = log
+            log.adicionar(status, duracao, codigo, ocupacao)
+        except (OSError, ValueError) as e:
+            logging.error("Erro ao escrever o histórico de %s: %s", nome, e)
+
+    def _leitura(self, nome: str) -> Optional[LogHistorico]:
+        """Abre o arquivo de um módulo para leitura, ou None caso ele não tenha histórico"""
+        try:
+            return LogHistorico(_arquivo(self.config.path, nome))
+        except (OSError, ValueError):
+            return None
+
+    def disponibilidade(self, nome: str, inicio: float, fim: float) -> Optional[float]:
+        """Disponibilidade (entre 0 e 1) de um módulo entre `inicio` e `fim` (horários unix),
+        ou None caso não haja testes com resultado na janela
+        """
+        log = self._leitura(nome)
+        if log is None:
+            return None
+        try:
+            return log.disponibilidade(inicio, fim)
+        finally:
+            log.fechar()
+
+    def registros(self, nome: str, inicio: float, fim: float, limite: Optional[int] = None):
+        """Registros de um módulo entre `inicio` (inclusivo) e `fim` (exclusivo), até `limite` registros"""
+        log = self._leitura(nome)
+        if log is None:
+            return []
+        try:
+            resultado = []
+            for registro in log.registros(inicio, fim):
+                if limite is not None and len(resultado) >= limite:
+                    break
+                resultado.append(registro)
+            return resultado
+        finally:
+            log.fechar()
+
+    def fechar(self):
+        """Fecha os arquivos abertos para escrita"""
+        for log in self._logs.values():
+            log.fechar()
+        self._logs = {}
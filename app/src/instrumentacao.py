@@ -0,0 +1,105 @@
+"""instrumentacao.py
+
+Contém as ferramentas usadas pelo monitor para medir a si mesmo:
+
+    - `medir_chamada` e `medido`, que observam a duração (e o resultado) das chamadas aos
+      serviços externos (redis, discord e statuspage) em `monitor_external_call_seconds`;
+    - `ExecutorMonitorado`, o pool de threads padrão do event loop (usado por `asyncio.to_thread`),
+      que conta as tarefas na fila e em execução, para medir a saturação do pool.
+
+As demais métricas (testes ativos, atraso do event loop, prazos pulados e estourados, filas)
+são coletadas pelo Motor.
+"""
+import os
+import functools
+from time import perf_counter
+from threading import Lock
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from prom import TipoPrometheus, Prometheus
+
+from typing import Callable, Iterator, Optional
+
+SERVICO_REDIS = 'redis'
+SERVICO_DISCORD = 'discord'
+SERVICO_STATUSPAGE = 'statuspage'
+
+
+class Medicao:
+    """Resultado de uma chamada medida. Uma chamada que levanta uma exceção é sempre um erro"""
+    __slots__ = ('resultado',)
+
+    def __init__(self):
+        self.resultado: str = 'ok'
+
+    def falhou(self):
+        """Marca a chamada como um erro, mesmo sem exceção (como uma resposta http de erro)"""
+        self.resultado = 'error'
+
+
+@contextmanager
+def medir_chamada(servico: str) -> Iterator[Medicao]:
+    """Mede a duração de uma chamada a um serviço externo
+
+    Args:
+        servico (str): nome do serviço (redis, discord ou statuspage)
+    """
+    medicao = Medicao()
+    inicio = perf_counter()
+    try:
+        yield medicao
+    except BaseException:
+        medicao.falhou()
+        raise
+    finally:
+        Prometheus.observar(TipoPrometheus.EXTERNAL_CALL, perf_counter() - inicio, servico, medicao.resultado)
+
+
+def medido(servico: str) -> Callable[[Callable], Callable]:
+    """Decorador que mede cada chamada da função como uma chamada ao serviço fornecido"""
+    def decorador(funcao: Callable) -> Callable:
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            with medir_chamada(servico):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorador
+
+
+class ExecutorMonitorado(ThreadPoolExecutor):
+    """Pool de threads que conta as tarefas aguardando uma thread e em execução"""
+
+    def __init__(self, max_workers: Optional[int] = None, thread_name_prefix: str = ''):
+        """Inicializa o pool
+
+        Args:
+            max_workers (int, optional): quantidade máxima de threads. Default é o mesmo do asyncio
+            thread_name_prefix (str): prefixo do nome das threads
+        """
+        self.tamanho: int = max_workers if max_workers is not None else min(32, (os.cpu_count() or 1) + 4)
+        super().__init__(max_workers=self.tamanho, thread_name_prefix=thread_name_prefix)
+        self._contagem = Lock()
+        self.na_fila: int = 0
+        self.executando: int = 0
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        with self._contagem:
+            self.na_fila += 1
+        try:
+            return super().submit(self._executar, fn, args, kwargs)
+        except BaseException:
+            with self._contagem:
+                self.na_fila -= 1
+            raise
+
+    def _executar(self, fn: Callable, args: tuple, kwargs: dict):
+        """Executa uma tarefa em uma thread do pool, atualizando as contagens"""
+        with self._contagem:
+            self.na_fila -= 1
+            self.executando += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._contagem:
+                self.executando -= 1
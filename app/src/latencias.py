@@ -0,0 +1,55 @@
+"""latencias.py
+
+Contém a implementação da JanelaLatencias, que guarda as durações recentes dos testes
+bem-sucedidos de um módulo para calcular o seu timeout adaptativo.
+
+O timeout adaptativo é um percentil alto das latências recentes multiplicado por uma
+margem, limitado entre o timeout mínimo e o timeout configurado do módulo. Enquanto não
+houver amostras suficientes, o timeout configurado é usado.
+"""
+import math
+from collections import deque
+
+from models import ConfigTeste
+
+from typing import Deque, Optional
+
+
+class JanelaLatencias:
+    """Durações (s) dos últimos testes bem-sucedidos de um módulo"""
+
+    TAMANHO = 100   # quantidade de durações guardadas
+
+    def __init__(self, config: ConfigTeste):
+        """Inicializa a janela vazia
+
+        Args:
+            config (ConfigTeste): configurações do timeout adaptativo
+        """
+        self.config: ConfigTeste = config
+        self._duracoes: Deque[float] = deque(maxlen=self.TAMANHO)
+
+    def __len__(self) -> int:
+        return len(self._duracoes)
+
+    def registrar(self, duracao: float):
+        """Adiciona a duração de um teste bem-sucedido, descartando a mais antiga"""
+        self._duracoes.append(duracao)
+
+    def percentil(self) -> Optional[float]:
+        """Percentil configurado das durações, ou None caso não haja amostras suficientes"""
+        if not self._duracoes or len(self._duracoes) < self.config.amostras:
+            return None
+        ordenadas = sorted(self._duracoes)
+        return ordenadas[max(0, math.ceil(self.config.percentil * len(ordenadas)) - 1)]
+
+    def timeout(self, padrao: float) -> float:
+        """Timeout (s) adaptativo do módulo
+
+        Args:
+            padrao (float): timeout configurado, que é também o limite superior
+        """
+        percentil = self.percentil()
+        if not self.config.timeout_adaptativo or percentil is None:
+            return padrao
+        return min(padrao, max(self.config.timeout_minimo, percentil * self.config.fator))
@@ -3,83 +3,52 @@
 Contém o script para iniciar o loop de testadores
 e do client do prometheus
 """
+import asyncio
 import logging
-from time import sleep
-from threading import Thread
-from prometheus_client import start_http_server
 
 from prom import Prometheus
-from enums import TipoModulo
+from historico import Historico
+from servidor import ServidorMetricas, sla_do_registro
 from configuracao import Configuracao
-from armazenamento import Armazenamento
-from testador import TestadorPort, TestadorHTTP, TestadorSize
+from trabalhador import Supervisor, configurar_log, criar_sla, montar_motor
 
-from typing import List
-from models import Modulo
-from testador import TestadorBase
+ARQUIVO_CONFIGURACAO = 'config.toml'
 
 if __name__ == "__main__":
     # biblioteca de log
-    logging.basicConfig(
-        format='%(asctime)s [%(threadName)s] [%(levelname)s]: %(message)s',
-        datefmt='%Y-%m-%d %H-%M-%S',
-        level=logging.INFO
-    )
+    configurar_log()
 
     # cria as configurações
-    c = Configuracao('config.toml')
+    c = Configuracao(ARQUIVO_CONFIGURACAO)
     logging.info("Configurações carregadas")
 
-    # cria os gauges do client do prometheus
-    Prometheus.start()
-    start_http_server(port=c.port)
-    logging.info(f"Servindo client na porta {c.port}")
-
-    # criando os testadores
-    TestadorBase.set_version(c.version)
-    testadores: List[TestadorBase] = []
-
-    for m in c.modules:     # type: Modulo
-        if m.tipo == TipoModulo.HTTP:
-            testador = TestadorHTTP(
-                modulo=m,
-                armazenamento=Armazenamento(c.redis.host, c.redis.port),
-                discord=c.discord,
-                statuspage=c.statuspage
-            )
-        elif m.tipo == TipoModulo.PORT:
-            testador = TestadorPort(
-                modulo=m,
-                armazenamento=Armazenamento(c.redis.host, c.redis.port),
-                discord=c.discord,
-                statuspage=c.statuspage
-            )
-        elif m.tipo == TipoModulo.SIZE:
-            testador = TestadorSize(
-                modulo=m,
-                armazenamento=Armazenamento(c.redis.host, c.redis.port),
-                discord=c.discord,
-                statuspage=c.statuspage
-            )
-        else:
-            raise NotImplemented(f"Tipo de módulo {m.tipo.name} não suportado")
-
-        testadores.append(testador)
-    logging.info("%d testadores carregados e criados", len(testadores))
-
-    # loop dos testadores
-    logging.info("Iniciando loop dos testadores")
-    while True:
-        for t in testadores:
-            # cria uma thread para cada testador e executa
-            logging.info("Executando testador [%s]", t.modulo.nome)
-            thread = Thread(target=t.testar, name=f'thread-{t.modulo.nome}')
-            thread.start()
-
-        try:
-            sleep(c.interval)
-        except KeyboardInterrupt:
-            # para o loop com um CTRL+C
-            break
+    # o histórico é escrito pelos processos que testam os módulos, e lido pelo servidor de métricas
+    historico = Historico(c.history) if c.history is not None else None
+
+    if c.workers > 1:
+        # os testes são executados pelos trabalhadores, e este processo somente serve as métricas
+        logging.info("Iniciando %d trabalhadores (concorrência máxima: %d cada)", c.workers, c.concurrency)
+        supervisor = Supervisor(c, ARQUIVO_CONFIGURACAO, c.workers)
+        supervisor.servicos.append(
+            ServidorMetricas(c.port, registro=supervisor.registro, tabela=supervisor.renderizar_tabela,
+                             historico=historico, sla=lambda: sla_do_registro(supervisor.registro))
+        )
+        principal = supervisor.executar()
+    else:
+        # cria os gauges do client do prometheus
+        Prometheus.start(buckets=c.metrics.buckets, max_series=c.metrics.max_series)
+
+        # loop dos testadores
+        logging.info("Iniciando loop dos testadores (concorrência máxima: %d)", c.concurrency)
+        sla = criar_sla(c)
+        motor = montar_motor(c, ARQUIVO_CONFIGURACAO, sla=sla)
+        motor.servicos.append(ServidorMetricas(c.port, historico=historico, sla=sla.resumos))
+        principal = motor.executar()
+
+    try:
+        asyncio.run(principal)
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        # para o loop com um CTRL+C
+        pass
 
     logging.info("Fechando...")
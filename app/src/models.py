@@ -6,15 +6,18 @@ que permite armazenar informações sobre um módulo a ser testado
 
 __all__ = [
     "Modulo",
-    "ParamsHTTP", "ParamsPort", "ParamsSize",
-    "ConfigDiscord", "ConfigStatuspage", "ConfigRedis"
+    "ParamsHTTP", "ParamsPort", "ParamsSize", "ParamsComposto",
+    "ConfigDiscord", "ConfigStatuspage", "ConfigRedis", "ConfigHTTP", "ConfigMetricas",
+    "ConfigCluster", "ConfigDNS",
+    "ConfigHistorico", "ConfigAdaptativo", "ConfigTeste",
+    "ResultadoPorta", "ResultadoTeste", "RegistroHistorico"
 ]
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-from enums import TipoModulo, TipoMetodoHTTP
+from enums import TipoModulo, TipoMetodoHTTP, TipoPolitica, Status
 
-from typing import List, Union
+from typing import Dict, List, Optional, Tuple, Union
 
 
 @dataclass
@@ -36,6 +39,48 @@ class ParamsPort:
     """Parâmetros de um módulo PORT"""
     host: str
     port: int
+    alvos: List[Tuple[str, int]] = field(default_factory=list)  # (host, porta) testados. Vazio é só host:port
+    minimo: Optional[int] = None    # alvos abertos para o módulo estar operacional. None são todos
+
+
+@dataclass
+class ParamsComposto:
+    """Parâmetros de um módulo com vários testes, combinados em um único status"""
+    testes: List['Modulo']                          # um módulo (com o mesmo nome) para cada teste
+    politica: TipoPolitica = TipoPolitica.WORST     # como os resultados dos testes são combinados
+
+
+@dataclass
+class RegistroHistorico:
+    """Resultado de um teste guardado no histórico"""
+    horario: int                        # horário (unix, em segundos) do teste
+    status: Status
+    duracao: Optional[float] = None     # duração (s) do teste, com precisão de milissegundos
+    codigo: Optional[int] = None        # código http da resposta
+    ocupacao: Optional[float] = None    # ocupação (entre 0 e 1) de um teste SIZE, com precisão de 1%
+
+
+@dataclass
+class ResultadoPorta:
+    """Resultado da verificação de uma porta"""
+    host: str
+    porta: int
+    aberta: bool
+    latencia: Optional[float] = None    # tempo (s) até a conexão ser estabelecida
+    erro: Optional[str] = None          # motivo da falha
+
+
+@dataclass
+class ResultadoTeste:
+    """Resultado de um teste, compartilhado entre os módulos que testam o mesmo endpoint"""
+    status: Optional[Status]
+    informacao_adicional: Optional[str] = None
+    duracao: Optional[float] = None     # duração (s) do teste
+    codigo: Optional[int] = None        # código http da resposta
+    ocupacao: Optional[float] = None    # ocupação medida por um teste SIZE
+    fases: Dict[str, float] = field(default_factory=dict)           # duração (s) de cada fase
+    conexoes: List[Tuple[str, float]] = field(default_factory=list)  # latência (s) de cada alvo aberto
+    falha_dns: bool = False             # o teste ficou sem resultado por uma falha ao resolver o nome
 
 
 @dataclass
@@ -43,9 +88,21 @@ class Modulo:
     """Informações de um módulo a ser testado"""
     nome: str
     tipo: TipoModulo
-    params: Union[ParamsHTTP, ParamsPort, ParamsSize]
+    params: Union[ParamsHTTP, ParamsPort, ParamsSize, ParamsComposto]
     discords: List[str]
     statuspage: str
+    frio: bool = False                  # se True, não reutiliza conexões (mede o handshake)
+    intervalo: Optional[float] = None   # intervalo (s) entre os testes. None usa o intervalo global
+    timeout: Optional[float] = None     # tempo (s) máximo do teste. None usa o padrão do tipo
+    jitter: float = 0                   # atraso (s) aleatório máximo somado a cada teste
+    adaptativo: bool = True             # se False, o intervalo não é adaptado (com `[adaptive]` configurado)
+    dependencias: Tuple[str, ...] = ()  # nomes dos módulos dos quais este depende (`depends_on`)
+    grupo: Optional[str] = None         # módulos ligados por dependências ou pelo endpoint, testados juntos
+
+    @property
+    def chave_distribuicao(self) -> str:
+        """Chave usada para dividir os módulos entre processos e nós: o grupo, ou o próprio nome"""
+        return self.grupo if self.grupo is not None else self.nome
 
 
 @dataclass
@@ -54,6 +111,9 @@ class ConfigDiscord:
     infra_role: str
     ident: str
     token: str
+    histerese: float = 0    # tempo (s) que um novo status precisa se manter para ser notificado
+    janela: float = 2       # intervalo (s) entre os envios. Mudanças na mesma janela são enviadas juntas
+    url: str = 'https://discordapp.com/api/webhooks'    # url base dos webhooks
 
 
 @dataclass
@@ -61,6 +121,7 @@ class ConfigStatuspage:
     """Informações relativas à configuração do StatusPage"""
     api_key: str
     page_id: str
+    url: str = 'https://api.statuspage.io/v1'   # url base da api
 
 
 @dataclass
@@ -68,3 +129,68 @@ class ConfigRedis:
     """Informações relativas à configuração da conexão com o Redis"""
     host: str
     port: int
+    pool_size: Optional[int] = None     # conexões máximas no pool. None é ilimitado
+    flush_interval: float = 5           # intervalo (s) entre as escritas em lote no redis
+
+
+@dataclass
+class ConfigHTTP:
+    """Informações relativas ao pool de conexões HTTP"""
+    pool_size: int = 100            # conexões abertas no total
+    pool_size_per_host: int = 10    # conexões abertas por host (0 é ilimitado)
+    keepalive: float = 30           # tempo (s) que uma conexão ociosa é mantida
+    timeout: float = 5              # tempo (s) total de um request
+    connect_timeout: float = 3      # tempo (s) para estabelecer uma conexão
+    max_body: int = 65536           # tamanho (bytes) máximo do corpo lido de uma resposta
+
+
+@dataclass
+class ConfigDNS:
+    """Informações relativas ao resolvedor de nomes (DNS) compartilhado pelos testadores"""
+    ttl: float = 60             # tempo (s) máximo que uma resposta fica no cache
+    negative_ttl: float = 5     # tempo (s) que uma falha de resolução fica no cache
+    timeout: float = 2          # tempo (s) máximo de uma resolução
+    max_falhas: int = 3         # testes seguidos sem resolver o nome até o módulo ser considerado fora do ar
+
+
+@dataclass
+class ConfigMetricas:
+    """Informações relativas às métricas exportadas para o Prometheus"""
+    buckets: Optional[List[float]] = None   # limites (s) dos histogramas de duração. None usa o padrão
+    max_series: Optional[int] = None        # quantidade máxima de séries exportadas. None é ilimitado
+
+
+@dataclass
+class ConfigCluster:
+    """Informações relativas à divisão dos módulos entre vários nós do monitor"""
+    ident: str              # identificador único do nó
+    lease: float = 10       # tempo (s) sem sinal de vida até um nó ser considerado morto
+
+
+@dataclass
+class ConfigHistorico:
+    """Informações relativas ao histórico dos resultados em disco"""
+    path: str                       # diretório dos arquivos de histórico
+    max_records: int = 100000       # registros guardados de cada módulo. Os mais antigos são sobrescritos
+
+
+@dataclass
+class ConfigAdaptativo:
+    """Informações relativas ao intervalo adaptativo dos testes"""
+    intervalo_maximo: float                     # intervalo (s) máximo de um módulo estável
+    fator: float = 2                            # multiplicador do intervalo a cada passo
+    estaveis: int = 3                           # testes com o mesmo status para cada passo
+    intervalo_rapido: Optional[float] = None    # intervalo (s) de um módulo fora do ar. None usa o do módulo
+
+
+@dataclass
+class ConfigTeste:
+    """Informações relativas às confirmações de falha e ao timeout adaptativo dos testes"""
+    tentativas: int = 0                 # testes extras (ao mesmo tempo) para confirmar uma falha
+    orcamento: float = 1                # fração do intervalo do módulo para o teste e as confirmações
+    timeout_adaptativo: bool = False    # se True, o timeout segue as latências recentes do módulo
+    percentil: float = 0.99             # percentil das latências usado no timeout adaptativo
+    fator: float = 3                    # margem (multiplicador) sobre o percentil
+    timeout_minimo: float = 0.1         # timeout (s) adaptativo mínimo
+    amostras: int = 20                  # latências necessárias antes de adaptar o timeout
+    janela_coalescencia: float = 0      # tempo (s) em que o resultado de um endpoint é reaproveitado
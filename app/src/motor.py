@@ -0,0 +1,287 @@
+"""motor.py
+
+Contém a implementação do Motor, que executa os testadores
+como corrotinas em um único event loop do asyncio
+"""
+import random
+import asyncio
+import logging
+import threading
+
+from cache import CacheStatus
+from agendador import Agendador
+from adaptativo import FrequenciaAdaptativa
+from conexoes import PoolHTTP
+from testador import TestadorBase
+from prom import Prometheus, TipoPrometheus
+from instrumentacao import ExecutorMonitorado
+
+from typing import Coroutine, Dict, List, Optional, Protocol, Set
+
+
+class Servico(Protocol):
+    """Serviço executado em segundo plano pelo motor"""
+    async def executar(self):
+        ...
+
+
+class Motor:
+    """Executa cada testador no seu próprio intervalo, limitando a quantidade de testes simultâneos
+
+    Os testes são distribuídos ao longo do intervalo, ao invés de executarem
+    todos no mesmo instante. Caso o teste anterior de um módulo ainda esteja
+    em execução quando chegar o seu prazo, aquela execução é pulada.
+
+    Com a frequência adaptativa, o intervalo de cada módulo é recalculado depois
+    de cada teste, a partir do status encontrado.
+
+    O motor também exporta métricas sobre si mesmo, atualizadas a cada
+    INTERVALO_INSTRUMENTACAO segundos: testes em execução e aguardando vaga,
+    atraso do event loop, ocupação do pool de threads e escritas pendentes no redis.
+    """
+
+    INTERVALO_INSTRUMENTACAO = 1    # intervalo (s) entre as coletas das métricas do próprio motor
+
+    def __init__(self,
+                 testadores: List[TestadorBase],
+                 intervalo: int,
+                 concorrencia: int,
+                 pool_http: Optional[PoolHTTP] = None,
+                 cache: Optional[CacheStatus] = None,
+                 servicos: Optional[List[Servico]] = None,
+                 adaptativo: Optional[FrequenciaAdaptativa] = None
+                 ):
+        """Inicializa o motor
+
+        Args:
+            testadores (List[TestadorBase]): testadores a serem executados
+            intervalo (int): intervalo (em segundos) padrão, para módulos sem intervalo próprio
+            concorrencia (int): quantidade máxima de testadores executando ao mesmo tempo
+            pool_http (PoolHTTP, optional): pool de conexões HTTP usado pelos testadores.
+                O motor é responsável por abrir e fechar o pool. Default é None.
+            cache (CacheStatus, optional): cache de status usado pelos testadores. O motor
+                carrega o cache ao iniciar e executa as suas escritas periódicas. Default é None.
+            servicos (List[Servico], optional): serviços de segundo plano (como os despachantes
+                de notificações) executados enquanto o motor estiver rodando. Default é nenhum.
+            adaptativo (FrequenciaAdaptativa, optional): adapta o intervalo de cada módulo à
+                estabilidade do seu status. Default é None (intervalos fixos).
+        """
+        self.testadores: List[TestadorBase] = testadores
+        self.intervalo: int = intervalo
+        self.concorrencia: int = concorrencia
+        self.pool_http: Optional[PoolHTTP] = pool_http
+        self.cache: Optional[CacheStatus] = cache
+        self.servicos: List[Servico] = servicos if servicos is not None else []
+        self.adaptativo: Optional[FrequenciaAdaptativa] = adaptativo
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._agendador: Agendador = Agendador()
+        self._em_execucao: Dict[TestadorBase, asyncio.Task] = {}
+        self._tarefas: Set[asyncio.Task] = set()
+        self._despertar: Optional[asyncio.Event] = None
+        self._falha: Optional[BaseException] = None
+        self._executando: int = 0
+        self._executor: Optional[ExecutorMonitorado] = None
+
+    def _intervalo(self, testador: TestadorBase) -> float:
+        """Intervalo (em segundos) de um testador"""
+        return testador.modulo.intervalo if testador.modulo.intervalo is not None else self.intervalo
+
+    def _agendar(self, testador: TestadorBase, agora: float, fase: float):
+        """Agenda um testador de acordo com as configurações do seu módulo"""
+        modulo = testador.modulo
+        self._agendador.adicionar(
+            testador,
+            agora,
+            intervalo=self._intervalo(testador),
+            jitter=modulo.jitter,
+            fase=fase
+        )
+
+    async def adicionar(self, testador: TestadorBase, imediato: bool = False):
+        """Adiciona um testador a um motor em execução
+
+        O primeiro teste acontece em um momento aleatório do intervalo do módulo,
+        para não concentrar os testes adicionados juntos. O status armazenado
+        do módulo é carregado no cache antes do primeiro teste.
+
+        Args:
+            testador (TestadorBase): testador a ser adicionado
+            imediato (bool): executa o primeiro teste imediatamente (como ao assumir
+                os módulos de outro nó). Default é False.
+        """
+        if self.cache is not None:
+            try:
+                await asyncio.to_thread(self.cache.aquecer, [testador.modulo.nome])
+            except Exception as e:  # noqa
+                logging.error("Erro ao carregar o status do módulo %s: %s", testador.modulo.nome, e)
+        self.testadores.append(testador)
+        self._agendar(testador, asyncio.get_running_loop().time(), fase=0 if imediato else random.random())
+        if self._despertar is not None:
+            self._despertar.set()
+
+    def remover(self, testador: TestadorBase):
+        """Remove um testador do motor
+
+        Caso esteja em execução, o teste atual é cancelado, para que o seu resultado não
+        seja publicado (métricas, cache, notificações) depois da remoção
+        """
+        self._agendador.remover(testador)
+        if self.adaptativo is not None:
+            self.adaptativo.esquecer(testador)
+        self.testadores.remove(testador)
+        tarefa = self._em_execucao.pop(testador, None)
+        if tarefa is not None:
+            tarefa.cancel()
+
+    async def _executar_testador(self, testador: TestadorBase, prazo: float):
+        """Executa um testador, respeitando o limite de concorrência
+
+        Qualquer exceção do testador é registrada, para não interromper o motor
+
+        Args:
+            testador (TestadorBase): testador a ser executado
+            prazo (float): instante (no relógio do loop) em que o teste deveria começar
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._semaforo:
+                atraso = loop.time() - prazo
+                Prometheus.get(TipoPrometheus.SCHEDULE_LAG, testador.modulo.nome).set(atraso)
+                Prometheus.incrementar(TipoPrometheus.SCHEDULE_TICKS, 'started')
+
+                logging.info("Executando testador [%s]", testador.modulo.nome)
+                self._executando += 1
+                try:
+                    await testador.testar()
+                except Exception as e:  # noqa
+                    logging.exception("Erro inesperado no testador [%s]: %s", testador.modulo.nome, e)
+                finally:
+                    self._executando -= 1
+
+            # o teste (incluindo a espera por uma vaga) terminou depois do prazo seguinte
+            intervalo = self._agendador.intervalo(testador) or self._intervalo(testador)
+            Prometheus.observar(TipoPrometheus.CYCLE_RATIO, (loop.time() - prazo) / intervalo)
+            if loop.time() > prazo + intervalo:
+                Prometheus.incrementar(TipoPrometheus.SCHEDULE_TICKS, 'overrun')
+
+            if self.adaptativo is not None and testador.modulo.adaptativo:
+                novo = self.adaptativo.registrar(testador, testador.modulo.nome, testador.status,
+                                                 self._intervalo(testador))
+                if novo is not None:
+                    # o próximo teste é contado a partir do prazo deste, com o novo intervalo
+                    self._agendador.reagendar(testador, prazo, novo)
+        finally:
+            if self._em_execucao.get(testador) is asyncio.current_task():
+                del self._em_execucao[testador]
+
+    def _disparar(self, testador: TestadorBase, prazo: float):
+        """Cria a tarefa de um testador, caso ele não esteja em execução"""
+        if testador in self._em_execucao:
+            logging.warning("Testador [%s] ainda em execução, pulando", testador.modulo.nome)
+            Prometheus.incrementar(TipoPrometheus.SCHEDULE_TICKS, 'skipped')
+            return
+
+        self._em_execucao[testador] = self._criar_tarefa(self._executar_testador(testador, prazo))
+
+    def _criar_tarefa(self, corrotina: Coroutine, servico: bool = False) -> asyncio.Task:
+        """Cria uma tarefa, mantendo uma referência até que ela termine
+
+        Args:
+            corrotina (Coroutine): corrotina da tarefa
+            servico (bool): a tarefa é um serviço de segundo plano. Caso um serviço
+                termine com erro (como o servidor de métricas sem conseguir abrir a porta),
+                o motor é interrompido com esse erro. Default é False.
+        """
+        tarefa = asyncio.create_task(corrotina)
+        self._tarefas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas.discard)
+        if servico:
+            tarefa.add_done_callback(self._servico_terminado)
+        return tarefa
+
+    def _servico_terminado(self, tarefa: asyncio.Task):
+        """Interrompe o motor caso um serviço tenha terminado com erro"""
+        if tarefa.cancelled() or tarefa.exception() is None:
+            return
+        logging.error("Serviço de segundo plano terminou com erro, encerrando: %r", tarefa.exception())
+        if self._falha is None:
+            self._falha = tarefa.exception()
+        self._despertar.set()
+
+    async def _instrumentar(self):
+        """Loop de coleta das métricas do próprio motor
+
+        O atraso do event loop é o quanto um timer demora além do previsto para executar,
+        ou seja, o tempo que o loop passou ocupado (sem atender os demais timers e sockets)
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            inicio = loop.time()
+            await asyncio.sleep(self.INTERVALO_INSTRUMENTACAO)
+            atraso = loop.time() - inicio - self.INTERVALO_INSTRUMENTACAO
+            Prometheus.observar(TipoPrometheus.EVENT_LOOP_LAG, max(0.0, atraso))
+
+            Prometheus.definir(TipoPrometheus.ACTIVE_TESTS, self._executando, 'running')
+            Prometheus.definir(TipoPrometheus.ACTIVE_TESTS, len(self._em_execucao) - self._executando, 'waiting')
+            if self._executor is not None:
+                Prometheus.definir(TipoPrometheus.THREAD_POOL, self._executor.na_fila, 'queued')
+                Prometheus.definir(TipoPrometheus.THREAD_POOL, self._executor.executando, 'running')
+                Prometheus.definir(TipoPrometheus.THREAD_POOL, self._executor.tamanho, 'size')
+            Prometheus.definir(TipoPrometheus.THREADS, threading.active_count())
+            if self.cache is not None:
+                Prometheus.definir(TipoPrometheus.STORAGE_QUEUE, self.cache.pendentes)
+
+    async def executar(self):
+        """Loop principal do motor
+
+        Dispara os testadores cujo prazo já passou, e espera até o próximo prazo
+        """
+        self._semaforo = asyncio.Semaphore(self.concorrencia)
+        self._despertar = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        # as chamadas bloqueantes (redis, discord, getaddrinfo) usam o pool padrão do loop
+        self._executor = ExecutorMonitorado(thread_name_prefix='monitor')
+        loop.set_default_executor(self._executor)
+        self._criar_tarefa(self._instrumentar(), servico=True)
+
+        if self.pool_http is not None:
+            await self.pool_http.iniciar()
+        if self.cache is not None:
+            try:
+                await asyncio.to_thread(self.cache.aquecer, {t.modulo.nome for t in self.testadores})
+            except Exception as e:  # noqa
+                logging.error("Erro ao carregar os status do armazenamento: %s", e)
+            self._criar_tarefa(self.cache.executar(), servico=True)
+        for servico in self.servicos:
+            self._criar_tarefa(servico.executar(), servico=True)
+
+        # distribui os testadores igualmente ao longo do intervalo
+        agora = loop.time()
+        for i, testador in enumerate(self.testadores):
+            self._agendar(testador, agora, fase=i / len(self.testadores))
+
+        try:
+            while True:
+                if self._falha is not None:
+                    raise self._falha
+                agora = loop.time()
+                retirado = self._agendador.retirar(agora)
+                while retirado is not None:
+                    self._disparar(*retirado)
+                    retirado = self._agendador.retirar(agora)
+
+                proximo = self._agendador.proximo_prazo()
+                espera = proximo - loop.time() if proximo is not None else self.intervalo
+                # acorda antes do prazo caso um testador seja adicionado
+                self._despertar.clear()
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), max(0.0, espera))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for tarefa in list(self._tarefas):
+                tarefa.cancel()
+            if self.cache is not None:
+                await self.cache.descarregar()
+            if self.pool_http is not None:
+                await self.pool_http.fechar()
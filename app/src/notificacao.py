@@ -0,0 +1,238 @@
+"""notificacao.py
+
+Contém a implementação da FilaDiscord, que envia as notificações de mudança
+de status para o Discord fora do caminho dos testes.
+
+As mudanças que acontecem ao mesmo tempo (como uma queda de rede) são unidas em
+uma única mensagem. Uma mudança só é enviada depois de se manter pela janela de
+histerese: caso o módulo volte ao status anterior antes disso, nada é enviado.
+
+Um envio que falha por erro de conexão, 5xx ou 429 é repetido na próxima janela. As demais
+respostas 4xx são rejeições que não adianta repetir, e a mensagem é descartada.
+"""
+import asyncio
+import logging
+from time import time
+from requests import Response
+from dataclasses import dataclass, field
+from discord_webhook import DiscordWebhook
+
+from enums import Status
+from models import Modulo, ConfigDiscord
+from prom import Prometheus, TipoPrometheus
+from instrumentacao import SERVICO_DISCORD, medir_chamada
+
+from typing import Dict, List, Optional
+
+_CANAL = 'discord'
+_MAX_EMBEDS = 10    # quantidade máxima de embeds em uma mensagem do discord
+
+
+@dataclass
+class Transicao:
+    """Mudança de status de um módulo, aguardando envio"""
+    modulo: Modulo
+    anterior: Optional[Status]      # último status notificado
+    status: Status
+    informacao: Optional[str]
+    instante: float                 # momento (time()) em que o status atual começou
+    afetados: List[Modulo] = field(default_factory=list)    # dependentes inacessíveis por este módulo
+
+
+class FilaDiscord:
+    """Fila de notificações para o Discord"""
+
+    def __init__(self, config: ConfigDiscord, remetente: str, histerese: float = 0, janela: float = 2):
+        """Inicializa a fila
+
+        Args:
+            config (ConfigDiscord): configurações do discord
+            remetente (str): nome do remetente das mensagens
+            histerese (float): tempo (em segundos) que um novo status precisa se manter para ser notificado
+            janela (float): intervalo (em segundos) entre os envios. Mudanças dentro da mesma
+                janela são enviadas juntas
+        """
+        self.config: ConfigDiscord = config
+        self.url: str = f'{config.url}/{config.ident}/{config.token}'
+        self.remetente: str = remetente
+        self.histerese: float = histerese
+        self.janela: float = janela
+        self._pendentes: Dict[str, Transicao] = {}
+        self._notificados: Dict[str, Optional[Status]] = {}
+        self._enviando: Dict[str, Status] = {}      # status sendo enviados, ainda sem confirmação
+
+    @property
+    def pendentes(self) -> int:
+        """Quantidade de transições aguardando envio"""
+        return len(self._pendentes)
+
+    def notificar(self, modulo: Modulo, anterior: Optional[Status], status: Status, informacao: Optional[str],
+                  afetados: Optional[List[Modulo]] = None):
+        """Adiciona uma mudança de status na fila. Não é bloqueante
+
+        Args:
+            modulo (Modulo): módulo que mudou de status
+            anterior (Status, optional): status anterior do módulo
+            status (Status): novo status do módulo
+            informacao (str, optional): informação adicional do teste
+            afetados (List[Modulo], optional): módulos que dependem deste, inacessíveis enquanto ele
+                estiver fora do ar. Eles são listados na mensagem, e as suas roles são marcadas.
+        """
+        afetados = afetados if afetados is not None else []
+        nome = modulo.nome
+        notificado = self._enviando.get(nome, self._notificados.setdefault(nome, anterior))
+        pendente = self._pendentes.get(nome)
+
+        if status == notificado:
+            # voltou ao status já notificado antes da histerese: descarta
+            if pendente is not None:
+                logging.info("Notificação do módulo %s descartada (oscilação)", nome)
+                del self._pendentes[nome]
+        elif pendente is None or pendente.status != status:
+            self._pendentes[nome] = Transicao(modulo, notificado, status, informacao, time(), afetados)
+        else:
+            pendente.informacao, pendente.afetados = informacao, afetados
+
+        Prometheus.get(TipoPrometheus.NOTIFICATION_QUEUE, _CANAL).set(len(self._pendentes))
+
+    def _retirar_prontas(self) -> List[Transicao]:
+        """Retira da fila as transições que já passaram da histerese
+
+        As transições retiradas só são consideradas notificadas após a confirmação do envio
+        (ver `_confirmar` e `_devolver`)
+        """
+        agora = time()
+        prontas = [t for t in self._pendentes.values() if agora - t.instante >= self.histerese]
+        for t in prontas:
+            del self._pendentes[t.modulo.nome]
+            self._enviando[t.modulo.nome] = t.status
+        return prontas
+
+    def _confirmar(self, transicoes: List[Transicao]):
+        """Marca as transições como notificadas, após um envio com sucesso"""
+        for t in transicoes:
+            self._enviando.pop(t.modulo.nome, None)
+            self._notificados[t.modulo.nome] = t.status
+
+    def _devolver(self, transicoes: List[Transicao]):
+        """Devolve para a fila as transições de um envio que falhou, para serem enviadas na próxima janela
+
+        Caso o módulo tenha mudado de status durante o envio, a mudança mais nova é mantida,
+        e caso ele tenha voltado ao último status notificado, nada é enviado
+        """
+        for t in transicoes:
+            nome = t.modulo.nome
+            self._enviando.pop(nome, None)
+            notificado = self._notificados.get(nome)
+            pendente = self._pendentes.get(nome)
+            if pendente is None:
+                self._pendentes[nome] = t
+            elif pendente.status == notificado:
+                del self._pendentes[nome]
+            else:
+                pendente.anterior = notificado
+
+    def _embed(self, transicao: Transicao) -> Dict:
+        """Cria o embed de uma transição"""
+        texto_status = "⚠️Problemas"
+        cor = 0xffff00
+        if transicao.status == Status.OPERATIONAL:
+            texto_status = "🟩   Operacional"
+            cor = 0x00ff00
+
+        if transicao.status == Status.MAJOR_OUTAGE:
+            texto_status = "❌   Fora do Ar"
+            cor = 0xff0000
+
+        campos = [
+            {
+                'name': 'Status',
+                'value': texto_status,
+                'inline': False
+            },
+            {
+                'name': 'Informações Adicionais',
+                # o discord rejeita campos sem valor, e limita o valor a 1024 caracteres
+                'value': (transicao.informacao or '-')[:1024],
+                'inline': False
+            }
+        ]
+        if transicao.afetados:
+            campos.append({
+                'name': 'Módulos Afetados',
+                'value': ', '.join(m.nome for m in transicao.afetados)[:1024],
+                'inline': False
+            })
+
+        return {
+            'title': f'Alerta do Monitor: {transicao.modulo.nome}',
+            'author': {
+                'name': self.remetente
+            },
+            'color': cor,
+            'footer': {
+                'text': self.remetente
+            },
+            'fields': campos
+        }
+
+    def _enviar(self, transicoes: List[Transicao]) -> int:
+        """Envia uma mensagem com as transições fornecidas. Essa função é bloqueante
+
+        Returns:
+            O código http da resposta do Discord
+        """
+        # cria o conteudo da notificação (marcando os grupos especificos, sem repetição)
+        roles = [self.config.infra_role]
+        for t in transicoes:
+            for m in [t.modulo] + t.afetados:
+                roles.extend(n for n in m.discords or [] if n not in roles)
+        content = ''.join(f'<@&{n}>' for n in roles)
+
+        logging.info(
+            "Enviando webhook do discord para os módulos %s",
+            ', '.join(t.modulo.nome for t in transicoes)
+        )
+
+        webhook = DiscordWebhook(
+            rate_limit_retry=True,
+            url=self.url,
+            content=content,
+            embeds=[self._embed(t) for t in transicoes]
+        )
+        with medir_chamada(SERVICO_DISCORD) as medicao:
+            r: Response = webhook.execute()
+            if not r.ok:
+                medicao.falhou()
+        if not r.ok:
+            logging.error("Erro ao enviar webhook discord [%s]: %s", r.status_code, r.text)
+        return r.status_code
+
+    async def executar(self):
+        """Loop de envio das notificações"""
+        while True:
+            await asyncio.sleep(self.janela)
+
+            prontas = self._retirar_prontas()
+            Prometheus.get(TipoPrometheus.NOTIFICATION_QUEUE, _CANAL).set(len(self._pendentes))
+            for i in range(0, len(prontas), _MAX_EMBEDS):
+                lote = prontas[i:i + _MAX_EMBEDS]
+                try:
+                    codigo = await asyncio.to_thread(self._enviar, lote)
+                except Exception as e:  # noqa
+                    logging.error("Erro ao enviar webhook discord: %s", e)
+                    codigo = None
+
+                if codigo is not None and 200 <= codigo < 300:
+                    self._confirmar(lote)
+                    atraso = time() - min(t.instante for t in lote)
+                    Prometheus.get(TipoPrometheus.NOTIFICATION_LATENCY, _CANAL).set(atraso)
+                elif codigo is not None and 400 <= codigo < 500 and codigo != 429:
+                    # erro que não adianta tentar novamente: a mensagem é descartada
+                    logging.error("Notificação dos módulos %s rejeitada pelo discord [%s], descartada",
+                                  ', '.join(t.modulo.nome for t in lote), codigo)
+                    self._confirmar(lote)
+                else:
+                    logging.warning("Notificação de %d módulos será enviada novamente na próxima janela", len(lote))
+                    self._devolver(lote)
+            Prometheus.get(TipoPrometheus.NOTIFICATION_QUEUE, _CANAL).set(len(self._pendentes))
@@ -0,0 +1,124 @@
+"""portas.py
+
+Contém a implementação do VerificadorPortas, que verifica portas TCP em lote.
+
+Cada verificação é um socket não bloqueante com um connect iniciado na hora, cujo
+término é esperado pelo seletor do event loop (epoll no Linux), sem threads e sem
+criar transports do asyncio. As verificações pedidas na mesma iteração do event loop
+(como as de vários testadores, ou de vários alvos de um mesmo módulo) são iniciadas
+juntas, e as de mesmo prazo compartilham um único timer. A conexão é fechada assim
+que é estabelecida, e a latência de cada uma é medida do início do connect até o
+socket ficar pronto para escrita.
+"""
+import errno
+import socket
+import asyncio
+from time import perf_counter
+
+from models import ResultadoPorta
+
+from typing import Dict, List, Optional, Tuple
+
+
+class _Verificacao:
+    """Uma conexão em andamento"""
+    __slots__ = ('endereco', 'family', 'prazo', 'futuro', 'sock', 'inicio')
+
+    def __init__(self, endereco: Tuple[str, int], family: int, prazo: float, futuro: asyncio.Future):
+        self.endereco = endereco
+        self.family = family
+        self.prazo = prazo
+        self.futuro = futuro
+        self.sock: Optional[socket.socket] = None
+        self.inicio: float = 0
+
+
+class VerificadorPortas:
+    """Verifica portas TCP com connects não bloqueantes, iniciados em lote"""
+
+    def __init__(self):
+        """Inicializa o verificador. Ele pode ser compartilhado por todos os testadores do event loop"""
+        self._lote: List[_Verificacao] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def verificar(self, alvos: List[Tuple[str, int, int]], timeout: float) -> List[ResultadoPorta]:
+        """Verifica se cada endereço aceita conexões
+
+        Args:
+            alvos (List[Tuple[str, int, int]]): endereço ip, porta e família (AF_INET ou AF_INET6) de cada alvo
+            timeout (float): tempo (em segundos) máximo de cada conexão
+
+        Returns:
+            O resultado de cada alvo, na mesma ordem
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._lote = loop, []
+        prazo = loop.time() + timeout
+
+        verificacoes = [_Verificacao((ip, porta), family, prazo, loop.create_future()) for ip, porta, family in alvos]
+        if not self._lote:
+            loop.call_soon(self._iniciar_lote)
+        self._lote.extend(verificacoes)
+        try:
+            return list(await asyncio.gather(*(v.futuro for v in verificacoes)))
+        except asyncio.CancelledError:
+            for v in verificacoes:
+                self._terminar(v, None, 'cancelado')
+            raise
+
+    def _iniciar_lote(self):
+        """Inicia as conexões de todas as verificações pedidas desde a última iteração"""
+        lote, self._lote = self._lote, []
+        prazos: Dict[float, List[_Verificacao]] = {}
+        for v in lote:
+            if v.futuro.done():
+                continue
+            self._conectar(v)
+            if not v.futuro.done():
+                prazos.setdefault(v.prazo, []).append(v)
+        for prazo, verificacoes in prazos.items():
+            self._loop.call_at(prazo, self._expirar, verificacoes)
+
+    def _conectar(self, v: _Verificacao):
+        """Inicia o connect não bloqueante de uma verificação"""
+        try:
+            v.sock = socket.socket(v.family, socket.SOCK_STREAM)
+            v.sock.setblocking(False)
+            v.inicio = perf_counter()
+            codigo = v.sock.connect_ex(v.endereco)
+        except OSError as e:
+            self._terminar(v, None, e.strerror or str(e))
+            return
+
+        if codigo == 0:
+            self._terminar(v, perf_counter() - v.inicio, None)
+        elif codigo in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+            self._loop.add_writer(v.sock.fileno(), self._pronto, v)
+        else:
+            self._terminar(v, None, errno.errorcode.get(codigo, str(codigo)))
+
+    def _pronto(self, v: _Verificacao):
+        """Chamado pelo seletor quando o connect termina (com sucesso ou erro)"""
+        latencia = perf_counter() - v.inicio
+        codigo = v.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if codigo == 0:
+            self._terminar(v, latencia, None)
+        else:
+            self._terminar(v, None, errno.errorcode.get(codigo, str(codigo)))
+
+    def _expirar(self, verificacoes: List[_Verificacao]):
+        """Encerra as verificações do mesmo prazo que ainda não terminaram"""
+        for v in verificacoes:
+            self._terminar(v, None, 'tempo esgotado')
+
+    def _terminar(self, v: _Verificacao, latencia: Optional[float], erro: Optional[str]):
+        """Fecha o socket da verificação e publica o seu resultado"""
+        if v.sock is not None:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.remove_writer(v.sock.fileno())
+            v.sock.close()
+            v.sock = None
+        if not v.futuro.done():
+            ip, porta = v.endereco[:2]
+            v.futuro.set_result(ResultadoPorta(ip, porta, latencia is not None, latencia, erro))
@@ -1,9 +1,27 @@
+import logging
 from enum import Enum
-from prometheus_client import Gauge
+from threading import Lock
+from prometheus_client import Counter, Gauge, Histogram
 
-from typing import Optional
+from tabela import TabelaResultados
+
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple, Union
 
 _MAIN_LABEL_NAME = 'monitorName'
+_CHANNEL_LABEL_NAME = 'channel'
+_PHASE_LABEL_NAME = 'phase'
+_RESULT_LABEL_NAME = 'result'
+_TARGET_LABEL_NAME = 'target'
+_WINDOW_LABEL_NAME = 'window'
+_SERVICE_LABEL_NAME = 'service'
+_STATE_LABEL_NAME = 'state'
+_OUTCOME_LABEL_NAME = 'outcome'
+
+# buckets (em segundos) padrão dos histogramas de duração
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# buckets da razão entre o tempo para completar um teste (atraso + duração) e o intervalo do módulo
+BUCKETS_CICLO = (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 5)
 
 
 class TipoPrometheus(Enum):
@@ -13,62 +31,405 @@ class TipoPrometheus(Enum):
     # VERSION = 4             # [HTTP] versao do http
     # SSL = 5                 # [HTTP] versao SSL usada
     SIZE = 6                # [SIZE] espaço (bytes) livres
+    SCHEDULE_LAG = 7        # [USO COMUM] atraso do início do teste em relação ao agendado
+    NOTIFICATION_QUEUE = 8      # [NOTIFICAÇÃO] notificações aguardando envio (label é o canal)
+    NOTIFICATION_LATENCY = 9    # [NOTIFICAÇÃO] atraso entre a mudança e o envio (label é o canal)
+    TEST_DURATION_HISTOGRAM = 10    # [USO COMUM] histograma da duração dos testes
+    PHASE_DURATION = 11             # [USO COMUM] histograma da duração de cada fase do teste
+    DNS_RESOLUTION = 12             # [DNS] histograma da duração das resoluções (label é o resultado)
+    PORT_CONNECT = 13               # [PORT] histograma da latência da conexão com cada alvo
+    SLA_AVAILABILITY = 14           # [USO COMUM] disponibilidade em cada janela (24h, 7d, 30d)
+    SLA_DOWNTIME = 15               # [USO COMUM] tempo fora do ar em cada janela (24h, 7d, 30d)
+    EXTERNAL_CALL = 16              # [MONITOR] histograma das chamadas ao redis, discord e statuspage
+    ACTIVE_TESTS = 17               # [MONITOR] testes em execução e aguardando vaga (label é o estado)
+    SCHEDULE_TICKS = 18             # [MONITOR] prazos iniciados, pulados e estourados (label é o resultado)
+    CYCLE_RATIO = 19                # [MONITOR] histograma de (atraso + duração) / intervalo de cada teste
+    EVENT_LOOP_LAG = 20             # [MONITOR] histograma do atraso do event loop
+    THREAD_POOL = 21                # [MONITOR] tarefas do pool de threads (label é o estado)
+    THREADS = 22                    # [MONITOR] threads do processo
+    STORAGE_QUEUE = 23              # [MONITOR] escritas aguardando envio ao redis
+    PROBE_INTERVAL = 24             # [USO COMUM] intervalo atual (adaptativo) entre os testes
+    PROBE_TIMEOUT = 25              # [USO COMUM] timeout (adaptativo) do último teste
+    FAILURE_CONFIRMATIONS = 26      # [MONITOR] confirmações de falha (label é o resultado)
+    COALESCED_PROBES = 27           # [MONITOR] testes de endpoints compartilhados (label é a origem)
+
+
+# tipos cuja primeira label é o nome do módulo
+_TIPOS_POR_MODULO = (
+    TipoPrometheus.STATUS,
+    TipoPrometheus.TEST_DURATION,
+    TipoPrometheus.STATUS_CODE,
+    TipoPrometheus.SIZE,
+    TipoPrometheus.SCHEDULE_LAG,
+    TipoPrometheus.TEST_DURATION_HISTOGRAM,
+    TipoPrometheus.PHASE_DURATION,
+    TipoPrometheus.PORT_CONNECT,
+    TipoPrometheus.SLA_AVAILABILITY,
+    TipoPrometheus.SLA_DOWNTIME,
+    TipoPrometheus.PROBE_INTERVAL,
+    TipoPrometheus.PROBE_TIMEOUT,
+)
+
+
+class _SerieDescartada:
+    """Série retornada quando o limite de séries é atingido. Ignora todas as operações"""
+    def set(self, _valor: float):
+        pass
+
+    def observe(self, _valor: float):
+        pass
+
+    def inc(self, _valor: float = 1):
+        pass
+
+
+_SERIE_DESCARTADA = _SerieDescartada()
+
+
+class _CelulaTabela:
+    """Série de um gauge armazenado na TabelaResultados"""
+    __slots__ = ('_tabela', '_ident', '_coluna')
+
+    def __init__(self, tabela: TabelaResultados, ident: int, coluna: int):
+        self._tabela = tabela
+        self._ident = ident
+        self._coluna = coluna
+
+    def set(self, valor: float):
+        self._tabela.definir(self._ident, self._coluna, float(valor))
+
+
+# colunas da tabela de resultados de cada tipo (ver tabela.COLUNAS)
+_COLUNAS_TABELA = {
+    TipoPrometheus.STATUS: 0,
+    TipoPrometheus.TEST_DURATION: 1,
+    TipoPrometheus.STATUS_CODE: 2,
+    TipoPrometheus.SIZE: 3,
+}
 
 
 class Prometheus:
-    """Classe contendo os gauges para serem coletados pelo processo do Prometheus
+    """Classe contendo os gauges e histogramas para serem coletados pelo processo do Prometheus
 
-    Os Gauges implementados são:
+    As séries criadas são registradas, o que permite removê-las (por exemplo, de módulos
+    que saíram da configuração) e limitar a quantidade total de séries exportadas.
+
+    Os Histogramas implementados são:
+        test_duration_seconds,
+        test_phase_seconds (dns, connect, ttfb e body para HTTP/SIZE; dns e connect para PORT),
+        dns_resolution_seconds (consultas do resolvedor fora do cache, por resultado),
+        port_connect_seconds (latência da conexão com cada alvo de um módulo PORT),
+        external_call_seconds (chamadas ao redis, discord e statuspage, por serviço e resultado),
+        cycle_completion_ratio (atraso + duração de cada teste, em intervalos do módulo),
+        event_loop_lag_seconds (atraso de um timer do event loop, medido a cada segundo)
+
+    Os Gauges com o último resultado de cada módulo ficam na TabelaResultados,
+    fora do registro do prometheus_client:
         status,
         test_duration,
-        status_code
+        status_code,
+        size
+
+    Os Gauges implementados no registro são:
+        schedule_lag,
+        probe_interval (intervalo adaptativo atual de cada módulo),
+        probe_timeout (timeout adaptativo do último teste de cada módulo),
+        sla_availability e sla_downtime_seconds (por módulo e janela),
+        notification_queue,
+        notification_latency,
+        active_tests (running e waiting),
+        thread_pool_tasks (queued, running e size),
+        threads,
+        storage_pending_writes
+
+    Os Counters implementados são:
+        schedule_ticks (started, skipped e overrun),
+        failure_confirmations (confirmed, recovered e no_budget)
     """
-    _gauge_status: Optional[Gauge] = None
-    _gauge_test_duration: Optional[Gauge] = None
-    _gauge_status_code: Optional[Gauge] = None
-    _gauge_size: Optional[Gauge] = None
+    _tabela: Optional[TabelaResultados] = None
+    _gauge_schedule_lag: Optional[Gauge] = None
+    _gauge_notification_queue: Optional[Gauge] = None
+    _gauge_notification_latency: Optional[Gauge] = None
+    _histogram_test_duration: Optional[Histogram] = None
+    _histogram_phase: Optional[Histogram] = None
+    _histogram_dns: Optional[Histogram] = None
+    _histogram_port: Optional[Histogram] = None
+    _gauge_sla_availability: Optional[Gauge] = None
+    _gauge_sla_downtime: Optional[Gauge] = None
+    _gauge_series: Optional[Gauge] = None
+    _counter_dropped_series: Optional[Counter] = None
+    _histogram_external: Optional[Histogram] = None
+    _histogram_cycle: Optional[Histogram] = None
+    _gauge_active_tests: Optional[Gauge] = None
+    _counter_ticks: Optional[Counter] = None
+    _histogram_loop_lag: Optional[Histogram] = None
+    _gauge_thread_pool: Optional[Gauge] = None
+    _gauge_threads: Optional[Gauge] = None
+    _gauge_storage_queue: Optional[Gauge] = None
+    _gauge_probe_interval: Optional[Gauge] = None
+    _gauge_probe_timeout: Optional[Gauge] = None
+    _counter_confirmations: Optional[Counter] = None
+    _counter_coalesced: Optional[Counter] = None
+
+    # séries criadas de cada tipo, para permitir a remoção e limitar a cardinalidade
+    _lock: Lock = Lock()
+    _series: Dict[TipoPrometheus, Set[Tuple[str, ...]]] = {}
+    _total_series: int = 0
+    _max_series: Optional[int] = None
+    _limite_avisado: bool = False
+    _tabela_cheia_avisada: bool = False
 
     @classmethod
-    def start(cls):
-        """Cria os Gauges do Prometheus
+    def start(cls,
+              buckets: Optional[Sequence[float]] = None,
+              max_series: Optional[int] = None,
+              buffer_tabela: Optional[memoryview] = None
+              ):
+        """Cria os Gauges e Histogramas do Prometheus
 
-        Necessário ser executado antes de usar as outras funções
+        Necessário ser executado antes de usar as outras funções.
+
+        Com vários processos (PROMETHEUS_MULTIPROC_DIR definido), os valores do registro são
+        unidos pelo processo principal: os gauges por módulo usam o maior valor entre os processos
+        vivos, e os gauges de filas e de séries usam a soma.
+
+        Args:
+            buckets (Sequence[float], optional): limites (em segundos) dos buckets dos histogramas
+                de duração. Default é BUCKETS_PADRAO.
+            max_series (int, optional): quantidade máxima de séries (combinações de labels) somando
+                todas as métricas. Novas séries acima desse limite são descartadas. Default é ilimitado.
+            buffer_tabela (memoryview, optional): buffer (como uma memória compartilhada) onde a tabela de
+                resultados será armazenada. Default é um buffer próprio.
         """
-        cls._gauge_status = Gauge(
-            name='monitor_status',
-            documentation='Status of the specific monitor',
-            labelnames=[_MAIN_LABEL_NAME]
+        buckets = tuple(buckets) if buckets else BUCKETS_PADRAO
+        cls._max_series = max_series
+        cls._series = {}
+        cls._total_series = 0
+        cls._gauge_series = Gauge(
+            name='monitor_metric_series',
+            documentation='Number of labeled series currently exported by the monitor',
+            multiprocess_mode='livesum'
+        )
+        cls._counter_dropped_series = Counter(
+            name='monitor_metric_series_dropped',
+            documentation='Number of series updates dropped because the series limit was reached'
+        )
+        cls._tabela = TabelaResultados(buffer=buffer_tabela)
+        cls._gauge_schedule_lag: Gauge = Gauge(
+            name='monitor_schedule_lag',
+            documentation='Delay (seconds) between the scheduled and the actual start of the last test',
+            labelnames=[_MAIN_LABEL_NAME],
+            multiprocess_mode='livemax'
+        )
+        cls._gauge_notification_queue: Gauge = Gauge(
+            name='monitor_notification_queue',
+            documentation='Notifications waiting to be delivered',
+            labelnames=[_CHANNEL_LABEL_NAME],
+            multiprocess_mode='livesum'
+        )
+        cls._gauge_notification_latency: Gauge = Gauge(
+            name='monitor_notification_latency',
+            documentation='Delay (seconds) between the status change and the delivery of the last notification',
+            labelnames=[_CHANNEL_LABEL_NAME],
+            multiprocess_mode='livemax'
+        )
+        cls._gauge_sla_availability: Gauge = Gauge(
+            name='monitor_sla_availability',
+            documentation='Fraction of the time the specific monitor was available in each rolling window',
+            labelnames=[_MAIN_LABEL_NAME, _WINDOW_LABEL_NAME],
+            multiprocess_mode='livemax'
+        )
+        cls._gauge_sla_downtime: Gauge = Gauge(
+            name='monitor_sla_downtime_seconds',
+            documentation='Seconds the specific monitor was unavailable in each rolling window',
+            labelnames=[_MAIN_LABEL_NAME, _WINDOW_LABEL_NAME],
+            multiprocess_mode='livemax'
+        )
+        cls._histogram_test_duration: Histogram = Histogram(
+            name='monitor_test_duration_seconds',
+            documentation='Test duration distribution for the specific monitor',
+            labelnames=[_MAIN_LABEL_NAME],
+            buckets=buckets
+        )
+        cls._histogram_phase: Histogram = Histogram(
+            name='monitor_test_phase_seconds',
+            documentation='Duration distribution of each phase of the test for the specific monitor',
+            labelnames=[_MAIN_LABEL_NAME, _PHASE_LABEL_NAME],
+            buckets=buckets
+        )
+        cls._histogram_dns: Histogram = Histogram(
+            name='monitor_dns_resolution_seconds',
+            documentation='Duration distribution of the DNS lookups that missed the resolver cache',
+            labelnames=[_RESULT_LABEL_NAME],
+            buckets=buckets
+        )
+        cls._histogram_port: Histogram = Histogram(
+            name='monitor_port_connect_seconds',
+            documentation='TCP connect latency distribution of each target of the specific monitor',
+            labelnames=[_MAIN_LABEL_NAME, _TARGET_LABEL_NAME],
+            buckets=buckets
+        )
+        cls._histogram_external: Histogram = Histogram(
+            name='monitor_external_call_seconds',
+            documentation='Duration distribution of the calls to Redis, the Discord webhook and the Statuspage API',
+            labelnames=[_SERVICE_LABEL_NAME, _RESULT_LABEL_NAME],
+            buckets=buckets
+        )
+        cls._histogram_cycle: Histogram = Histogram(
+            name='monitor_cycle_completion_ratio',
+            documentation='Time between the scheduled start and the end of each test, as a fraction of its interval',
+            buckets=BUCKETS_CICLO
+        )
+        cls._gauge_active_tests: Gauge = Gauge(
+            name='monitor_active_tests',
+            documentation='Tests running and waiting for a concurrency slot',
+            labelnames=[_STATE_LABEL_NAME],
+            multiprocess_mode='livesum'
+        )
+        cls._counter_ticks: Counter = Counter(
+            name='monitor_schedule_ticks',
+            documentation='Scheduled tests started, skipped (previous test still running) and overrun '
+                          '(finished after the next deadline)',
+            labelnames=[_OUTCOME_LABEL_NAME]
+        )
+        cls._histogram_loop_lag: Histogram = Histogram(
+            name='monitor_event_loop_lag_seconds',
+            documentation='Delay of the event loop in running a timer, measured once per second',
+            buckets=buckets
+        )
+        cls._gauge_thread_pool: Gauge = Gauge(
+            name='monitor_thread_pool_tasks',
+            documentation='Tasks queued and running in the thread pool of the event loop, and its size',
+            labelnames=[_STATE_LABEL_NAME],
+            multiprocess_mode='livesum'
+        )
+        cls._gauge_threads: Gauge = Gauge(
+            name='monitor_threads',
+            documentation='Threads of the monitor process',
+            multiprocess_mode='livesum'
+        )
+        cls._gauge_storage_queue: Gauge = Gauge(
+            name='monitor_storage_pending_writes',
+            documentation='Status writes waiting to be flushed to Redis',
+            multiprocess_mode='livesum'
+        )
+        cls._gauge_probe_interval: Gauge = Gauge(
+            name='monitor_probe_interval_seconds',
+            documentation='Current (adaptive) interval between the tests of the specific monitor',
+            labelnames=[_MAIN_LABEL_NAME],
+            multiprocess_mode='livemax'
         )
-        cls._gauge_test_duration: Gauge = Gauge(
-            name='monitor_test_duration',
-            documentation='Test duration for the specific monitor',
-            labelnames=[_MAIN_LABEL_NAME]
+        cls._gauge_probe_timeout: Gauge = Gauge(
+            name='monitor_probe_timeout_seconds',
+            documentation='Timeout (adaptive) of the last test of the specific monitor',
+            labelnames=[_MAIN_LABEL_NAME],
+            multiprocess_mode='livemax'
         )
-        cls._gauge_status_code: Gauge = Gauge(
-            name='monitor_http_status_code',
-            documentation='Status code of the last probe',
-            labelnames=[_MAIN_LABEL_NAME]
+        cls._counter_confirmations: Counter = Counter(
+            name='monitor_failure_confirmations',
+            documentation='Failures retried before changing the status: confirmed, recovered (a retry succeeded) '
+                          'and no_budget (no time left in the cycle to retry)',
+            labelnames=[_OUTCOME_LABEL_NAME]
         )
-        cls._gauge_size: Gauge = Gauge(
-            name='monitor_size',
-            documentation='Free space available for the specific monitor',
-            labelnames=[_MAIN_LABEL_NAME]
+        cls._counter_coalesced: Counter = Counter(
+            name='monitor_coalesced_probes',
+            documentation='Results of probes shared by modules testing the same endpoint: probe (a request was '
+                          'made), inflight (joined a running probe) and cached (reused a recent result)',
+            labelnames=[_OUTCOME_LABEL_NAME]
         )
 
     @classmethod
-    def _match(cls, tipo: TipoPrometheus) -> Optional[Gauge]:
+    def _match(cls, tipo: TipoPrometheus) -> Optional[Union[Gauge, Histogram, TabelaResultados]]:
         """Retorna a variavel correta de acordo com o tipo"""
-        if tipo == TipoPrometheus.STATUS:
-            return cls._gauge_status
-        elif tipo == TipoPrometheus.TEST_DURATION:
-            return cls._gauge_test_duration
-        elif tipo == TipoPrometheus.STATUS_CODE:
-            return cls._gauge_status_code
-        elif tipo == TipoPrometheus.SIZE:
-            return cls._gauge_size
+        if tipo in _COLUNAS_TABELA:
+            return cls._tabela
+        elif tipo == TipoPrometheus.SCHEDULE_LAG:
+            return cls._gauge_schedule_lag
+        elif tipo == TipoPrometheus.NOTIFICATION_QUEUE:
+            return cls._gauge_notification_queue
+        elif tipo == TipoPrometheus.NOTIFICATION_LATENCY:
+            return cls._gauge_notification_latency
+        elif tipo == TipoPrometheus.TEST_DURATION_HISTOGRAM:
+            return cls._histogram_test_duration
+        elif tipo == TipoPrometheus.PHASE_DURATION:
+            return cls._histogram_phase
+        elif tipo == TipoPrometheus.DNS_RESOLUTION:
+            return cls._histogram_dns
+        elif tipo == TipoPrometheus.PORT_CONNECT:
+            return cls._histogram_port
+        elif tipo == TipoPrometheus.SLA_AVAILABILITY:
+            return cls._gauge_sla_availability
+        elif tipo == TipoPrometheus.SLA_DOWNTIME:
+            return cls._gauge_sla_downtime
+        elif tipo == TipoPrometheus.EXTERNAL_CALL:
+            return cls._histogram_external
+        elif tipo == TipoPrometheus.ACTIVE_TESTS:
+            return cls._gauge_active_tests
+        elif tipo == TipoPrometheus.SCHEDULE_TICKS:
+            return cls._counter_ticks
+        elif tipo == TipoPrometheus.CYCLE_RATIO:
+            return cls._histogram_cycle
+        elif tipo == TipoPrometheus.EVENT_LOOP_LAG:
+            return cls._histogram_loop_lag
+        elif tipo == TipoPrometheus.THREAD_POOL:
+            return cls._gauge_thread_pool
+        elif tipo == TipoPrometheus.THREADS:
+            return cls._gauge_threads
+        elif tipo == TipoPrometheus.STORAGE_QUEUE:
+            return cls._gauge_storage_queue
+        elif tipo == TipoPrometheus.PROBE_INTERVAL:
+            return cls._gauge_probe_interval
+        elif tipo == TipoPrometheus.PROBE_TIMEOUT:
+            return cls._gauge_probe_timeout
+        elif tipo == TipoPrometheus.FAILURE_CONFIRMATIONS:
+            return cls._counter_confirmations
+        elif tipo == TipoPrometheus.COALESCED_PROBES:
+            return cls._counter_coalesced
         else:
             return None
 
+    @classmethod
+    def _serie(cls, tipo: TipoPrometheus, labels: Tuple[str, ...]):
+        """Retorna a série de um gauge ou histograma, respeitando o limite de séries
+
+        Caso a série ainda não exista e o limite tenha sido atingido, é retornada
+        uma série descartável, que não é exportada
+
+        Raises:
+            RuntimeError: caso o tipo não seja suportado
+        """
+        x = cls._match(tipo)
+
+        if x is None:
+            raise RuntimeError(f'Tipo de métrica {tipo} não suportado')
+
+        with cls._lock:
+            series = cls._series.setdefault(tipo, set())
+            if labels not in series:
+                if cls._max_series is not None and cls._total_series >= cls._max_series:
+                    if not cls._limite_avisado:
+                        logging.warning("Limite de %d séries atingido, novas séries serão descartadas",
+                                        cls._max_series)
+                        cls._limite_avisado = True
+                    cls._counter_dropped_series.inc()
+                    return _SERIE_DESCARTADA
+                if isinstance(x, TabelaResultados) and x.registrar(labels[0]) is None:
+                    # tabela de tamanho fixo (memória compartilhada) sem linhas livres
+                    if not cls._tabela_cheia_avisada:
+                        logging.warning("Tabela de resultados cheia (%d módulos), novos módulos serão descartados",
+                                        x.capacidade)
+                        cls._tabela_cheia_avisada = True
+                    cls._counter_dropped_series.inc()
+                    return _SERIE_DESCARTADA
+                series.add(labels)
+                cls._total_series += 1
+                cls._gauge_series.set(cls._total_series)
+
+        if isinstance(x, TabelaResultados):
+            return _CelulaTabela(x, x.registrar(labels[0]), _COLUNAS_TABELA[tipo])
+        # métricas sem labels são a própria série
+        return x.labels(*labels) if labels else x
+
     @classmethod
     def get(cls, tipo: TipoPrometheus, label: str) -> Gauge:
         """Semelhante ao `With` de um GaugeVec
@@ -77,29 +438,115 @@ class Prometheus:
             tipo (TipoPrometheus): tipo de gauge solicitado
             label (str): label do gauge a ser selecionado
         """
-        x: Optional[Gauge] = cls._match(tipo)
+        return cls._serie(tipo, (label,))
 
-        if x is None:
+    @classmethod
+    def definir(cls, tipo: TipoPrometheus, valor: float, *labels: str) -> None:
+        """Define o valor de um gauge com várias labels
+
+        Args:
+            tipo (TipoPrometheus): tipo de gauge solicitado
+            valor (float): novo valor
+            labels (str): valores das labels do gauge, na ordem em que foram declaradas
+        """
+        if not isinstance(cls._match(tipo), Gauge):
             raise RuntimeError(f'Tipo de gauge {tipo} não suportado')
 
-        return x.labels([label])
+        cls._serie(tipo, labels).set(valor)
 
     @classmethod
-    def delete(cls, tipo: TipoPrometheus, _label: str) -> None:
-        """Semelhante ao `Delete` de um GaugeVec
+    def observar(cls, tipo: TipoPrometheus, valor: float, *labels: str) -> None:
+        """Adiciona uma observação em um histograma
 
-        OBS: Não está sendo possível remover labels. Por isso,
-        essa função simplesmente não faz nada
+        Args:
+            tipo (TipoPrometheus): tipo de histograma solicitado
+            valor (float): valor observado
+            labels (str): valores das labels do histograma, na ordem em que foram declaradas
+        """
+        if not isinstance(cls._match(tipo), Histogram):
+            raise RuntimeError(f'Tipo de histograma {tipo} não suportado')
+
+        cls._serie(tipo, labels).observe(valor)
+
+    @classmethod
+    def incrementar(cls, tipo: TipoPrometheus, *labels: str, valor: float = 1) -> None:
+        """Incrementa um contador
 
         Args:
-            tipo (TipoPrometheus): tipo de gauge a ser removido
-            _label (str): label do gauge a ser removido
+            tipo (TipoPrometheus): tipo de contador solicitado
+            labels (str): valores das labels do contador, na ordem em que foram declaradas
+            valor (float): valor a ser somado. Default é 1
         """
-        x: Optional[Gauge] = cls._match(tipo)
+        if not isinstance(cls._match(tipo), Counter):
+            raise RuntimeError(f'Tipo de contador {tipo} não suportado')
 
+        cls._serie(tipo, labels).inc(valor)
+
+    @classmethod
+    def _remover(cls, tipo: TipoPrometheus, labels: Tuple[str, ...]):
+        """Remove uma série, caso ela exista"""
+        x = cls._match(tipo)
         if x is None:
-            raise RuntimeError(f'Tipo de gauge {tipo} não suportado')
+            raise RuntimeError(f'Tipo de métrica {tipo} não suportado')
+
+        with cls._lock:
+            series = cls._series.get(tipo, set())
+            if labels not in series:
+                return
+            series.discard(labels)
+            cls._total_series -= 1
+            cls._limite_avisado = False
+            cls._gauge_series.set(cls._total_series)
+            if isinstance(x, TabelaResultados):
+                ident = x.registrar(labels[0])
+                if ident is not None:
+                    x.limpar(ident, _COLUNAS_TABELA[tipo])
+                return
+            try:
+                x.remove(*labels)
+            except KeyError:
+                pass
+
+    @classmethod
+    def delete(cls, tipo: TipoPrometheus, label: str) -> None:
+        """Semelhante ao `Delete` de um GaugeVec
+
+        Args:
+            tipo (TipoPrometheus): tipo de gauge a ser removido
+            label (str): label do gauge a ser removido
+        """
+        cls._remover(tipo, (label,))
 
-        # x.remove(label)               # -> KeyError
-        # x.labels([label]).clear()     # -> no ._lock in Gauge
-        return
+    @classmethod
+    def remover_modulo(cls, nome: str) -> None:
+        """Remove todas as séries de um módulo
+
+        Args:
+            nome (str): nome do módulo
+        """
+        for tipo in _TIPOS_POR_MODULO:
+            for labels in [lb for lb in cls._series.get(tipo, ()) if lb[0] == nome]:
+                cls._remover(tipo, labels)
+        cls._tabela.liberar(nome)
+        cls._tabela_cheia_avisada = False
+
+    @classmethod
+    def renderizar_tabela(cls) -> bytes:
+        """Retorna os gauges da tabela de resultados no formato de texto do Prometheus"""
+        return cls._tabela.renderizar()
+
+    @classmethod
+    def reter(cls, nomes: Iterable[str]) -> None:
+        """Remove as séries de todos os módulos que não estão na lista fornecida
+
+        Args:
+            nomes (Iterable[str]): nomes dos módulos que devem ser mantidos
+        """
+        nomes = set(nomes)
+        removidos = set()
+        for tipo in _TIPOS_POR_MODULO:
+            removidos.update(lb[0] for lb in cls._series.get(tipo, ()) if lb[0] not in nomes)
+        for nome in removidos:
+            cls.remover_modulo(nome)
+        if removidos:
+            logging.info("Métricas removidas de %d módulos", len(removidos))
@@ -0,0 +1,150 @@
+"""recarregador.py
+
+Contém a implementação do Recarregador, que observa o arquivo de configuração e
+aplica as mudanças dos módulos sem reiniciar o motor.
+
+Somente os testadores dos módulos alterados são recriados. Os módulos que não
+mudaram mantêm os seus testadores, e o pool de conexões e o cache de status são
+compartilhados por todos. As métricas dos módulos removidos são apagadas.
+"""
+import os
+import asyncio
+import logging
+
+from motor import Motor
+from models import Modulo
+from prom import Prometheus
+from testador import TestadorBase
+from configuracao import Configuracao, InvalidConfigFile
+
+from typing import Callable, Dict, List, Optional, Set
+
+
+def _chave(modulo: Modulo) -> str:
+    """Identifica um módulo por todas as suas configurações"""
+    return repr(modulo)
+
+
+class Recarregador:
+    """Observa o arquivo de configuração, recarregando os módulos quando ele é alterado"""
+
+    def __init__(self,
+                 arquivo: str,
+                 configuracao: Configuracao,
+                 motor: Motor,
+                 fabrica: Callable[[Modulo], TestadorBase],
+                 intervalo: float = 5,
+                 filtro: Optional[Callable[[Modulo], bool]] = None
+                 ):
+        """Inicializa o recarregador
+
+        Args:
+            arquivo (str): path para o arquivo de configuração
+            configuracao (Configuracao): configuração atualmente carregada
+            motor (Motor): motor em execução
+            fabrica (Callable[[Modulo], TestadorBase]): cria o testador de um módulo
+            intervalo (float): intervalo (em segundos) entre as verificações do arquivo
+            filtro (Callable[[Modulo], bool], optional): seleciona os módulos testados por este
+                processo. Default é todos os módulos.
+        """
+        self.arquivo: str = arquivo
+        self.configuracao: Configuracao = configuracao
+        self.motor: Motor = motor
+        self.fabrica: Callable[[Modulo], TestadorBase] = fabrica
+        self.intervalo: float = intervalo
+        self.filtro: Optional[Callable[[Modulo], bool]] = filtro
+        # chamado com os nomes dos módulos mantidos, para descartar o estado dos demais
+        self.ao_reter: Optional[Callable[[Set[str]], None]] = None
+        # chamado com a nova configuração, antes dos testadores dos módulos alterados serem recriados
+        self.ao_recarregar: Optional[Callable[[Configuracao], None]] = None
+        self._modificacao: Optional[float] = self._ler_modificacao()
+
+    def _ler_modificacao(self) -> Optional[float]:
+        """Retorna o horário de modificação do arquivo, ou None se ele não existir"""
+        try:
+            return os.stat(self.arquivo).st_mtime
+        except OSError:
+            return None
+
+    def _carregar(self) -> Optional[Configuracao]:
+        """Lê o arquivo de configuração, retornando None caso ele seja inválido"""
+        try:
+            configuracao = Configuracao(self.arquivo)
+            _ = configuracao.modules
+            return configuracao
+        except (InvalidConfigFile, SystemExit):
+            logging.error("Configuração inválida em %s, mantendo a configuração atual", self.arquivo)
+            return None
+
+    async def recarregar(self, configuracao: Configuracao, imediato: bool = False):
+        """Aplica os módulos da nova configuração no motor
+
+        Também usado para reaplicar o filtro quando ele muda (como quando os nós do monitor mudam)
+
+        Args:
+            configuracao (Configuracao): nova configuração
+            imediato (bool): testa imediatamente os módulos adicionados. Default é False.
+        """
+        if self.ao_recarregar is not None:
+            self.ao_recarregar(configuracao)
+
+        atuais: Dict[str, List[TestadorBase]] = {}
+        for t in self.motor.testadores:
+            atuais.setdefault(_chave(t.modulo), []).append(t)
+
+        modulos = [m for m in configuracao.modules if self.filtro is None or self.filtro(m)]
+        novos: List[Modulo] = []
+        for m in modulos:
+            mantidos = atuais.get(_chave(m))
+            if mantidos:
+                # módulo não mudou: mantém o testador
+                mantidos.pop()
+            else:
+                novos.append(m)
+
+        removidos = [t for ts in atuais.values() for t in ts]
+        for t in removidos:
+            self.motor.remover(t)
+        for m in novos:
+            await self.motor.adicionar(self.fabrica(m), imediato=imediato)
+
+        # apaga as métricas e o cache dos módulos que não existem mais
+        nomes = {m.nome for m in modulos}
+        for nome in {t.modulo.nome for t in removidos} - nomes:
+            if self.motor.cache is not None:
+                self.motor.cache.esquecer(nome)
+        Prometheus.reter(nomes)
+        if self.ao_reter is not None:
+            self.ao_reter(nomes)
+
+        self._avisar_alteracoes_globais(configuracao)
+        self.configuracao = configuracao
+        logging.info("Módulos recarregados: %d testadores adicionados, %d removidos",
+                     len(novos), len(removidos))
+
+    def _avisar_alteracoes_globais(self, configuracao: Configuracao):
+        """Avisa sobre alterações fora dos módulos, que só são aplicadas ao reiniciar"""
+        anterior = self.configuracao
+        for nome in ['port', 'concurrency', 'workers', 'statuspage', 'discord', 'redis', 'http', 'dns', 'metrics',
+                     'cluster', 'history', 'adaptive', 'probe']:
+            if getattr(anterior, nome) != getattr(configuracao, nome):
+                logging.warning("Alteração em '%s' só será aplicada ao reiniciar o monitor", nome)
+
+    async def executar(self):
+        """Loop de verificação do arquivo de configuração"""
+        while True:
+            await asyncio.sleep(self.intervalo)
+
+            modificacao = self._ler_modificacao()
+            if modificacao is None or modificacao == self._modificacao:
+                continue
+            self._modificacao = modificacao
+
+            logging.info("Arquivo de configuração alterado, recarregando")
+            try:
+                configuracao = await asyncio.to_thread(self._carregar)
+                if configuracao is not None:
+                    await self.recarregar(configuracao)
+            except Exception as e:  # noqa
+                # o recarregamento nunca deve parar de observar o arquivo
+                logging.exception("Erro ao recarregar a configuração, mantendo a configuração atual: %s", e)
@@ -0,0 +1,175 @@
+"""resolvedor.py
+
+Contém a implementação do ResolvedorDNS, um resolvedor de nomes assíncrono com cache,
+compartilhado por todos os testadores.
+
+As respostas ficam no cache pelo seu TTL (limitado por `[dns] ttl`), e as falhas por
+`[dns] negative_ttl`, de forma que um host não é resolvido novamente a cada teste.
+Resoluções simultâneas do mesmo host são unidas em uma única consulta.
+
+Com o pacote opcional `aiodns` instalado, as consultas são feitas direto ao servidor DNS,
+respeitando o TTL de cada resposta. Sem ele, é usado o `getaddrinfo` do sistema (em uma
+thread, fora do event loop), e as respostas ficam no cache por `[dns] ttl`.
+"""
+import socket
+import asyncio
+import ipaddress
+from time import monotonic, perf_counter
+from aiohttp.abc import AbstractResolver, ResolveResult
+from aiohttp.resolver import ThreadedResolver
+
+try:
+    import aiodns
+except ImportError:     # pragma: no cover - dependência opcional
+    aiodns = None
+
+from models import ConfigDNS
+from prom import TipoPrometheus, Prometheus
+
+from typing import Dict, List, Optional, Tuple, Union
+
+
+class ErroDNS(OSError):
+    """Falha ao resolver um host, inclusive por tempo esgotado"""
+    pass
+
+
+# tipo de registro consultado para cada família de endereços
+_REGISTROS = {
+    socket.AF_INET: ['A'],
+    socket.AF_INET6: ['AAAA'],
+    socket.AF_UNSPEC: ['A', 'AAAA'],
+}
+
+
+class ResolvedorDNS(AbstractResolver):
+    """Resolvedor assíncrono com cache, respeitando o TTL das respostas e com cache das falhas"""
+
+    def __init__(self, config: Optional[ConfigDNS] = None):
+        """Inicializa o resolvedor. O cache começa vazio
+
+        Args:
+            config (ConfigDNS, optional): configurações do resolvedor. Default é ConfigDNS().
+        """
+        self.config: ConfigDNS = config if config is not None else ConfigDNS()
+        # (host, família) -> (validade, endereços ou a falha)
+        self._cache: Dict[Tuple[str, int], Tuple[float, Union[List[ResolveResult], ErroDNS]]] = {}
+        self._consultas: Dict[Tuple[str, int], asyncio.Future] = {}
+        self._sistema: Optional[ThreadedResolver] = None
+        self._dns = None
+
+    def _base(self, host: str, port: int, family: int, enderecos: List[str]) -> List[ResolveResult]:
+        """Monta o resultado no formato do aiohttp"""
+        return [
+            ResolveResult(
+                hostname=host,
+                host=e,
+                port=port,
+                family=socket.AF_INET6 if ':' in e else socket.AF_INET,
+                proto=0,
+                flags=socket.AI_NUMERICHOST | socket.AI_NUMERICSERV
+            )
+            for e in enderecos
+        ]
+
+    async def _consultar(self, host: str, family: int) -> Tuple[List[str], float]:
+        """Resolve o host sem o cache
+
+        Returns:
+            Os endereços encontrados e por quanto tempo (em segundos) eles são válidos
+
+        Raises:
+            OSError: caso o host não possa ser resolvido
+        """
+        if aiodns is not None:
+            if self._dns is None:
+                self._dns = aiodns.DNSResolver(timeout=self.config.timeout)
+            enderecos, ttl = [], self.config.ttl
+            falha: Optional[Exception] = None
+            for registro in _REGISTROS.get(family, ['A']):
+                try:
+                    respostas = await self._dns.query(host, registro)
+                except aiodns.error.DNSError as e:
+                    falha = e
+                    continue
+                enderecos.extend(r.host for r in respostas)
+                ttl = min([ttl] + [getattr(r, 'ttl', ttl) for r in respostas])
+            if not enderecos:
+                raise ErroDNS(f"{host}: {falha}")
+            return enderecos, ttl
+
+        if self._sistema is None:
+            self._sistema = ThreadedResolver()
+        resultados = await self._sistema.resolve(host, 0, family=family)
+        return [r['host'] for r in resultados], self.config.ttl
+
+    async def _resolver(self, host: str, family: int) -> List[ResolveResult]:
+        """Resolve o host, guardando a resposta (ou a falha) no cache"""
+        inicio = perf_counter()
+        try:
+            enderecos, ttl = await asyncio.wait_for(self._consultar(host, family), self.config.timeout)
+        except asyncio.TimeoutError:
+            erro = ErroDNS(f"{host}: tempo esgotado ao resolver o nome")
+        except OSError as e:
+            erro = e if isinstance(e, ErroDNS) else ErroDNS(f"{host}: {e}")
+        else:
+            Prometheus.observar(TipoPrometheus.DNS_RESOLUTION, perf_counter() - inicio, 'ok')
+            resultado = self._base(host, 0, family, enderecos)
+            self._cache[(host, family)] = (monotonic() + ttl, resultado)
+            return resultado
+
+        Prometheus.observar(TipoPrometheus.DNS_RESOLUTION, perf_counter() - inicio, 'error')
+        self._cache[(host, family)] = (monotonic() + self.config.negative_ttl, erro)
+        raise erro
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> List[ResolveResult]:
+        """Resolve um host, usando o cache quando possível
+
+        Args:
+            host (str): nome a ser resolvido
+            port (int): porta incluída nos resultados
+            family (int): família de endereços (AF_INET, AF_INET6 ou AF_UNSPEC)
+
+        Raises:
+            ErroDNS: caso o host não possa ser resolvido (ou a falha ainda esteja no cache)
+        """
+        try:
+            ipaddress.ip_address(host)
+            return self._base(host, port, family, [host])
+        except ValueError:
+            pass
+
+        chave = (host, family)
+        guardado = self._cache.get(chave)
+        if guardado is not None and guardado[0] > monotonic():
+            resultado = guardado[1]
+        else:
+            consulta = self._consultas.get(chave)
+            if consulta is None:
+                # as demais resoluções do mesmo host aguardam esta consulta
+                consulta = asyncio.ensure_future(self._resolver(host, family))
+                self._consultas[chave] = consulta
+                consulta.add_done_callback(lambda c: self._consulta_terminada(chave, c))
+            resultado = await asyncio.shield(consulta)
+
+        if isinstance(resultado, ErroDNS):
+            raise resultado
+        return [dict(r, port=port) for r in resultado]
+
+    def _consulta_terminada(self, chave: Tuple[str, int], consulta: asyncio.Future):
+        """Remove a consulta terminada, marcando a sua falha como tratada (ela fica no cache)"""
+        self._consultas.pop(chave, None)
+        if not consulta.cancelled():
+            consulta.exception()
+
+    def limpar(self):
+        """Esvazia o cache"""
+        self._cache.clear()
+
+    async def close(self):
+        """Cancela as consultas em andamento"""
+        for consulta in list(self._consultas.values()):
+            consulta.cancel()
+        self._consultas.clear()
+        if self._sistema is not None:
+            await self._sistema.close()
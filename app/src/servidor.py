@@ -0,0 +1,163 @@
+"""servidor.py
+
+Contém a implementação do ServidorMetricas, que serve o endpoint /metrics para o Prometheus.
+
+O texto da tabela de resultados é reaproveitado enquanto nenhum resultado mudar, e
+as demais métricas (histogramas, métricas internas) são renderizadas pelo prometheus_client.
+Caso o cliente aceite, a resposta é comprimida com gzip.
+
+Com o histórico em disco configurado, o servidor também responde as consultas do
+histórico em json: `/history/uptime` (disponibilidade de um módulo em uma janela) e
+`/history` (resultados de um módulo em uma janela).
+
+A rota `/sla` responde a disponibilidade rolante (24h, 7d e 30d) dos módulos em json.
+"""
+import gzip
+import asyncio
+import logging
+from time import time
+from aiohttp import web
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.registry import CollectorRegistry
+
+from prom import Prometheus
+from historico import Historico
+
+from typing import Callable, Dict, Optional, Tuple
+
+
+class ServidorMetricas:
+    """Servidor HTTP das métricas"""
+
+    def __init__(self,
+                 porta: int,
+                 registro: CollectorRegistry = REGISTRY,
+                 tabela: Optional[Callable[[], bytes]] = None,
+                 historico: Optional[Historico] = None,
+                 sla: Optional[Callable[[], Dict[str, Dict]]] = None
+                 ):
+        """Inicializa o servidor. O servidor só é aberto em `executar`
+
+        Args:
+            porta (int): porta do servidor
+            registro (CollectorRegistry): registro do prometheus_client com as demais métricas
+            tabela (Callable[[], bytes], optional): renderiza a tabela de resultados. O mesmo objeto
+                deve ser retornado enquanto a tabela não mudar. Default é a tabela deste processo.
+            historico (Historico, optional): histórico em disco consultado pelas rotas /history.
+                Default é não servir o histórico.
+            sla (Callable[[], Dict[str, Dict]], optional): retorna o resumo da disponibilidade de cada
+                módulo, servido em /sla. Default é não servir a disponibilidade.
+        """
+        self.porta: int = porta
+        self.registro: CollectorRegistry = registro
+        self.tabela: Callable[[], bytes] = tabela if tabela is not None else Prometheus.renderizar_tabela
+        self.app: web.Application = web.Application()
+        self.app.router.add_get('/metrics', self._metricas)
+        self.historico: Optional[Historico] = historico
+        if historico is not None:
+            self.app.router.add_get('/history/uptime', self._disponibilidade)
+            self.app.router.add_get('/history', self._registros)
+        self.sla: Optional[Callable[[], Dict[str, Dict]]] = sla
+        if sla is not None:
+            self.app.router.add_get('/sla', self._sla)
+        self._gzip_tabela: Optional[Tuple[bytes, bytes]] = None
+
+    def _tabela_comprimida(self, tabela: bytes) -> bytes:
+        """Retorna a tabela comprimida, reaproveitando a compressão enquanto ela não mudar"""
+        if self._gzip_tabela is None or self._gzip_tabela[0] is not tabela:
+            self._gzip_tabela = (tabela, gzip.compress(tabela, compresslevel=1))
+        return self._gzip_tabela[1]
+
+    async def _metricas(self, request: web.Request) -> web.Response:
+        """Responde o texto das métricas"""
+        tabela = self.tabela()
+        demais = await asyncio.to_thread(generate_latest, self.registro)
+
+        headers = {'Content-Type': CONTENT_TYPE_LATEST}
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            # vários membros gzip concatenados formam um arquivo gzip válido
+            corpo = self._tabela_comprimida(tabela) + gzip.compress(demais, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+        else:
+            corpo = tabela + demais
+        return web.Response(body=corpo, headers=headers)
+
+    @staticmethod
+    def _janela(request: web.Request) -> Tuple[str, float, float]:
+        """Lê o módulo e a janela (`start` e `end`, horários unix) de uma consulta ao histórico.
+        O padrão são as últimas 24 horas
+
+        Raises:
+            HTTPBadRequest: caso o módulo não seja informado, ou a janela seja inválida
+        """
+        nome = request.query.get('module')
+        if not nome:
+            raise web.HTTPBadRequest(text="parâmetro module obrigatório")
+        try:
+            fim = float(request.query.get('end', time()))
+            inicio = float(request.query.get('start', fim - 86400))
+        except ValueError:
+            raise web.HTTPBadRequest(text="start e end precisam ser horários unix")
+        if inicio > fim:
+            raise web.HTTPBadRequest(text="start maior que end")
+        return nome, inicio, fim
+
+    async def _disponibilidade(self, request: web.Request) -> web.Response:
+        """Responde a disponibilidade de um módulo na janela"""
+        nome, inicio, fim = self._janela(request)
+        disponibilidade = await asyncio.to_thread(self.historico.disponibilidade, nome, inicio, fim)
+        return web.json_response({'module': nome, 'start': inicio, 'end': fim, 'uptime': disponibilidade})
+
+    async def _registros(self, request: web.Request) -> web.Response:
+        """Responde os resultados de um módulo na janela"""
+        nome, inicio, fim = self._janela(request)
+        try:
+            limite = int(request.query.get('limit', 1000))
+        except ValueError:
+            raise web.HTTPBadRequest(text="limit precisa ser um número inteiro")
+        registros = await asyncio.to_thread(self.historico.registros, nome, inicio, fim, limite)
+        return web.json_response({'module': nome, 'records': [
+            {'time': r.horario, 'status': r.status.name, 'duration': r.duracao, 'code': r.codigo, 'size': r.ocupacao}
+            for r in registros
+        ]})
+
+    async def _sla(self, request: web.Request) -> web.Response:
+        """Responde a disponibilidade rolante de todos os módulos, ou somente do módulo `module`"""
+        resumos = self.sla()
+        nome = request.query.get('module')
+        if nome is None:
+            return web.json_response(resumos)
+        if nome not in resumos:
+            raise web.HTTPNotFound(text="módulo sem testes")
+        return web.json_response({nome: resumos[nome]})
+
+    async def executar(self):
+        """Abre o servidor, e o mantém aberto até ser cancelado"""
+        runner = web.AppRunner(self.app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, port=self.porta).start()
+            logging.info("Servindo métricas na porta %d", self.porta)
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+
+def sla_do_registro(registro: CollectorRegistry) -> Dict[str, Dict]:
+    """Resumo da disponibilidade de cada módulo, a partir dos gauges do registro
+
+    Usado no modo com vários processos, onde os agregadores ficam nos trabalhadores. Somente
+    a disponibilidade e o tempo fora do ar de cada janela são conhecidos pelo processo principal
+
+    Args:
+        registro (CollectorRegistry): registro com os gauges monitor_sla_* dos trabalhadores
+    """
+    campos = {'monitor_sla_availability': 'availability', 'monitor_sla_downtime_seconds': 'downtime_seconds'}
+    resumos: Dict[str, Dict] = {}
+    for metrica in registro.collect():
+        if metrica.name not in campos:
+            continue
+        for amostra in metrica.samples:
+            janela = resumos.setdefault(amostra.labels['monitorName'], {}).setdefault(amostra.labels['window'], {})
+            janela[campos[metrica.name]] = amostra.value
+    return resumos
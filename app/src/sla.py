@@ -0,0 +1,202 @@
+"""sla.py
+
+Contém a implementação do AgregadorSLA, que mantém a disponibilidade de cada
+módulo nas últimas 24 horas, 7 dias e 30 dias, atualizada a cada teste.
+
+Cada janela é dividida em baldes de tamanho fixo (1 hora, 6 horas e 1 dia), e
+guarda, por balde e no total da janela: a quantidade de testes de cada status, os
+segundos com resultado, os segundos fora do ar e um histograma logarítmico da
+duração dos testes. Quando um balde sai da janela, os seus valores são subtraídos
+do total, de forma que cada teste custa O(1) e cada consulta lê somente os totais.
+Por isso, a janela efetivamente coberta varia entre a duração da janela menos um
+balde e a duração da janela.
+
+Cada status vale até o teste seguinte do módulo (limitado por `lacuna_max`, para
+que o monitor parado não conte como tempo com resultado). O módulo está fora do ar
+nos status que não são disponíveis (ver `historico.DISPONIVEIS`), e o tempo em
+UNKNOWN não conta.
+"""
+import bisect
+from time import time
+from array import array
+
+from enums import Status
+from historico import DISPONIVEIS
+from prom import TipoPrometheus, Prometheus
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# janelas: (nome, duração em segundos, quantidade de baldes)
+JANELAS: List[Tuple[str, float, int]] = [
+    ('24h', 86400, 24),
+    ('7d', 7 * 86400, 28),
+    ('30d', 30 * 86400, 30),
+]
+
+# limites (em segundos) do histograma da duração dos testes: de 1ms a ~32s, dobrando
+LIMITES_DURACAO: List[float] = [0.001 * 2 ** i for i in range(16)]
+
+_STATUS = list(Status)
+_SEGUNDOS = len(_STATUS)                # campo com os segundos com resultado
+_FORA = _SEGUNDOS + 1                   # campo com os segundos fora do ar
+_DURACOES = _FORA + 1                   # primeiro campo do histograma das durações
+_CAMPOS = _DURACOES + len(LIMITES_DURACAO) + 1
+
+
+class JanelaRolante:
+    """Valores somados em uma janela de tempo rolante, dividida em baldes"""
+
+    def __init__(self, duracao: float, baldes: int):
+        """Inicializa uma janela vazia
+
+        Args:
+            duracao (float): duração (em segundos) da janela
+            baldes (int): quantidade de baldes da janela
+        """
+        self.duracao: float = duracao
+        self.baldes: int = baldes
+        self.largura: float = duracao / baldes
+        self.totais: array = array('d', bytes(8 * _CAMPOS))
+        self._valores: array = array('d', bytes(8 * _CAMPOS * baldes))
+        self._atual: Optional[int] = None
+
+    def _avancar(self, horario: float) -> int:
+        """Move a janela até o horário, descartando os baldes que saíram dela
+
+        Returns:
+            A posição (no buffer de valores) do balde do horário
+        """
+        indice = int(horario // self.largura)
+        if self._atual is None:
+            self._atual = indice
+        elif indice > self._atual:
+            # no máximo uma volta completa: os demais baldes já estão vazios
+            for i in range(max(self._atual + 1, indice - self.baldes + 1), indice + 1):
+                posicao = (i % self.baldes) * _CAMPOS
+                for c in range(_CAMPOS):
+                    self.totais[c] -= self._valores[posicao + c]
+                    self._valores[posicao + c] = 0
+            self._atual = indice
+        # horários anteriores ao balde atual (relógio voltando) vão para o balde atual
+        return (self._atual % self.baldes) * _CAMPOS
+
+    def somar(self, horario: float, campo: int, valor: float):
+        """Soma um valor em um campo do balde do horário"""
+        posicao = self._avancar(horario)
+        self._valores[posicao + campo] += valor
+        self.totais[campo] += valor
+
+    def avancar(self, horario: float):
+        """Move a janela até o horário, sem somar valores"""
+        self._avancar(horario)
+
+
+class _SLAModulo:
+    """Janelas e último resultado de um módulo"""
+    __slots__ = ('janelas', 'horario', 'status')
+
+    def __init__(self):
+        self.janelas: List[JanelaRolante] = [JanelaRolante(d, b) for _, d, b in JANELAS]
+        self.horario: Optional[float] = None
+        self.status: Optional[Status] = None
+
+
+def _percentil(totais: array, fracao: float) -> Optional[float]:
+    """Limite superior (em segundos) do balde do histograma de durações que contém o percentil.
+    None caso não haja durações, ou o percentil esteja acima do último limite
+    """
+    contagens = totais[_DURACOES:]
+    total = sum(contagens)
+    if total <= 0:
+        return None
+    alvo, acumulado = fracao * total, 0
+    for i, contagem in enumerate(contagens):
+        acumulado += contagem
+        if acumulado >= alvo:
+            return LIMITES_DURACAO[i] if i < len(LIMITES_DURACAO) else None
+    return None
+
+
+class AgregadorSLA:
+    """Disponibilidade rolante (24h, 7d e 30d) de cada módulo"""
+
+    def __init__(self, lacuna_max: float = 3600):
+        """Inicializa o agregador sem módulos
+
+        Args:
+            lacuna_max (float): tempo (em segundos) máximo que um status vale sem um novo teste
+        """
+        self.lacuna_max: float = lacuna_max
+        self._modulos: Dict[str, _SLAModulo] = {}
+
+    def registrar(self, nome: str, status: Status, duracao: Optional[float] = None, horario: Optional[float] = None):
+        """Adiciona o resultado de um teste, atualizando as métricas do módulo
+
+        Args:
+            nome (str): nome do módulo
+            status (Status): status do teste
+            duracao (float, optional): duração (em segundos) do teste
+            horario (float, optional): horário (unix) do teste. Default é agora.
+        """
+        horario = horario if horario is not None else time()
+        modulo = self._modulos.get(nome)
+        if modulo is None:
+            modulo = self._modulos[nome] = _SLAModulo()
+
+        # o status anterior valeu até este teste
+        segundos = 0.0
+        if modulo.horario is not None and modulo.status != Status.UNKNOWN:
+            segundos = min(max(horario - modulo.horario, 0), self.lacuna_max)
+        fora = modulo.status not in DISPONIVEIS
+
+        balde_duracao = None if duracao is None else _DURACOES + bisect.bisect_left(LIMITES_DURACAO, duracao)
+        for janela in modulo.janelas:
+            janela.somar(horario, _STATUS.index(status), 1)
+            if segundos:
+                janela.somar(horario, _SEGUNDOS, segundos)
+                if fora:
+                    janela.somar(horario, _FORA, segundos)
+            if balde_duracao is not None:
+                janela.somar(horario, balde_duracao, 1)
+        modulo.horario, modulo.status = horario, status
+
+        for (nome_janela, _, _), janela in zip(JANELAS, modulo.janelas):
+            totais = janela.totais
+            if totais[_SEGUNDOS] > 0:
+                Prometheus.definir(TipoPrometheus.SLA_AVAILABILITY, 1 - totais[_FORA] / totais[_SEGUNDOS],
+                                   nome, nome_janela)
+            Prometheus.definir(TipoPrometheus.SLA_DOWNTIME, totais[_FORA], nome, nome_janela)
+
+    def resumo(self, nome: str, horario: Optional[float] = None) -> Optional[Dict]:
+        """Resumo das janelas de um módulo, ou None caso ele não tenha testes
+
+        Args:
+            nome (str): nome do módulo
+            horario (float, optional): horário (unix) da consulta, que descarta os baldes antigos. Default é agora.
+        """
+        modulo = self._modulos.get(nome)
+        if modulo is None:
+            return None
+        horario = horario if horario is not None else time()
+        resumo = {}
+        for (nome_janela, _, _), janela in zip(JANELAS, modulo.janelas):
+            janela.avancar(horario)
+            totais = janela.totais
+            resumo[nome_janela] = {
+                'probes': {s.name: int(totais[i]) for i, s in enumerate(_STATUS) if totais[i]},
+                'seconds': totais[_SEGUNDOS],
+                'downtime_seconds': totais[_FORA],
+                'availability': 1 - totais[_FORA] / totais[_SEGUNDOS] if totais[_SEGUNDOS] > 0 else None,
+                'latency': {f'p{int(f * 100)}': _percentil(totais, f) for f in (0.5, 0.95, 0.99)},
+            }
+        return resumo
+
+    def resumos(self, horario: Optional[float] = None) -> Dict[str, Dict]:
+        """Resumo das janelas de todos os módulos"""
+        return {nome: self.resumo(nome, horario) for nome in list(self._modulos)}
+
+    def reter(self, nomes: Iterable[str]):
+        """Descarta os módulos que não estão na lista fornecida"""
+        nomes = set(nomes)
+        for nome in [n for n in self._modulos if n not in nomes]:
+            del self._modulos[nome]
@@ -0,0 +1,142 @@
+"""statuspage.py
+
+Contém a implementação do DespachanteStatuspage, que envia os status dos
+componentes para a api da statuspage.io fora do caminho dos testes.
+
+Somente as mudanças de status são enviadas. Atualizações repetidas do mesmo
+componente são unidas (somente a mais recente é enviada), e os limites da api
+(429 / Retry-After) são respeitados, com novas tentativas em caso de erro.
+"""
+import asyncio
+import logging
+from aiohttp import ClientError
+
+from enums import Status
+from conexoes import PoolHTTP
+from models import ConfigStatuspage
+from prom import Prometheus, TipoPrometheus
+from instrumentacao import SERVICO_STATUSPAGE, medir_chamada
+
+from typing import Dict, Optional
+
+_CANAL = 'statuspage'
+
+
+class DespachanteStatuspage:
+    """Fila de atualizações de componentes da statuspage"""
+
+    BACKOFF_INICIAL = 1         # espera (s) após o primeiro erro
+    BACKOFF_MAXIMO = 300        # espera (s) máxima entre tentativas
+    RETRY_AFTER_PADRAO = 60     # espera (s) após um 429 sem Retry-After válido
+
+    def __init__(self, config: ConfigStatuspage, pool_http: PoolHTTP):
+        """Inicializa o despachante
+
+        Args:
+            config (ConfigStatuspage): configurações da statuspage
+            pool_http (PoolHTTP): pool de conexões usado para os requests
+        """
+        self.config: ConfigStatuspage = config
+        self.pool_http: PoolHTTP = pool_http
+        self._pendentes: Dict[str, Status] = {}
+        self._enviados: Dict[str, Status] = {}
+        self._tentativas: Dict[str, int] = {}
+        self._evento: Optional[asyncio.Event] = None
+        self._retry_after: Optional[float] = None
+
+    @property
+    def pendentes(self) -> int:
+        """Quantidade de componentes aguardando envio"""
+        return len(self._pendentes)
+
+    def enviar(self, componente: str, status: Status):
+        """Agenda o envio do status de um componente. Não é bloqueante
+
+        Caso o componente já possua um envio pendente, somente o status mais recente é enviado.
+        Caso o status seja igual ao último enviado com sucesso, nada é feito.
+
+        Args:
+            componente (str): identificador do componente na statuspage
+            status (Status): status a ser enviado
+        """
+        if status == Status.UNKNOWN:
+            return
+        if componente not in self._pendentes and self._enviados.get(componente) == status:
+            return
+
+        self._pendentes[componente] = status
+        Prometheus.get(TipoPrometheus.NOTIFICATION_QUEUE, _CANAL).set(len(self._pendentes))
+        if self._evento is not None:
+            self._evento.set()
+
+    def _url(self, componente: str) -> str:
+        """Url da api para o componente"""
+        return f'{self.config.url}/pages/{self.config.page_id}/components/{componente}'
+
+    async def _put(self, componente: str, status: Status) -> Optional[int]:
+        """Envia o status de um componente
+
+        Returns:
+            Código http da resposta, ou None em caso de erro de conexão.
+            Caso a api peça para esperar (429), o tempo é armazenado em `_retry_after`
+        """
+        self._retry_after = None
+        try:
+            async with self.pool_http.sessao.put(
+                self._url(componente),
+                headers={'Authorization': f'OAuth {self.config.api_key}'},
+                json={'component': {'status': status.nome()}}
+            ) as r:
+                if r.status == 429:
+                    try:
+                        self._retry_after = float(r.headers.get('Retry-After', ''))
+                    except ValueError:
+                        self._retry_after = self.RETRY_AFTER_PADRAO
+                elif r.status in [401, 404, 422]:
+                    try:
+                        mensagem = (await r.json(content_type=None))['message']
+                    except (ValueError, KeyError, TypeError):
+                        mensagem = 'resposta json inválida'
+                    logging.error('Erro ao enviar componente %s para statuspage [%s]: %s',
+                                  componente, r.status, mensagem)
+                return r.status
+        except (ClientError, asyncio.TimeoutError) as e:
+            logging.error("Erro de conexão ao enviar componente %s para statuspage: %s", componente, e)
+            return None
+
+    async def executar(self):
+        """Loop de envio das atualizações pendentes"""
+        self._evento = asyncio.Event()
+        while True:
+            if not self._pendentes:
+                self._evento.clear()
+                await self._evento.wait()
+                continue
+
+            componente = next(iter(self._pendentes))
+            status = self._pendentes.pop(componente)
+            Prometheus.get(TipoPrometheus.NOTIFICATION_QUEUE, _CANAL).set(len(self._pendentes))
+            if self._enviados.get(componente) == status:
+                continue
+
+            with medir_chamada(SERVICO_STATUSPAGE) as medicao:
+                codigo = await self._put(componente, status)
+                if codigo is None or not 200 <= codigo < 300:
+                    medicao.falhou()
+            if codigo is not None and (200 <= codigo < 300 or codigo in [401, 404, 422]):
+                # enviado, ou erro que não adianta tentar novamente
+                if 200 <= codigo < 300:
+                    self._enviados[componente] = status
+                self._tentativas.pop(componente, None)
+                continue
+
+            # erro temporário: volta para a fila (caso não haja um status mais novo) e espera
+            self._pendentes.setdefault(componente, status)
+            Prometheus.get(TipoPrometheus.NOTIFICATION_QUEUE, _CANAL).set(len(self._pendentes))
+            tentativas = self._tentativas[componente] = self._tentativas.get(componente, 0) + 1
+            if codigo == 429:
+                espera = self._retry_after
+            else:
+                espera = min(self.BACKOFF_MAXIMO, self.BACKOFF_INICIAL * 2 ** (tentativas - 1))
+            logging.warning("Statuspage indisponível [%s], tentando novamente em %0.1fs", codigo, espera)
+            await asyncio.sleep(espera)
@@ -0,0 +1,215 @@
+"""tabela.py
+
+Contém a implementação da TabelaResultados, uma tabela compacta com o último
+resultado de cada módulo, e a renderização dessa tabela no formato de texto
+do Prometheus.
+
+Cada módulo ocupa uma linha de tamanho fixo (nome + um float por coluna) em um
+único buffer. Valores ausentes são armazenados como NaN. Um contador de geração,
+incrementado a cada escrita, permite reaproveitar o texto renderizado enquanto
+nenhum resultado mudar.
+
+Com vários processos, cada processo escreve na sua própria tabela (em uma memória
+compartilhada), e o processo principal renderiza todas juntas com UniaoTabelas.
+"""
+import math
+import struct
+from prometheus_client.utils import floatToGoString
+
+from typing import Dict, List, Optional, Tuple
+
+NOME_MAX = 128      # tamanho máximo (em bytes) do nome de um módulo
+
+# colunas da tabela: (nome da métrica, documentação)
+COLUNAS: List[Tuple[str, str]] = [
+    ('monitor_status', 'Status of the specific monitor'),
+    ('monitor_test_duration', 'Test duration for the specific monitor'),
+    ('monitor_http_status_code', 'Status code of the last probe'),
+    ('monitor_size', 'Free space available for the specific monitor'),
+]
+LABEL = 'monitorName'
+
+_CABECALHO = struct.Struct('<QI4x')                         # geração, linhas em uso
+_LINHA = struct.Struct(f'<{NOME_MAX}s{len(COLUNAS)}d')      # nome, valores
+_NAN = float('nan')
+
+
+def tamanho_buffer(capacidade: int) -> int:
+    """Tamanho (em bytes) do buffer de uma tabela com a capacidade fornecida"""
+    return _CABECALHO.size + capacidade * _LINHA.size
+
+
+def _escapar(valor: str) -> str:
+    """Escapa o valor de uma label para o formato de texto do Prometheus"""
+    return valor.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class TabelaResultados:
+    """Tabela com os últimos resultados de cada módulo, indexada pelo id do módulo"""
+
+    def __init__(self, capacidade: int = 1024, buffer: Optional[memoryview] = None):
+        """Inicializa uma tabela vazia
+
+        Args:
+            capacidade (int): quantidade inicial de linhas
+            buffer (memoryview, optional): buffer externo (como uma memória compartilhada) onde a tabela
+                será armazenada. Nesse caso, a capacidade é fixa e limitada pelo tamanho do buffer, e
+                as linhas existentes no buffer são descartadas. Default é um buffer próprio, que cresce
+                quando necessário.
+        """
+        self._fixo: bool = buffer is not None
+        if buffer is None:
+            buffer = bytearray(tamanho_buffer(capacidade))
+        self._buffer = buffer
+        self._ids: Dict[str, int] = {}
+        self._livres: List[int] = []
+        self._cache: Optional[Tuple[int, bytes]] = None
+        self._cache_amostras: Optional[Tuple[int, List[str]]] = None
+        if self._fixo:
+            self._alterar_cabecalho(0)
+
+    @property
+    def capacidade(self) -> int:
+        """Quantidade de linhas que cabem no buffer atual"""
+        return (len(self._buffer) - _CABECALHO.size) // _LINHA.size
+
+    @property
+    def geracao(self) -> int:
+        """Contador incrementado a cada alteração da tabela"""
+        return _CABECALHO.unpack_from(self._buffer, 0)[0]
+
+    def _em_uso(self) -> int:
+        return _CABECALHO.unpack_from(self._buffer, 0)[1]
+
+    def _alterar_cabecalho(self, em_uso: Optional[int] = None):
+        """Incrementa a geração, e opcionalmente altera a quantidade de linhas em uso"""
+        geracao, atual = _CABECALHO.unpack_from(self._buffer, 0)
+        _CABECALHO.pack_into(self._buffer, 0, geracao + 1, atual if em_uso is None else em_uso)
+
+    def _offset(self, ident: int, coluna: int = -1) -> int:
+        """Offset de uma linha (ou de uma coluna da linha) no buffer"""
+        offset = _CABECALHO.size + ident * _LINHA.size
+        if coluna >= 0:
+            offset += NOME_MAX + 8 * coluna
+        return offset
+
+    def registrar(self, nome: str) -> Optional[int]:
+        """Retorna o id de um módulo, criando uma linha vazia caso ainda não exista
+
+        Returns:
+            id do módulo, ou None caso a tabela esteja cheia (somente em buffers externos)
+
+        Raises:
+            ValueError: caso o nome exceda NOME_MAX bytes
+        """
+        ident = self._ids.get(nome)
+        if ident is not None:
+            return ident
+
+        nome_bytes = nome.encode()
+        if not nome_bytes or len(nome_bytes) > NOME_MAX:
+            raise ValueError(f"Nome de módulo inválido para a tabela: {nome}")
+
+        em_uso = self._em_uso()
+        if self._livres:
+            ident = self._livres.pop()
+        else:
+            if em_uso >= self.capacidade:
+                if self._fixo:
+                    return None
+                self._buffer.extend(bytes(self.capacidade * _LINHA.size))
+            ident = em_uso
+            em_uso += 1
+
+        _LINHA.pack_into(self._buffer, self._offset(ident), nome_bytes, *([_NAN] * len(COLUNAS)))
+        self._ids[nome] = ident
+        self._alterar_cabecalho(em_uso)
+        return ident
+
+    def liberar(self, nome: str):
+        """Remove a linha de um módulo, deixando-a livre para outro módulo"""
+        ident = self._ids.pop(nome, None)
+        if ident is None:
+            return
+        _LINHA.pack_into(self._buffer, self._offset(ident), b'', *([_NAN] * len(COLUNAS)))
+        self._livres.append(ident)
+        self._alterar_cabecalho()
+
+    def definir(self, ident: int, coluna: int, valor: float):
+        """Altera o valor de uma coluna de um módulo"""
+        struct.pack_into('<d', self._buffer, self._offset(ident, coluna), valor)
+        self._alterar_cabecalho()
+
+    def limpar(self, ident: int, coluna: int):
+        """Remove o valor de uma coluna de um módulo"""
+        self.definir(ident, coluna, _NAN)
+
+    def linhas(self):
+        """Itera sobre (nome, valores) das linhas em uso"""
+        fim = self._offset(self._em_uso())
+        for nome, *valores in _LINHA.iter_unpack(self._buffer[_CABECALHO.size:fim]):
+            if nome[0]:
+                yield nome.rstrip(b'\0').decode(), valores
+
+    def amostras(self) -> List[str]:
+        """Retorna as linhas de texto de cada coluna, sem os cabeçalhos das métricas
+
+        O texto é reaproveitado enquanto a tabela não for alterada
+        """
+        geracao = self.geracao
+        if self._cache_amostras is not None and self._cache_amostras[0] == geracao:
+            return self._cache_amostras[1]
+
+        amostras: List[List[str]] = [[] for _ in COLUNAS]
+        for nome, valores in self.linhas():
+            label = f'{{{LABEL}="{_escapar(nome)}"}} '
+            for i, valor in enumerate(valores):
+                if not math.isnan(valor):
+                    amostras[i].append(f'{COLUNAS[i][0]}{label}{floatToGoString(valor)}\n')
+
+        texto = [''.join(linhas) for linhas in amostras]
+        self._cache_amostras = (geracao, texto)
+        return texto
+
+    def renderizar(self) -> bytes:
+        """Retorna a tabela no formato de texto do Prometheus
+
+        O texto é reaproveitado enquanto a tabela não for alterada
+        """
+        geracao = self.geracao
+        if self._cache is None or self._cache[0] != geracao:
+            self._cache = (geracao, _juntar([self]))
+        return self._cache[1]
+
+
+def _juntar(tabelas: List[TabelaResultados]) -> bytes:
+    """Renderiza as amostras de várias tabelas sob um único cabeçalho por métrica"""
+    amostras = [t.amostras() for t in tabelas]
+    partes: List[str] = []
+    for i, (metrica, documentacao) in enumerate(COLUNAS):
+        partes.append(f'# HELP {metrica} {documentacao}\n# TYPE {metrica} gauge\n')
+        partes.extend(a[i] for a in amostras)
+    return ''.join(partes).encode()
+
+
+class UniaoTabelas:
+    """Várias tabelas (por exemplo, uma por processo) renderizadas como uma só"""
+
+    def __init__(self, tabelas: List[TabelaResultados]):
+        """Inicializa a união
+
+        Args:
+            tabelas (List[TabelaResultados]): tabelas a serem unidas. Um módulo não deve estar em mais de uma
+        """
+        self.tabelas: List[TabelaResultados] = tabelas
+        self._cache: Optional[Tuple[Tuple[int, ...], bytes]] = None
+
+    def renderizar(self) -> bytes:
+        """Retorna todas as tabelas no formato de texto do Prometheus
+
+        O texto é reaproveitado enquanto nenhuma tabela for alterada
+        """
+        geracoes = tuple(t.geracao for t in self.tabelas)
+        if self._cache is None or self._cache[0] != geracoes:
+            self._cache = (geracoes, _juntar(self.tabelas))
+        return self._cache[1]
@@ -2,19 +2,34 @@
 
 Contém a implementação da classe Testador, que faz os testes do projeto
 """
+import json
 import socket
+import asyncio
 import logging
-from time import time
-from requests import get, post, put, Response
-from discord_webhook import DiscordWebhook
-from requests.exceptions import ConnectTimeout, ConnectionError, JSONDecodeError
-
-from armazenamento import Armazenamento
-from enums import TipoMetodoHTTP, Status
+from time import perf_counter
+from aiohttp import ClientError, ClientConnectorDNSError
+
+try:
+    import orjson
+except ImportError:     # pragma: no cover - dependência opcional
+    orjson = None
+
+from conexoes import PoolHTTP, ler_corpo, descartar_corpo
+from portas import VerificadorPortas
+from resolvedor import ErroDNS
+from cache import CacheStatus
+from historico import Historico, DISPONIVEIS
+from sla import AgregadorSLA
+from latencias import JanelaLatencias
+from dependencias import GrafoDependencias
+from coalescencia import CoalescenciaTestes, chave_teste
+from notificacao import FilaDiscord
+from statuspage import DespachanteStatuspage
+from enums import TipoMetodoHTTP, TipoModulo, TipoPolitica, Status
 from prom import TipoPrometheus, Prometheus
-from models import Modulo, ConfigDiscord, ConfigStatuspage
+from models import Modulo, ResultadoPorta, ResultadoTeste, ConfigTeste
 
-from typing import Optional
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
 
 
 class TestadorBase:
@@ -26,98 +41,381 @@ class TestadorBase:
     VERSAO = '1.4'
     NOME = f'Monitor (Leinadium v{VERSAO})'
 
+    TIMEOUT_PADRAO: Optional[float] = None  # timeout (s) do tipo de teste. None usa o timeout do pool http
+
     @classmethod
     def set_version(cls, versao: str):
         cls.VERSAO = versao
 
     def __init__(self,
                  modulo: Modulo,
-                 armazenamento: Optional[Armazenamento] = None,
-                 discord: Optional[ConfigDiscord] = None,
-                 statuspage: Optional[ConfigStatuspage] = None
+                 armazenamento: Optional[CacheStatus] = None,
+                 discord: Optional[FilaDiscord] = None,
+                 statuspage: Optional[DespachanteStatuspage] = None,
+                 pool_http: Optional[PoolHTTP] = None,
+                 notificador: Optional[Callable[[str], bool]] = None,
+                 historico: Optional[Historico] = None,
+                 sla: Optional[AgregadorSLA] = None,
+                 teste: Optional[ConfigTeste] = None,
+                 dependencias: Optional[GrafoDependencias] = None,
+                 coalescencia: Optional[CoalescenciaTestes] = None,
+                 tentativa: Optional[int] = None
                  ):
         """Inicializa um testador
 
         Args:
             modulo (Modulo): Módulo a ser testado
-            armazenamento (Armazenamento, optional): Armazenamento a ser usado. Default é None.
-            discord (Discord, optional): Configurações do Discord. Default é None.
-            statuspage (StatusPage, optional): Configurações do StatusPage. Default é None.
+            armazenamento (CacheStatus, optional): Cache do armazenamento a ser usado. Default é None.
+            discord (FilaDiscord, optional): Fila de notificações do Discord. Default é None.
+            statuspage (DespachanteStatuspage, optional): Despachante da StatusPage. Default é None.
+            pool_http (PoolHTTP, optional): Pool de conexões HTTP compartilhado. Default é um pool próprio.
+            notificador (Callable[[str], bool], optional): Indica, pelo nome do módulo, se este nó deve
+                enviar as notificações. Default é sempre notificar.
+            historico (Historico, optional): Histórico em disco onde cada resultado é guardado. Default é None.
+            sla (AgregadorSLA, optional): Agregador da disponibilidade rolante do módulo. Default é None.
+            teste (ConfigTeste, optional): Confirmações de falha e timeout adaptativo. Default é sem
+                confirmações, com o timeout configurado.
+            dependencias (GrafoDependencias, optional): Grafo com o status das dependências do módulo. O módulo
+                não é testado enquanto uma dependência estiver fora do ar. Default é None.
+            coalescencia (CoalescenciaTestes, optional): Testes compartilhados entre os módulos que testam o
+                mesmo endpoint. Default é sempre fazer um teste próprio.
+            tentativa (int, optional): Índice do testador entre as tentativas de confirmação de uma falha.
+                As tentativas só compartilham o teste com as tentativas de mesmo índice. Default é None.
         """
         self.modulo: Modulo = modulo
-        self.armazenamento: Optional[Armazenamento] = armazenamento
-
-        # para o discord
-        if discord is not None:
-            self.discord: Optional[ConfigDiscord] = discord
-            self.discord_url = f'https://discordapp.com/api/webhooks/{discord.ident}/{discord.token}'
-        else:
-            self.discord = None
-            self.discord_url = None
-
-        self.statuspage: Optional[ConfigStatuspage] = statuspage
+        self.armazenamento: Optional[CacheStatus] = armazenamento
+        self.pool_http: PoolHTTP = pool_http if pool_http is not None else PoolHTTP()
+
+        self.discord: Optional[FilaDiscord] = discord
+        self.statuspage: Optional[DespachanteStatuspage] = statuspage
+        self.notificador: Optional[Callable[[str], bool]] = notificador
+        self.historico: Optional[Historico] = historico
+        self.sla: Optional[AgregadorSLA] = sla
+        self.teste: ConfigTeste = teste if teste is not None else ConfigTeste()
+        self.latencias: JanelaLatencias = JanelaLatencias(self.teste)
+        self.timeout: Optional[float] = None            # timeout (s) da tentativa atual. None usa o configurado
+        self._confirmadores: List[TestadorBase] = []    # testadores das tentativas de confirmação
+        self.dependencias: Optional[GrafoDependencias] = dependencias
+        self.coalescencia: Optional[CoalescenciaTestes] = coalescencia
+        self.tentativa: Optional[int] = tentativa
 
         # variaveis para armazenar os resultados
         self.status: Optional[Status] = Status.UNKNOWN
         self.duracao: Optional[float] = None
         self.informacao_adicional: Optional[str] = None
-
-    def testar_http(self):
+        self.ultimo_status: Optional[Status] = None     # status armazenado antes do teste atual
+        self.codigo: Optional[int] = None               # código http da resposta do teste atual
+        self.ocupacao: Optional[float] = None           # ocupação medida pelo teste SIZE atual
+        self.fases: Dict[str, float] = {}               # duração (s) de cada fase do teste atual
+        self.conexoes: List[Tuple[str, float]] = []     # latência (s) da conexão de cada alvo aberto
+        self.falha_dns: bool = False                    # o teste atual não resolveu o nome do módulo
+        self._falhas_dns: int = 0                       # testes seguidos sem resolver o nome
+        self.causa: Optional[str] = None                # dependência fora do ar que impediu o teste atual
+        self._estava_inacessivel: bool = False          # o teste anterior foi impedido por uma dependência
+        self.compartilhado: Optional[ResultadoTeste] = None     # resultado compartilhado do teste atual
+
+    def timeout_padrao(self) -> float:
+        """Timeout (s) configurado do teste: o do módulo, ou o padrão do tipo de teste"""
+        if self.modulo.timeout is not None:
+            return self.modulo.timeout
+        return self.TIMEOUT_PADRAO if self.TIMEOUT_PADRAO is not None else self.pool_http.config.timeout
+
+    def tempo_limite(self) -> float:
+        """Timeout (s) da tentativa atual, usado pelos casos de teste"""
+        return self.timeout if self.timeout is not None else self.timeout_padrao()
+
+    async def testar_http(self):
         """Faz o teste para o módulo caso seja do tipo HTTP"""
         pass
 
-    def testar_port(self):
+    async def testar_port(self):
         """Faz o teste para o módulo caso seja do tipo Port"""
         pass
 
-    def testar_size(self):
+    async def testar_size(self):
         """Faz o teste para o módulo caso seja do tipo Size"""
         pass
 
-    def testar_custom(self):
+    async def testar_custom(self):
         """Faz o teste customizado do módulo"""
         pass
 
-    def testar(self):
+    async def executar_casos(self):
+        """Executa os casos de teste do módulo, definindo o status e as informações do resultado,
+        sem publicá-lo (armazenamento, notificações e métricas de status)
+
+        Com a coalescência, o teste do endpoint é compartilhado com os outros módulos que o testam
+        (ver `CoalescenciaTestes`), e o seu resultado é copiado para este testador
+        """
+        self.codigo = self.ocupacao = None
+        self.fases, self.conexoes = {}, []
+        self.falha_dns = False
+        self.compartilhado = None
+
+        chave = self.chave_coalescencia()
+        if chave is not None:
+            try:
+                resultado = await self.coalescencia.obter(chave, self._testar_endpoint, self.tempo_limite(),
+                                                          reaproveitar=self.tentativa is None)
+            except asyncio.TimeoutError:
+                resultado = ResultadoTeste(Status.MAJOR_OUTAGE, 'tempo esgotado')
+            self.aplicar_compartilhado(resultado)
+            return
+
+        await self.testar_http()
+        await self.testar_port()
+        await self.testar_size()
+        await self.testar_custom()
+
+    def chave_coalescencia(self) -> Optional[Hashable]:
+        """Chave do teste compartilhado deste testador, ou None caso o teste seja próprio
+
+        Cada tentativa de confirmação usa uma chave própria: ela não reaproveita a falha que está
+        confirmando nem resultados recentes, mas é unida à tentativa em andamento de mesmo índice
+        de outro módulo com o mesmo endpoint
+        """
+        chave = chave_teste(self.modulo) if self.coalescencia is not None else None
+        if chave is None or self.tentativa is None:
+            return chave
+        return chave, self.tentativa
+
+    def resultado(self, duracao: Optional[float]) -> ResultadoTeste:
+        """Resultado dos casos de teste executados, com a duração fornecida"""
+        return ResultadoTeste(self.status, self.informacao_adicional, duracao, self.codigo, self.ocupacao,
+                              self.fases, self.conexoes, self.falha_dns)
+
+    def copiar(self, resultado: ResultadoTeste):
+        """Substitui o resultado dos casos de teste pelo fornecido"""
+        self.status, self.informacao_adicional = resultado.status, resultado.informacao_adicional
+        self.codigo, self.ocupacao = resultado.codigo, resultado.ocupacao
+        self.fases, self.conexoes = resultado.fases, resultado.conexoes
+        self.falha_dns = resultado.falha_dns
+
+    async def _testar_endpoint(self) -> ResultadoTeste:
+        """Faz o teste do endpoint do módulo em um testador próprio, sem coalescência, retornando o
+        resultado a ser compartilhado. O teste continua mesmo que este testador seja cancelado
+        """
+        testador = type(self)(self.modulo, pool_http=self.pool_http, teste=self.teste)
+        testador.timeout = self.tempo_limite()
+        inicio = perf_counter()
+        await testador.executar_casos()
+        return testador.resultado(perf_counter() - inicio)
+
+    def aplicar_compartilhado(self, resultado: ResultadoTeste):
+        """Copia o resultado do teste compartilhado de um endpoint"""
+        self.compartilhado = resultado
+        self.copiar(resultado)
+
+    async def _tentativa(self, timeout: float) -> float:
+        """Executa os casos de teste com o timeout fornecido, guardando a latência caso o módulo esteja disponível
+
+        Returns:
+            A duração (em segundos) da tentativa. Com um resultado compartilhado, a duração do teste do endpoint
+        """
+        self.timeout = timeout
+        inicio = perf_counter()
+        await self.executar_casos()
+        duracao = perf_counter() - inicio
+        if self.compartilhado is not None and self.compartilhado.duracao is not None:
+            duracao = self.compartilhado.duracao
+        if self.status in DISPONIVEIS:
+            self.latencias.registrar(duracao)
+        return duracao
+
+    def _confirmacao_necessaria(self) -> bool:
+        """Indica se o resultado atual é uma falha que mudaria o status armazenado do módulo"""
+        if self.teste.tentativas <= 0 or self.status in DISPONIVEIS or self.status in (None, Status.UNKNOWN):
+            return False
+        return self.armazenamento is None or self.armazenamento.coletar(self.modulo.nome) != self.status
+
+    async def executar_tentativas(self):
+        """Executa os casos de teste, confirmando as falhas antes que elas mudem o status
+
+        O timeout do teste é o adaptativo (ver JanelaLatencias), limitado pelo orçamento do ciclo:
+        a fração `orcamento` do intervalo do módulo. Caso o resultado seja uma falha diferente
+        do status armazenado, `tentativas` testes são executados imediatamente e ao mesmo tempo,
+        com o timeout configurado (limitado ao que resta do orçamento). O primeiro disponível
+        substitui a falha, e os demais são cancelados. Sem nenhum disponível, a falha é confirmada.
+        As tentativas não publicam métricas: somente o resultado escolhido é publicado (ver `publicar_metricas`).
+        """
+        loop = asyncio.get_running_loop()
+        padrao = self.timeout_padrao()
+        orcamento = self.modulo.intervalo * self.teste.orcamento if self.modulo.intervalo is not None else None
+        fim = loop.time() + orcamento if orcamento is not None else None
+
+        timeout = self.latencias.timeout(padrao)
+        if orcamento is not None:
+            timeout = min(timeout, orcamento)
+        Prometheus.get(TipoPrometheus.PROBE_TIMEOUT, self.modulo.nome).set(timeout)
+        self.duracao = await self._tentativa(timeout)
+        if not self._confirmacao_necessaria():
+            return
+
+        restante = min(padrao, fim - loop.time()) if fim is not None else padrao
+        if restante <= 0:
+            logging.warning("Sem tempo no ciclo para confirmar a falha do modulo %s", self.modulo.nome)
+            Prometheus.incrementar(TipoPrometheus.FAILURE_CONFIRMATIONS, 'no_budget')
+            return
+
+        if not self._confirmadores:
+            self._confirmadores = [type(self)(self.modulo, pool_http=self.pool_http, teste=self.teste,
+                                              coalescencia=self.coalescencia, tentativa=i)
+                                   for i in range(self.teste.tentativas)]
+            for testador in self._confirmadores:
+                testador.latencias = self.latencias
+        tarefas = {asyncio.ensure_future(t._tentativa(restante)): t for t in self._confirmadores}
+        pendentes = set(tarefas)
+        recuperado: Optional[Tuple[TestadorBase, float]] = None
+        try:
+            while pendentes and recuperado is None:
+                feitos, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in feitos:
+                    testador = tarefas[tarefa]
+                    if tarefa.exception() is not None:
+                        logging.error("Erro ao confirmar a falha do modulo %s: %r", self.modulo.nome,
+                                      tarefa.exception())
+                    elif testador.status in DISPONIVEIS and recuperado is None:
+                        recuperado = testador, tarefa.result()
+        finally:
+            for tarefa in pendentes:
+                tarefa.cancel()
+            if pendentes:
+                await asyncio.wait(pendentes)
+
+        if recuperado is None:
+            Prometheus.incrementar(TipoPrometheus.FAILURE_CONFIRMATIONS, 'confirmed')
+            self.informacao_adicional = (f'{self.informacao_adicional or self.status.nome()} '
+                                         f'(confirmado por {len(tarefas)} tentativas)')
+            return
+
+        testador, duracao = recuperado
+        logging.warning("Falha do modulo %s não confirmada: %s", self.modulo.nome, self.informacao_adicional)
+        Prometheus.incrementar(TipoPrometheus.FAILURE_CONFIRMATIONS, 'recovered')
+        resultado = testador.resultado(duracao)
+        self.copiar(resultado)
+        self.duracao = duracao
+        chave = chave_teste(self.modulo) if self.coalescencia is not None else None
+        if chave is not None:
+            # os módulos que reaproveitam o resultado do endpoint não repetem a confirmação
+            self.coalescencia.guardar(chave, resultado)
+
+    def marcar_inacessivel(self, causa: str):
+        """Marca o módulo como fora do ar sem testá-lo, pois uma dependência está fora do ar
+
+        Args:
+            causa (str): nome da dependência fora do ar (a causa raiz)
+        """
+        self.status = Status.MAJOR_OUTAGE
+        self.informacao_adicional = f'Inacessível: {causa} fora do ar'
+        self.duracao = self.codigo = self.ocupacao = None
+
+    async def testar(self):
         """Testa o módulo
 
-        Executa todos os casos de teste aplicáveis para o módulo.
+        Executa todos os casos de teste aplicáveis para o módulo, confirmando as falhas
+        (ver `executar_tentativas`). Caso uma dependência do módulo esteja fora do ar,
+        o módulo não é testado, e é marcado como inacessível (ver `marcar_inacessivel`).
         Caso o status do módulo seja diferente de nulo após todos os testes,
-        então o resultado é armazenado no armazenamento.
-
-        Além disso, são executadas as notificações para o discord e para a statuspage
+        então o resultado é armazenado no cache do armazenamento, recuperando o status anterior.
+        Um teste sem resultado (UNKNOWN, como em uma falha de DNS) não altera o status armazenado.
 
+        Além disso, são agendadas as notificações para o discord e para a statuspage,
+        que são enviadas em segundo plano
         """
-        _tempo = time()
+        self._estava_inacessivel = self.causa is not None
+        self.causa = self.dependencias.causa(self.modulo) if self.dependencias is not None else None
+        if self.causa is not None:
+            self.marcar_inacessivel(self.causa)
+        else:
+            await self.executar_tentativas()
+            self.verificar_falhas_dns()
+            self.publicar_metricas()
+        if self.dependencias is not None:
+            self.dependencias.registrar(self.modulo.nome, self.status, self.causa)
 
-        self.testar_http()
-        self.testar_port()
-        self.testar_size()
-        self.testar_custom()
+        if self.status != Status.UNKNOWN:
+            if self.armazenamento:
+                self.ultimo_status = self.armazenamento.trocar(self.modulo.nome, self.status)
 
-        self.duracao = time() - _tempo
+            if self.notificador is None or self.notificador(self.modulo.nome):
+                self.notificar_discord()
+                self.notificar_statuspage()
 
-        self.notificar_discord()
-        self.notificar_statuspage()
+        if self.historico is not None and self.status is not None:
+            self.historico.registrar(self.modulo.nome, self.status, self.duracao, self.codigo, self.ocupacao)
+        if self.sla is not None and self.status is not None:
+            self.sla.registrar(self.modulo.nome, self.status, self.duracao)
 
         if self.status is not None:
             # atualiza o status do modulo
             Prometheus.get(TipoPrometheus.STATUS, self.modulo.nome).set(self.status.value)
+        if self.status is not None and self.duracao is not None:
             # atualiza a duracao do teste do modulo
             Prometheus.get(TipoPrometheus.TEST_DURATION, self.modulo.nome).set(self.duracao)
-
-        if self.armazenamento:
-            self.armazenamento.guardar(self.modulo.nome, self.status)
+            Prometheus.observar(TipoPrometheus.TEST_DURATION_HISTOGRAM, self.duracao, self.modulo.nome)
 
         logging.info("Teste realizado: {status: %s, duracao: %0.3fs, infos: %s}",
                      self.status.nome(),
-                     self.duracao,
+                     self.duracao or 0,
                      self.informacao_adicional
                      )
 
+    def publicar_metricas(self):
+        """Publica as métricas do resultado escolhido: código http, ocupação, fases e conexões
+
+        Os casos de teste só guardam esses valores. Assim, os testes internos de um módulo composto
+        e as tentativas de confirmação, que usam o nome do módulo, não sobrescrevem o resultado
+        """
+        nome = self.modulo.nome
+        if self.codigo is not None:
+            Prometheus.get(TipoPrometheus.STATUS_CODE, nome).set(self.codigo)
+        else:
+            Prometheus.delete(TipoPrometheus.STATUS_CODE, nome)
+        if self.ocupacao is not None:
+            Prometheus.get(TipoPrometheus.SIZE, nome).set(self.ocupacao)
+        else:
+            Prometheus.delete(TipoPrometheus.SIZE, nome)
+        for fase, duracao in self.fases.items():
+            Prometheus.observar(TipoPrometheus.PHASE_DURATION, duracao, nome, fase)
+        for alvo, latencia in self.conexoes:
+            Prometheus.observar(TipoPrometheus.PORT_CONNECT, latencia, nome, alvo)
+
+    def registrar_falha_dns(self, erro: Exception):
+        """Marca o teste como sem resultado por uma falha ao resolver o nome do módulo
+
+        A falha do resolvedor não indica que o módulo está fora do ar, então o status fica
+        UNKNOWN: o status armazenado não muda e nenhuma notificação é enviada. Uma falha que
+        se repete, no entanto, é tratada como uma queda (ver `verificar_falhas_dns`)
+
+        Args:
+            erro (Exception): erro da resolução
+        """
+        logging.warning("Falha de DNS ao testar o modulo %s: %s", self.modulo.nome, erro)
+        self.status = Status.UNKNOWN
+        self.informacao_adicional = f'DNS: {erro}'
+        self.falha_dns = True
+
+    def verificar_falhas_dns(self):
+        """Marca o módulo como fora do ar depois de `[dns] max_failures` testes seguidos sem resolver o nome
+
+        Um nome que deixou de existir (NXDOMAIN permanente, como um host removido ou digitado errado)
+        não pode deixar o módulo sem status para sempre. Cada teste consulta o resolvedor novamente
+        após o cache negativo, então falhas seguidas em testes diferentes não são uma falha passageira
+        """
+        if not self.falha_dns or self.status != Status.UNKNOWN:
+            self._falhas_dns = 0
+            return
+        self._falhas_dns += 1
+        maximo = self.pool_http.resolvedor.config.max_falhas
+        if maximo > 0 and self._falhas_dns >= maximo:
+            self.status = Status.MAJOR_OUTAGE
+            self.informacao_adicional = f'{self.informacao_adicional} ({self._falhas_dns} testes seguidos)'
+
     def notificar_discord(self):
-        """Notifica o status do módulo no Discord caso o status atual seja diferente do
-        status armazenado no armazenamento.
+        """Agenda a notificação do status do módulo no Discord caso o status atual seja diferente do
+        status que estava armazenado no armazenamento (`ultimo_status`).
+
+        O envio é feito em segundo plano pela fila do discord.
         """
         if self.discord is None or not self.armazenamento:
             # discord não configurado
@@ -125,164 +423,229 @@ class TestadorBase:
             # não há nada pra fazer aqui, pula
             return
 
-        # pega o ultimo status do armazenamento
-        ultimo_status: Status = self.armazenamento.coletar(self.modulo.nome)
-        logging.debug(ultimo_status, self.status)
-        if ultimo_status == self.status:
-            # o status não mudou
+        if self.causa is not None:
+            # inacessível por uma dependência: a notificação da causa raiz lista este módulo
             return
 
-        # cria o conteudo da notificação (marcando os grupos especificos)
-        content = f'<@&{self.discord.infra_role}>' + ''.join([
-            f'<@&{n}>' for n in self.modulo.discords
-        ])
-
-        texto_status = "⚠️Problemas"
-        cor = 0xffff00
-        if self.status == Status.OPERATIONAL:
-            texto_status = "🟩   Operacional"
-            cor = 0x00ff00
-
-        if self.status == Status.MAJOR_OUTAGE:
-            texto_status = "❌   Fora do Ar"
-            cor = 0xff0000
-
-        logging.info(
-            "Enviando webhook do discord para o módulo %s com estado %s",
-            self.modulo.nome,
-            texto_status
-        )
+        logging.debug("Status anterior: %s, status atual: %s", self.ultimo_status, self.status)
+        anterior = self.ultimo_status
+        if self._estava_inacessivel:
+            # o status armazenado foi marcado sem teste, e nunca notificado: a fila compara o
+            # resultado com o último status notificado do módulo (operacional, caso não haja)
+            anterior = Status.OPERATIONAL
+        elif anterior == self.status:
+            # o status não mudou
+            return
 
-        # criando webhook
-        webhook = DiscordWebhook(
-            rate_limit_retry=True,
-            url=self.discord_url,
-            content=content,
-            embeds=[{
-                'title': f'Alerta do Monitor: {self.modulo.nome}',
-                'author': {
-                    'name': self.NOME
-                },
-                'color': cor,
-                'footer': {
-                    'text': self.NOME
-                },
-                'fields': [
-                    {
-                        'name': 'Status',
-                        'value': texto_status,
-                        'inline': False
-                    },
-                    {
-                        'name': 'Informações Adicionais',
-                        'value': self.informacao_adicional,
-                        'inline': False
-                    }
-                ]
-            }]
-        )
-        r: Response = webhook.execute()
-        if not r.ok:
-            logging.error("Erro ao enviar webhook discord para o módulo %s", self.modulo.nome)
+        afetados = []
+        if self.dependencias is not None and self.status not in DISPONIVEIS:
+            afetados = self.dependencias.afetados(self.modulo.nome)
+        self.discord.notificar(self.modulo, anterior, self.status, self.informacao_adicional, afetados=afetados)
 
     def notificar_statuspage(self):
-        """Faz um request para a api da statuspage.io utilizando o component_id e o token do módulo.
+        """Agenda o envio do status atual do módulo para a statuspage.io, caso ele seja
+        diferente do status que estava armazenado (`ultimo_status`).
 
-        O request possui o identificador do component, o token, e o nome do status atual.
+        O envio é feito em segundo plano pelo despachante da statuspage.
         Caso self.statuspage seja nulo, a função não executa nada.
         Caso self.status seja nulo, a função não executa nada
         """
         if self.statuspage is None or self.status is None:
             return
+        if self.ultimo_status == self.status:
+            # o status não mudou
+            return
 
-        r: Response = put(
-            url=f'https://api.statuspage.io/v1/pages/{self.statuspage.page_id}/components/{self.modulo.statuspage}',
-            headers={
-                'Authorization': self.statuspage.api_key,
-                'Content-Type': 'application/json',
-            },
-            data={
-                'component': {
-                    'status': self.status.nome()
-                }
-            }
-        )
+        self.statuspage.enviar(self.modulo.statuspage, self.status)
 
-        if r.status_code in [401, 404, 422]:
-            try:
-                logging.error('Erro ao enviar componente para statuspage [%s]: %s', r.status_code, r.json()['message'])
-            except KeyError:
-                logging.error("Erro ao enviar component para statuspage, e a resposta json foi inválida")
-        return
+
+def _decodificar_json(corpo: bytes):
+    """Decodifica um corpo JSON, com o orjson quando disponível
+
+    Raises:
+        ValueError: caso o corpo não seja um JSON válido
+    """
+    if orjson is not None:
+        return orjson.loads(corpo)
+    return json.loads(corpo)
+
+
+def _nome_metodo(metodo: TipoMetodoHTTP) -> str:
+    """Retorna o nome do método HTTP a ser usado no request
+
+    Raises:
+        RuntimeError: caso o método não seja suportado
+    """
+    if metodo == TipoMetodoHTTP.GET:
+        return 'GET'
+    elif metodo == TipoMetodoHTTP.POST:
+        return 'POST'
+    elif metodo == TipoMetodoHTTP.HEAD:
+        return 'HEAD'
+    raise RuntimeError("Método HTTP não suportado")
 
 
 class TestadorHTTP(TestadorBase):
-    def testar_http(self):
+    async def testar_http(self):
         _url = self.modulo.params.url
         _metodo = self.modulo.params.metodo
         self.status = Status.MAJOR_OUTAGE  # default status
         self.informacao_adicional = '-'
+        _fases: Dict[str, float] = {}
 
         try:
-            if _metodo == TipoMetodoHTTP.GET:
-                _resposta = get(_url, timeout=5)
-            elif _metodo == TipoMetodoHTTP.POST:
-                _resposta = post(_url, timeout=5)
-            else:
-                raise RuntimeError("Método HTTP não suportado")
+            async with self.pool_http.requisitar(_nome_metodo(_metodo), _url,
+                                                frio=self.modulo.frio,
+                                                timeout=self.tempo_limite(),
+                                                fases=_fases) as _resposta:
+                status_code = _resposta.status
+                reason = _resposta.reason
+                # somente o status é usado: o corpo só é lido se for pequeno, mantendo a conexão
+                _inicio_corpo = perf_counter()
+                if await descartar_corpo(_resposta, self.pool_http.config.max_body):
+                    _fases['body'] = perf_counter() - _inicio_corpo
+            self.fases = _fases
 
             # atualiza o status do módulo
-            if _resposta.status_code == 200:
+            if status_code == 200:
                 self.status = Status.OPERATIONAL
-            elif _resposta.status_code > 500:
+            elif status_code > 500:
                 self.status = Status.UNDER_MAINTENANCE
             else:
                 self.status = Status.MAJOR_OUTAGE
             # atualiza a informacao adicional do módulo
-            self.informacao_adicional = f'{_resposta.status_code} - {_resposta.reason}'
-            Prometheus.get(TipoPrometheus.STATUS_CODE, self.modulo.nome).set(_resposta.status_code)
+            self.informacao_adicional = f'{status_code} - {reason}'
+            self.codigo = status_code
 
-        except (ConnectTimeout, ConnectionError, RuntimeError) as e:
+        except ClientConnectorDNSError as e:
+            self.registrar_falha_dns(e.os_error)
+        except (ClientError, asyncio.TimeoutError, RuntimeError) as e:
             logging.error("Erro ao testar HTTP do modulo %s: %s", self.modulo.nome, e)
             self.status = Status.MAJOR_OUTAGE
             self.informacao_adicional = str(e)
-            # remove a informacao do modulo no prometheus
-            Prometheus.delete(TipoPrometheus.STATUS_CODE, self.modulo.nome)
 
 
 class TestadorPort(TestadorBase):
-    def testar_port(self):
-        self.status = Status.MAJOR_OUTAGE  # default status
+    """Testa se um ou mais alvos (host:porta) aceitam conexões TCP
+
+    Os alvos são verificados ao mesmo tempo pelo verificador compartilhado. O módulo está
+    operacional quando pelo menos `minimo` alvos estão abertos (todos, por padrão), em
+    PARTIAL_OUTAGE quando somente parte deles está aberta, e em MAJOR_OUTAGE quando nenhum está
+    """
 
-        _socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        _socket.settimeout(1)
+    VERIFICADOR: VerificadorPortas = VerificadorPortas()
+    TIMEOUT_PADRAO = 1
 
-        # se conectar na porta, _status será True
+    async def _resolver(self, host: str, port: int, timeout: float) -> List[Tuple[str, int, int]]:
+        """Resolve o host pelo resolvedor compartilhado, com até um endereço de cada família
+
+        Raises:
+            ErroDNS: caso o host não possa ser resolvido dentro do tempo do teste
+        """
         try:
-            _port = self.modulo.params.port
-            _url = self.modulo.params.host
-            self.status = Status.OPERATIONAL if _socket.connect_ex((_url, _port)) == 0 else Status.MAJOR_OUTAGE
-            _socket.close()
-        except Exception as e:  # noqa
-            logging.error("Erro ao testar PORT do modulo %s: %s", self.modulo.nome, e)
+            resultados = await asyncio.wait_for(
+                self.pool_http.resolvedor.resolve(host, port, family=socket.AF_UNSPEC), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            raise ErroDNS(f"{host}: tempo esgotado ao resolver o nome")
+        enderecos = {}
+        for r in resultados:
+            enderecos.setdefault(r['family'], (r['host'], port, r['family']))
+        return list(enderecos.values())
+
+    async def _verificar_alvo(self, host: str, port: int, timeout: float) -> Tuple[ResultadoPorta, float]:
+        """Verifica um alvo, que está aberto caso algum dos seus endereços aceite a conexão
+
+        Returns:
+            O resultado do alvo e a duração (em segundos) da resolução do seu nome
+
+        Raises:
+            ErroDNS: caso o host não possa ser resolvido
+        """
+        inicio = perf_counter()
+        enderecos = await self._resolver(host, port, timeout)
+        dns = perf_counter() - inicio
+        resultados = await self.VERIFICADOR.verificar(enderecos, timeout - dns) if timeout > dns else []
+        abertos = [r for r in resultados if r.aberta]
+        if abertos:
+            return ResultadoPorta(host, port, True, min(r.latencia for r in abertos)), dns
+        erro = resultados[0].erro if resultados else 'tempo esgotado'
+        return ResultadoPorta(host, port, False, erro=erro), dns
+
+    async def testar_port(self):
+        self.status = Status.MAJOR_OUTAGE  # default status
+        self.informacao_adicional = None
+
+        _params = self.modulo.params
+        _alvos = _params.alvos or [(_params.host, _params.port)]
+        _minimo = _params.minimo if _params.minimo is not None else len(_alvos)
+        _timeout = self.tempo_limite()
+
+        _resultados = await asyncio.gather(
+            *(self._verificar_alvo(h, p, _timeout) for h, p in _alvos), return_exceptions=True
+        )
+
+        abertos, fechados, falhas_dns = [], [], []
+        _fases: Dict[str, float] = {}
+        for (host, port), resultado in zip(_alvos, _resultados):
+            alvo = f'{host}:{port}'
+            if isinstance(resultado, ErroDNS):
+                falhas_dns.append(resultado)
+                continue
+            elif isinstance(resultado, BaseException):
+                logging.error("Erro ao testar PORT do modulo %s (%s): %r", self.modulo.nome, alvo, resultado)
+                fechados.append(f'{alvo} ({resultado})')
+                continue
+
+            resultado, dns = resultado
+            # as fases do teste são as do alvo mais lento
+            _fases['dns'] = max(_fases.get('dns', 0), dns)
+            if resultado.aberta:
+                abertos.append(alvo)
+                _fases['connect'] = max(_fases.get('connect', 0), resultado.latencia)
+                self.conexoes.append((alvo, resultado.latencia))
+            else:
+                fechados.append(f'{alvo} ({resultado.erro})')
+        self.fases = _fases
+
+        if len(abertos) >= _minimo:
+            self.status = Status.OPERATIONAL
+        elif falhas_dns and len(abertos) + len(falhas_dns) >= _minimo:
+            # sem os alvos que não foram resolvidos não é possível concluir que o módulo caiu
+            self.registrar_falha_dns(falhas_dns[0])
+            return
+        elif abertos:
+            self.status = Status.PARTIAL_OUTAGE
+        else:
             self.status = Status.MAJOR_OUTAGE
 
+        _partes = []
+        if len(_alvos) > 1:
+            _partes.append(f'{len(abertos)}/{len(_alvos)} alvos abertos')
+        if fechados:
+            _partes.append('fechados: ' + ', '.join(fechados))
+        if falhas_dns:
+            _partes.append(f'DNS: {falhas_dns[0]}')
+        self.informacao_adicional = '; '.join(_partes) or '-'
+
 
 class TestadorSize(TestadorBase):
-    def testar_size(self):
+    async def testar_size(self):
         _url = self.modulo.params.url
         _metodo = self.modulo.params.metodo
+        _fases: Dict[str, float] = {}
 
         try:
-            if _metodo == TipoMetodoHTTP.GET:
-                _resposta = get(_url, timeout=5)
-            elif _metodo == TipoMetodoHTTP.POST:
-                _resposta = post(_url, timeout=5)
-            else:
-                raise RuntimeError("Método HTTP não suportado")
+            async with self.pool_http.requisitar(_nome_metodo(_metodo), _url,
+                                                frio=self.modulo.frio,
+                                                timeout=self.tempo_limite(),
+                                                fases=_fases) as _resposta:
+                status_code = _resposta.status
+                _inicio_corpo = perf_counter()
+                conteudo = _decodificar_json(await ler_corpo(_resposta, self.pool_http.config.max_body))
+                _fases['body'] = perf_counter() - _inicio_corpo
+            self.fases = _fases
 
-            status_code = _resposta.status_code
-            conteudo = _resposta.json()
             porcentagem = conteudo['porcentagem']
             if porcentagem < 0.5:
                 self.status = Status.OPERATIONAL
@@ -294,12 +657,172 @@ class TestadorSize(TestadorBase):
                 self.status = Status.MAJOR_OUTAGE
 
             self.informacao_adicional = f'Ocupação: {porcentagem:.0%}'
-            Prometheus.get(TipoPrometheus.SIZE, self.modulo.nome).set(porcentagem)
-            Prometheus.get(TipoPrometheus.STATUS_CODE, self.modulo.nome).set(status_code)
+            self.codigo, self.ocupacao = status_code, porcentagem
 
-        except (ConnectTimeout, ConnectionError, RuntimeError, JSONDecodeError, KeyError) as e:
+        except ClientConnectorDNSError as e:
+            self.registrar_falha_dns(e.os_error)
+        except (ClientError, asyncio.TimeoutError, RuntimeError, ValueError, KeyError, TypeError) as e:
             logging.error("Erro ao testar SIZE do modulo %s: %s", self.modulo.nome, e)
             self.status = Status.MAJOR_OUTAGE
             self.informacao_adicional = str(e)
-            Prometheus.delete(TipoPrometheus.STATUS_CODE, self.modulo.nome)
-            Prometheus.delete(TipoPrometheus.SIZE, self.modulo.nome)
+
+
+# gravidade de cada status, para escolher o pior resultado
+_GRAVIDADE = {
+    Status.OPERATIONAL: 0,
+    Status.DEGRADED_PERFORMANCE: 1,
+    Status.UNDER_MAINTENANCE: 2,
+    Status.PARTIAL_OUTAGE: 3,
+    Status.MAJOR_OUTAGE: 4,
+}
+
+
+def combinar(politica: TipoPolitica, resultados: List[Status], total: int) -> Status:
+    """Combina os resultados dos testes de um módulo composto em um único status
+
+    Testes sem resultado (UNKNOWN) não contam como disponíveis nem como fora do ar.
+
+    Args:
+        politica (TipoPolitica): política de combinação
+            - WORST: o pior status entre os testes com resultado
+            - ALL: MAJOR_OUTAGE caso algum teste esteja indisponível, ou o pior status caso todos
+              estejam disponíveis (UNKNOWN caso falte o resultado de algum)
+            - MAJORITY: o pior status entre os disponíveis caso mais da metade dos testes esteja
+              disponível, MAJOR_OUTAGE caso mais da metade esteja indisponível, e PARTIAL_OUTAGE em um empate
+        resultados (List[Status]): status dos testes que terminaram
+        total (int): quantidade de testes do módulo
+
+    Returns:
+        O status do módulo, ou UNKNOWN caso os resultados não sejam suficientes
+    """
+    conhecidos = [s for s in resultados if s in _GRAVIDADE]
+    disponiveis = [s for s in conhecidos if s in DISPONIVEIS]
+    indisponiveis = len(conhecidos) - len(disponiveis)
+
+    if politica == TipoPolitica.WORST:
+        return max(conhecidos, key=_GRAVIDADE.get) if conhecidos else Status.UNKNOWN
+    elif politica == TipoPolitica.ALL:
+        if indisponiveis:
+            return Status.MAJOR_OUTAGE
+        return max(disponiveis, key=_GRAVIDADE.get) if len(disponiveis) == total else Status.UNKNOWN
+    elif politica == TipoPolitica.MAJORITY:
+        if 2 * len(disponiveis) > total:
+            return max(disponiveis, key=_GRAVIDADE.get)
+        elif 2 * indisponiveis > total:
+            return Status.MAJOR_OUTAGE
+        elif len(conhecidos) == total:
+            return Status.PARTIAL_OUTAGE
+        return Status.UNKNOWN
+    raise RuntimeError(f"Política {politica} não suportada")
+
+
+def decidir(politica: TipoPolitica, resultados: List[Status], total: int) -> Optional[Status]:
+    """Retorna o status do módulo composto caso ele já esteja decidido pelos resultados parciais,
+    ou seja, caso os testes restantes não possam mais mudá-lo. None caso contrário
+    """
+    faltam = total - len(resultados)
+    # as políticas são monótonas: basta comparar os extremos dos testes restantes
+    possiveis = {combinar(politica, resultados + [s] * faltam, total)
+                 for s in (Status.OPERATIONAL, Status.MAJOR_OUTAGE, Status.UNKNOWN)}
+    return possiveis.pop() if len(possiveis) == 1 else None
+
+
+class TestadorComposto(TestadorBase):
+    """Executa os vários testes de um módulo ao mesmo tempo, combinando-os em um único status
+
+    Os testes compartilham um único prazo (o timeout do módulo, ou o timeout do pool http), e
+    os que ainda não terminaram são cancelados assim que o resultado estiver decidido pela
+    política do módulo (ver `decidir`). Testes que não terminam no prazo estão fora do ar.
+    Somente o testador composto publica o resultado: os testes internos não usam o
+    armazenamento, as notificações, o histórico ou as métricas. O código http e a ocupação
+    do módulo são os do primeiro teste que os mediu, e as fases são as do teste mais lento
+    """
+
+    def __init__(self, modulo: Modulo, **kwargs):
+        super().__init__(modulo, **kwargs)
+        self.testadores: List[TestadorBase] = [
+            criar_testador(m, pool_http=self.pool_http, coalescencia=self.coalescencia, tentativa=self.tentativa)
+            for m in modulo.params.testes
+        ]
+        # rótulo de cada teste nas informações adicionais, como "http" ou "http#2"
+        tipos = [m.tipo.name.lower() for m in modulo.params.testes]
+        self.rotulos: List[str] = [
+            t if tipos.count(t) == 1 else f'{t}#{tipos[:i + 1].count(t)}' for i, t in enumerate(tipos)
+        ]
+
+    async def executar_casos(self):
+        self.codigo = self.ocupacao = None
+        self.fases, self.conexoes = {}, []
+        self.falha_dns = False
+        _politica = self.modulo.params.politica
+        _total = len(self.testadores)
+        _timeout = self.tempo_limite()
+
+        loop = asyncio.get_running_loop()
+        prazo = loop.time() + _timeout
+        tarefas = {asyncio.ensure_future(t.executar_casos()): t for t in self.testadores}
+        pendentes = set(tarefas)
+        terminados: Dict[TestadorBase, Status] = {}
+        decisao: Optional[Status] = None
+        try:
+            while pendentes and decisao is None and loop.time() < prazo:
+                feitos, pendentes = await asyncio.wait(pendentes, timeout=prazo - loop.time(),
+                                                       return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in feitos:
+                    testador = tarefas[tarefa]
+                    if tarefa.exception() is not None:
+                        logging.error("Erro ao testar o modulo %s: %r", self.modulo.nome, tarefa.exception())
+                        testador.status = Status.MAJOR_OUTAGE
+                        testador.informacao_adicional = str(tarefa.exception())
+                    terminados[testador] = testador.status or Status.UNKNOWN
+                decisao = decidir(_politica, list(terminados.values()), _total)
+        finally:
+            for tarefa in pendentes:
+                tarefa.cancel()
+            if pendentes:
+                await asyncio.wait(pendentes)
+
+        _partes = []
+        for rotulo, testador in zip(self.rotulos, self.testadores):
+            if testador in terminados:
+                _partes.append(f'{rotulo}: {testador.informacao_adicional or testador.status.nome()}')
+                for fase, duracao in testador.fases.items():
+                    self.fases[fase] = max(self.fases.get(fase, 0), duracao)
+                self.conexoes.extend(testador.conexoes)
+            elif decisao is not None:
+                _partes.append(f'{rotulo}: cancelado')
+            else:
+                # sem decisão no prazo: o teste que não terminou está fora do ar
+                terminados[testador] = Status.MAJOR_OUTAGE
+                _partes.append(f'{rotulo}: tempo esgotado')
+            if self.codigo is None:
+                self.codigo = testador.codigo
+            if self.ocupacao is None:
+                self.ocupacao = testador.ocupacao
+
+        self.status = decisao if decisao is not None else combinar(_politica, list(terminados.values()), _total)
+        self.informacao_adicional = '; '.join(_partes)
+        # sem resultado por não resolver o nome de algum teste
+        self.falha_dns = self.status == Status.UNKNOWN and any(t.falha_dns for t in terminados)
+
+
+def criar_testador(modulo: Modulo, **kwargs) -> TestadorBase:
+    """Cria o testador adequado para o tipo do módulo
+
+    Args:
+        modulo (Modulo): Módulo a ser testado
+        kwargs: demais argumentos do testador (armazenamento, discord, statuspage, pool_http, notificador,
+            historico, sla, teste, dependencias, coalescencia, tentativa)
+
+    Raises:
+        NotImplementedError: caso o tipo do módulo não seja suportado
+    """
+    if modulo.tipo == TipoModulo.HTTP:
+        return TestadorHTTP(modulo=modulo, **kwargs)
+    elif modulo.tipo == TipoModulo.PORT:
+        return TestadorPort(modulo=modulo, **kwargs)
+    elif modulo.tipo == TipoModulo.SIZE:
+        return TestadorSize(modulo=modulo, **kwargs)
+    elif modulo.tipo == TipoModulo.COMPOSITE:
+        return TestadorComposto(modulo=modulo, **kwargs)
+    raise NotImplementedError(f"Tipo de módulo {modulo.tipo.name} não suportado")
@@ -0,0 +1,297 @@
+"""trabalhador.py
+
+Contém a montagem do motor de testes, e o Supervisor, que executa os testes
+em vários processos.
+
+No modo com vários processos, os módulos são distribuídos entre os processos
+trabalhadores por hashing consistente do nome do módulo. Cada trabalhador
+escreve a sua tabela de resultados em uma memória compartilhada, e os demais
+valores do prometheus_client em arquivos do modo multiprocesso. O processo
+principal somente une essas métricas e as serve no /metrics.
+"""
+import os
+import shutil
+import signal
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from functools import partial
+from multiprocessing.process import BaseProcess
+from multiprocessing.shared_memory import SharedMemory
+from prometheus_client import CollectorRegistry, multiprocess
+
+from anel import AnelHash
+from cluster import Coordenador
+from prom import Prometheus
+from motor import Motor, Servico
+from conexoes import PoolHTTP
+from resolvedor import ResolvedorDNS
+from cache import CacheStatus
+from historico import Historico
+from sla import AgregadorSLA
+from models import Modulo
+from adaptativo import FrequenciaAdaptativa
+from dependencias import GrafoDependencias
+from coalescencia import CoalescenciaTestes
+from notificacao import FilaDiscord
+from statuspage import DespachanteStatuspage
+from armazenamento import Armazenamento
+from configuracao import Configuracao
+from recarregador import Recarregador
+from tabela import TabelaResultados, UniaoTabelas, tamanho_buffer
+from testador import TestadorBase, criar_testador
+
+from typing import Callable, Dict, List, Optional
+
+
+def configurar_log():
+    """Configura a biblioteca de log do processo"""
+    logging.basicConfig(
+        format='%(asctime)s [%(processName)s/%(threadName)s] [%(levelname)s]: %(message)s',
+        datefmt='%Y-%m-%d %H-%M-%S',
+        level=logging.INFO
+    )
+
+
+def criar_sla(c: Configuracao) -> AgregadorSLA:
+    """Cria o agregador de disponibilidade. Um status vale por até três intervalos sem um novo teste"""
+    intervalos = [c.interval] + [m.intervalo or 0 for m in c.modules]
+    if c.adaptive is not None:
+        # módulos estáveis são testados com intervalos de até `max_interval`
+        intervalos.append(c.adaptive.intervalo_maximo)
+    return AgregadorSLA(lacuna_max=3 * max(intervalos))
+
+
+def _grupos(c: Configuracao) -> Dict[str, str]:
+    """Grupo de cada módulo ligado a outros (por dependências ou endpoints), usado para dividir os módulos"""
+    return {m.nome: m.grupo for m in c.modules if m.grupo is not None}
+
+
+def montar_motor(c: Configuracao,
+                 arquivo: str,
+                 filtro: Optional[Callable[[Modulo], bool]] = None,
+                 no: Optional[str] = None,
+                 sla: Optional[AgregadorSLA] = None
+                 ) -> Motor:
+    """Cria o motor com os testadores e os serviços de notificação
+
+    Com a divisão entre nós configurada (`[cluster]`), o motor testa somente os módulos
+    atribuídos a este nó, e o filtro fornecido é ignorado.
+
+    Args:
+        c (Configuracao): configuração carregada
+        arquivo (str): path para o arquivo de configuração, observado para recarregar os módulos
+        filtro (Callable[[Modulo], bool], optional): seleciona os módulos testados por este motor.
+            Default é todos os módulos.
+        no (str, optional): identificador deste nó na divisão entre nós. Default é o da configuração.
+        sla (AgregadorSLA, optional): agregador da disponibilidade dos módulos. Default é um agregador próprio.
+    """
+    TestadorBase.set_version(c.version)
+    pool_http = PoolHTTP(c.http, ResolvedorDNS(c.dns))
+    banco = Armazenamento(c.redis.host, c.redis.port, max_conexoes=c.redis.pool_size)
+    armazenamento = CacheStatus(banco, intervalo_escrita=c.redis.flush_interval)
+
+    coordenador: Optional[Coordenador] = None
+    if c.cluster is not None:
+        coordenador = Coordenador(banco, c.cluster, ident=no)
+        coordenador.atualizar_nos()
+        logging.info("Nó %s, nós conhecidos: %s", coordenador.ident, ', '.join(coordenador.nos))
+        filtro = coordenador.responsavel
+
+    statuspage = DespachanteStatuspage(c.statuspage, pool_http)
+    discord = FilaDiscord(c.discord, TestadorBase.NOME, histerese=c.discord.histerese, janela=c.discord.janela)
+
+    historico = Historico(c.history) if c.history is not None else None
+    sla = sla if sla is not None else criar_sla(c)
+    dependencias = GrafoDependencias(c.modules)
+
+    fabrica = partial(
+        criar_testador,
+        armazenamento=armazenamento,
+        discord=discord,
+        statuspage=statuspage,
+        pool_http=pool_http,
+        notificador=coordenador.notificador if coordenador is not None else None,
+        historico=historico,
+        sla=sla,
+        teste=c.probe,
+        dependencias=dependencias,
+        coalescencia=CoalescenciaTestes(c.probe)
+    )
+    testadores = [fabrica(m) for m in c.modules if filtro is None or filtro(m)]
+    logging.info("%d testadores carregados e criados", len(testadores))
+
+    motor = Motor(testadores, intervalo=c.interval, concorrencia=c.concurrency,
+                  pool_http=pool_http, cache=armazenamento, servicos=[statuspage, discord],
+                  adaptativo=FrequenciaAdaptativa(c.adaptive) if c.adaptive is not None else None)
+    recarregador = Recarregador(arquivo, c, motor, fabrica, intervalo=c.reload_interval, filtro=filtro)
+    recarregador.ao_reter = sla.reter
+
+    def ao_recarregar(nova: Configuracao):
+        # as dependências e os grupos mudam antes dos testadores serem recriados
+        dependencias.atualizar(nova.modules)
+        if coordenador is not None:
+            coordenador.grupos = _grupos(nova)
+    recarregador.ao_recarregar = ao_recarregar
+    motor.servicos.append(recarregador)
+
+    if coordenador is not None:
+        coordenador.grupos = _grupos(c)
+        coordenador.nomes = lambda: {t.modulo.nome for t in motor.testadores}
+        coordenador.ao_mudar = lambda: recarregador.recarregar(recarregador.configuracao, imediato=True)
+        motor.servicos.append(coordenador)
+    return motor
+
+
+def anel_trabalhadores(quantidade: int) -> AnelHash:
+    """Anel de hashing com os trabalhadores, identificados pelo seu índice"""
+    return AnelHash(str(i) for i in range(quantidade))
+
+
+async def _executar_ate_sigterm(motor: Motor):
+    """Executa o motor até o processo receber um SIGTERM"""
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    await motor.executar()
+
+
+def _executar_trabalhador(indice: int, quantidade: int, arquivo: str, memoria: str):
+    """Ponto de entrada de um processo trabalhador
+
+    Args:
+        indice (int): índice deste trabalhador
+        quantidade (int): quantidade total de trabalhadores
+        arquivo (str): path para o arquivo de configuração
+        memoria (str): nome da memória compartilhada da tabela de resultados deste trabalhador
+    """
+    # o encerramento é feito pelo supervisor (SIGTERM), inclusive após um CTRL+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configurar_log()
+
+    c = Configuracao(arquivo)
+    compartilhada = SharedMemory(name=memoria)
+    Prometheus.start(buckets=c.metrics.buckets, max_series=c.metrics.max_series, buffer_tabela=compartilhada.buf)
+
+    # com a divisão entre nós, cada trabalhador é um nó; caso contrário, os módulos são divididos localmente
+    anel = anel_trabalhadores(quantidade)
+    motor = montar_motor(
+        c,
+        arquivo,
+        filtro=lambda m: anel.no(m.chave_distribuicao) == str(indice),
+        no=f'{c.cluster.ident}/{indice}' if c.cluster is not None else None
+    )
+    try:
+        asyncio.run(_executar_ate_sigterm(motor))
+    except asyncio.CancelledError:
+        pass
+
+
+class Supervisor:
+    """Executa os testes em vários processos trabalhadores, reiniciando os que terminarem"""
+
+    INTERVALO_VERIFICACAO = 1   # intervalo (s) entre as verificações dos trabalhadores
+    ESPERA_ENCERRAMENTO = 10    # espera (s) máxima pelo encerramento de um trabalhador
+
+    def __init__(self,
+                 c: Configuracao,
+                 arquivo: str,
+                 quantidade: int,
+                 servicos: Optional[List[Servico]] = None
+                 ):
+        """Inicializa o supervisor. Os processos só são criados em `executar`
+
+        Args:
+            c (Configuracao): configuração carregada
+            arquivo (str): path para o arquivo de configuração, lido por cada trabalhador
+            quantidade (int): quantidade de processos trabalhadores
+            servicos (List[Servico], optional): serviços executados no processo principal,
+                como o servidor de métricas. Default é nenhum.
+        """
+        self.arquivo: str = arquivo
+        self.quantidade: int = quantidade
+        self.servicos: List[Servico] = servicos if servicos is not None else []
+        # novos módulos podem ser adicionados ao recarregar a configuração
+        self.capacidade: int = max(1024, 2 * len(c.modules))
+        self.registro: CollectorRegistry = CollectorRegistry()
+        self.tabelas: UniaoTabelas = UniaoTabelas([])
+        self._contexto = multiprocessing.get_context('spawn')
+        self._processos: List[Optional[BaseProcess]] = [None] * quantidade
+        self._memorias: List[SharedMemory] = []
+        self._diretorio: Optional[str] = None
+
+    def renderizar_tabela(self) -> bytes:
+        """Retorna as tabelas de resultados de todos os trabalhadores no formato de texto do Prometheus"""
+        return self.tabelas.renderizar()
+
+    def _preparar(self):
+        """Cria as memórias compartilhadas e o diretório das métricas do prometheus_client"""
+        self._diretorio = tempfile.mkdtemp(prefix='monitor-metricas-')
+        # herdado pelos trabalhadores, que passam a escrever as métricas nesse diretório
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = self._diretorio
+        multiprocess.MultiProcessCollector(self.registro, path=self._diretorio)
+
+        for _ in range(self.quantidade):
+            memoria = SharedMemory(create=True, size=tamanho_buffer(self.capacidade))
+            self._memorias.append(memoria)
+            self.tabelas.tabelas.append(TabelaResultados(buffer=memoria.buf))
+
+    def _iniciar_processo(self, indice: int):
+        """Cria (ou recria) o processo de um trabalhador"""
+        processo = self._contexto.Process(
+            target=_executar_trabalhador,
+            args=(indice, self.quantidade, self.arquivo, self._memorias[indice].name),
+            name=f'trabalhador-{indice}'
+        )
+        processo.start()
+        self._processos[indice] = processo
+
+    def _encerrar(self):
+        """Encerra os trabalhadores e libera os recursos compartilhados"""
+        processos = [p for p in self._processos if p is not None]
+        for p in processos:
+            if p.is_alive():
+                p.terminate()
+        for p in processos:
+            p.join(self.ESPERA_ENCERRAMENTO)
+            if p.is_alive():
+                logging.warning("Trabalhador %s não encerrou, forçando", p.name)
+                p.kill()
+                p.join()
+
+        self.tabelas.tabelas = []
+        for memoria in self._memorias:
+            memoria.close()
+            memoria.unlink()
+        self._memorias = []
+        if self._diretorio is not None:
+            shutil.rmtree(self._diretorio, ignore_errors=True)
+            os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+            self._diretorio = None
+
+    async def executar(self):
+        """Inicia os trabalhadores e os serviços, reiniciando os trabalhadores que terminarem"""
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        self._preparar()
+        tarefas = [asyncio.create_task(s.executar()) for s in self.servicos]
+        try:
+            for i in range(self.quantidade):
+                self._iniciar_processo(i)
+            logging.info("%d trabalhadores iniciados", self.quantidade)
+
+            while True:
+                await asyncio.sleep(self.INTERVALO_VERIFICACAO)
+                for tarefa in tarefas:
+                    # um serviço com erro (como o servidor de métricas sem conseguir abrir a porta) encerra tudo
+                    if tarefa.done() and not tarefa.cancelled() and tarefa.exception() is not None:
+                        logging.error("Serviço de segundo plano terminou com erro, encerrando: %r",
+                                      tarefa.exception())
+                        raise tarefa.exception()
+                for i, p in enumerate(self._processos):
+                    if not p.is_alive():
+                        logging.error("Trabalhador %s terminou [%s], reiniciando", p.name, p.exitcode)
+                        multiprocess.mark_process_dead(p.pid, self._diretorio)
+                        self._iniciar_processo(i)
+        finally:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await asyncio.to_thread(self._encerrar)
@@ -0,0 +1,94 @@
+import os
+import sys
+import asyncio
+
+import pytest
+
+# os módulos do monitor são importados pelo nome, como em `app/src/main.py`
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from enums import Status, TipoModulo, TipoMetodoHTTP  # noqa: E402
+from models import Modulo, ParamsHTTP  # noqa: E402
+from prom import Prometheus  # noqa: E402
+from testador import TestadorBase  # noqa: E402
+
+from typing import Dict, List, Optional, Tuple  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def prometheus():
+    """As métricas são registradas uma única vez no registro global do prometheus_client"""
+    Prometheus.start()
+
+
+class CacheMemoria:
+    """Cache de status em memória, que registra as trocas (módulo, status)"""
+
+    def __init__(self):
+        self.status: Dict[str, Status] = {}
+        self.trocas: List[Tuple[str, Status]] = []
+
+    def coletar(self, nome: str) -> Optional[Status]:
+        return self.status.get(nome)
+
+    def trocar(self, nome: str, status: Status) -> Optional[Status]:
+        self.trocas.append((nome, status))
+        anterior, self.status[nome] = self.status.get(nome), status
+        return anterior
+
+
+@pytest.fixture
+def cache() -> CacheMemoria:
+    return CacheMemoria()
+
+
+@pytest.fixture
+def modulo():
+    """Cria um módulo HTTP, com uma role e um componente com o seu nome"""
+    def criar(nome: str, *dependencias: str, url: str = 'http://x', metodo: TipoMetodoHTTP = TipoMetodoHTTP.GET,
+              **kwargs) -> Modulo:
+        return Modulo(nome, TipoModulo.HTTP, ParamsHTTP(url, metodo), [f'role_{nome}'], nome,
+                      dependencias=dependencias, **kwargs)
+    return criar
+
+
+class TestadorSimulado(TestadorBase):
+    """Testador cujos resultados são os status de `sequencia`, em ordem (repetindo o último)
+
+    Cada teste espera `espera` segundos, limitados ao timeout da tentativa (depois dele, o
+    resultado é MAJOR_OUTAGE). A sequência e a contagem dos testes são da classe, para serem
+    compartilhadas com as tentativas de confirmação, criadas com `type(self)`
+    """
+    __test__ = False
+
+    sequencia: List[Status] = [Status.OPERATIONAL]
+    espera: float = 0
+    testes: int = 0     # testes executados
+    inicio: int = 0     # testes executados antes da sequência atual
+
+    def definir(self, *status: Status):
+        """Substitui a sequência dos próximos resultados"""
+        type(self).sequencia = list(status)
+        type(self).inicio = type(self).testes
+
+    async def testar_custom(self):
+        cls = type(self)
+        status = cls.sequencia[min(cls.testes - cls.inicio, len(cls.sequencia) - 1)]
+        cls.testes += 1
+        if cls.espera:
+            try:
+                await asyncio.wait_for(asyncio.sleep(cls.espera), self.tempo_limite())
+            except asyncio.TimeoutError:
+                status = Status.MAJOR_OUTAGE
+        self.status = status
+        self.informacao_adicional = status.nome()
+
+
+@pytest.fixture
+def testador_simulado():
+    """Cria um TestadorSimulado com a sequência de status fornecida (ver `TestadorSimulado`)"""
+    def criar(modulo: Modulo, *status: Status, espera: float = 0, **kwargs) -> TestadorSimulado:
+        classe = type('_TestadorSimulado', (TestadorSimulado,),
+                      {'sequencia': list(status) or [Status.OPERATIONAL], 'espera': espera, 'testes': 0})
+        return classe(modulo, **kwargs)
+    return criar
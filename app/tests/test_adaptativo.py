@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from enums import Status
+from models import ConfigAdaptativo
+from motor import Motor
+from prom import Prometheus
+from agendador import Agendador
+from adaptativo import FrequenciaAdaptativa
+
+OP, DEG, MAJOR, UNK = Status.OPERATIONAL, Status.DEGRADED_PERFORMANCE, Status.MAJOR_OUTAGE, Status.UNKNOWN
+
+
+def _intervalos(frequencia: FrequenciaAdaptativa, status, intervalo: float = 10):
+    """Registra os status em sequência, retornando o intervalo depois de cada um"""
+    resultado = []
+    for s in status:
+        frequencia.registrar('m', 'adaptativo', s, intervalo)
+        resultado.append(frequencia.intervalo('m'))
+    return resultado
+
+
+def test_intervalo_cresce_enquanto_o_status_nao_muda():
+    frequencia = FrequenciaAdaptativa(ConfigAdaptativo(intervalo_maximo=35, fator=2, estaveis=2))
+    assert _intervalos(frequencia, [OP] * 8) == [10, 10, 20, 20, 35, 35, 35, 35]
+    Prometheus.reter([])
+
+
+def test_falha_volta_ao_intervalo_mais_rapido_ate_a_recuperacao():
+    frequencia = FrequenciaAdaptativa(ConfigAdaptativo(intervalo_maximo=100, fator=2, estaveis=1,
+                                                       intervalo_rapido=2))
+    assert _intervalos(frequencia, [OP, OP, OP, MAJOR, MAJOR, UNK, OP, OP]) == [10, 20, 40, 2, 2, 2, 10, 20]
+    Prometheus.reter([])
+
+
+def test_mudanca_entre_status_disponiveis_recomeca_a_contagem():
+    frequencia = FrequenciaAdaptativa(ConfigAdaptativo(intervalo_maximo=100, fator=2, estaveis=2))
+    assert _intervalos(frequencia, [OP, OP, OP, DEG, DEG, DEG]) == [10, 10, 20, 10, 10, 20]
+    Prometheus.reter([])
+
+
+def test_registrar_retorna_somente_mudancas_de_intervalo():
+    frequencia = FrequenciaAdaptativa(ConfigAdaptativo(intervalo_maximo=100, fator=2, estaveis=1))
+    assert frequencia.registrar('m', 'adaptativo', OP, 10) is None
+    assert frequencia.registrar('m', 'adaptativo', OP, 10) == 20
+    assert frequencia.registrar('m', 'adaptativo', UNK, 10) is None
+    assert frequencia.registrar('m', 'adaptativo', MAJOR, 10) == 10
+    frequencia.esquecer('m')
+    assert frequencia.intervalo('m') is None
+    Prometheus.reter([])
+
+
+def test_agendador_reagenda_com_o_novo_intervalo():
+    agendador = Agendador()
+    agendador.adicionar('a', 0, intervalo=10)
+    assert agendador.retirar(0) == ('a', 0)
+    agendador.reagendar('a', 0, 30)
+    assert agendador.intervalo('a') == 30
+    # o prazo calculado com o intervalo anterior é descartado
+    assert agendador.retirar(10) is None
+    assert agendador.retirar(30) == ('a', 30)
+    assert agendador.proximo_prazo() == 60
+
+    agendador.remover('a')
+    agendador.reagendar('a', 60, 10)
+    assert agendador.intervalo('a') is None and agendador.proximo_prazo() is None
+
+
+@pytest.fixture
+def executar(modulo, testador_simulado):
+    """Executa um módulo com intervalo de 0.02s e os status fornecidos, retornando a quantidade de testes"""
+    def executar(status, adaptativo: bool = True, duracao: float = 0.5) -> int:
+        testador = testador_simulado(modulo('adaptativo', intervalo=0.02, adaptativo=adaptativo), *status)
+        frequencia = FrequenciaAdaptativa(ConfigAdaptativo(intervalo_maximo=0.16, fator=2, estaveis=1))
+
+        async def cenario():
+            motor = Motor([testador], intervalo=100, concorrencia=10, adaptativo=frequencia)
+            tarefa = asyncio.create_task(motor.executar())
+            await asyncio.sleep(duracao)
+            tarefa.cancel()
+            try:
+                await tarefa
+            except asyncio.CancelledError:
+                pass
+
+        try:
+            asyncio.run(cenario())
+        finally:
+            Prometheus.reter([])
+        return testador.testes
+    return executar
+
+
+def test_motor_espaca_os_testes_de_um_modulo_estavel(executar):
+    fixo = executar([OP], adaptativo=False)
+    adaptado = executar([OP])
+    assert adaptado < fixo / 2
+
+
+def test_motor_testa_rapido_um_modulo_fora_do_ar(executar):
+    # estável no início, o módulo cai e passa a ser testado no intervalo do módulo
+    estavel = executar([OP])
+    assert executar([OP] * 3 + [MAJOR]) > estavel * 2
@@ -0,0 +1,45 @@
+import fakeredis
+
+from enums import Status
+from armazenamento import Armazenamento
+
+
+def _armazenamento() -> Armazenamento:
+    return Armazenamento('', 0, cliente=fakeredis.FakeRedis())
+
+
+def test_guardar_muitos_e_coletar_muitos():
+    a = _armazenamento()
+    a.guardar_muitos({'x': Status.OPERATIONAL, 'y': Status.MAJOR_OUTAGE, 'z': None})
+
+    assert a.coletar_muitos(['x', 'y', 'z', 'w']) == {
+        'x': Status.OPERATIONAL,
+        'y': Status.MAJOR_OUTAGE,
+        'z': None,
+        'w': None,
+    }
+    assert a.coletar_muitos([]) == {}
+
+
+def test_chaves_usam_o_identificador():
+    cliente = fakeredis.FakeRedis()
+    Armazenamento('', 0, identificador='teste', cliente=cliente).guardar('x', Status.OPERATIONAL)
+    assert cliente.get('teste:x') == str(Status.OPERATIONAL.value).encode()
+
+
+def test_trocar_retorna_o_status_anterior():
+    a = _armazenamento()
+    assert a.trocar('x', Status.OPERATIONAL) is None
+    assert a.trocar('x', Status.MAJOR_OUTAGE) == Status.OPERATIONAL
+    assert a.coletar('x') == Status.MAJOR_OUTAGE
+    # sem valor, somente lê
+    assert a.trocar('x', None) == Status.MAJOR_OUTAGE
+    assert a.coletar('x') == Status.MAJOR_OUTAGE
+
+
+def test_valor_invalido_no_redis_e_ignorado():
+    cliente = fakeredis.FakeRedis()
+    cliente.set('monitor:x', 'lixo')
+    cliente.set('monitor:y', '9999')
+    a = Armazenamento('', 0, cliente=cliente)
+    assert a.coletar_muitos(['x', 'y']) == {'x': None, 'y': None}
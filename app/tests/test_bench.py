@@ -0,0 +1,36 @@
+import os
+import sys
+
+from configuracao import Configuracao
+from enums import TipoModulo
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'bench'))
+
+from gerar import gerar  # noqa: E402
+
+_ENDERECOS = {
+    'http': 'http://127.0.0.1:18090',
+    'discord': 'http://127.0.0.1:18090/api/webhooks',
+    'statuspage': 'http://127.0.0.1:18090/v1',
+    'port_open': ['127.0.0.1', 18091],
+    'port_closed': ['127.0.0.1', 18092],
+    'port_filtered': ['127.0.0.1', 18093],
+}
+
+
+def test_configuracao_gerada_e_valida(tmp_path):
+    arquivo = tmp_path / 'config.toml'
+    arquivo.write_text(gerar(500, _ENDERECOS, redis='127.0.0.1:16379', intervalo=10))
+    c = Configuracao(str(arquivo))
+
+    assert len(c.modules) == 500
+    assert len({m.nome for m in c.modules}) == 500
+    assert {m.tipo for m in c.modules} == {TipoModulo.HTTP, TipoModulo.SIZE, TipoModulo.PORT}
+    assert c.discord.url == _ENDERECOS['discord']
+    assert c.statuspage.url == _ENDERECOS['statuspage']
+    assert c.redis.port == 16379 and c.http.pool_size_per_host == 0
+
+
+def test_configuracao_gerada_e_reproduzivel():
+    assert gerar(100, _ENDERECOS, semente=1) == gerar(100, _ENDERECOS, semente=1)
+    assert gerar(100, _ENDERECOS, semente=1) != gerar(100, _ENDERECOS, semente=2)
@@ -0,0 +1,110 @@
+import time
+
+import fakeredis
+
+from cluster import Coordenador
+from models import ConfigCluster
+from armazenamento import Armazenamento
+
+LEASE = 0.3
+NOMES = [f'modulo{i}' for i in range(20)]
+
+
+class _Modulo:
+    def __init__(self, nome, grupo=None):
+        self.nome = nome
+        self.chave_distribuicao = grupo if grupo is not None else nome
+
+
+def _coordenador(servidor: fakeredis.FakeServer, ident: str) -> Coordenador:
+    banco = Armazenamento('', 0, cliente=fakeredis.FakeRedis(server=servidor))
+    return Coordenador(banco, ConfigCluster(ident=ident, lease=LEASE))
+
+
+def test_nos_dividem_os_modulos():
+    servidor = fakeredis.FakeServer()
+    a, b = _coordenador(servidor, 'a'), _coordenador(servidor, 'b')
+    a.atualizar_nos()
+    b.atualizar_nos()
+    assert a.atualizar_nos()
+
+    assert a.nos == b.nos == ['a', 'b']
+    for nome in NOMES:
+        assert a.responsavel(_Modulo(nome)) != b.responsavel(_Modulo(nome))
+
+    # os módulos ligados por dependências ficam no mesmo nó que a raiz do grupo, inclusive as notificações
+    a.grupos = {n: NOMES[0] for n in NOMES}
+    assert len({a.responsavel(_Modulo(n, grupo=NOMES[0])) for n in NOMES}) == 1
+    assert {a.notificador(n) for n in NOMES} == {a.responsavel(_Modulo(NOMES[0]))}
+
+
+def test_no_morto_e_assumido_apos_a_concessao():
+    servidor = fakeredis.FakeServer()
+    a, b = _coordenador(servidor, 'a'), _coordenador(servidor, 'b')
+    a.atualizar_nos()
+    b.atualizar_nos()
+    a.atualizar_nos()
+    assert not all(a.responsavel(_Modulo(n)) for n in NOMES)
+
+    # b para de renovar a sua concessão
+    time.sleep(LEASE * 1.5)
+    assert a.atualizar_nos()
+    assert a.nos == ['a']
+    assert all(a.responsavel(_Modulo(n)) for n in NOMES)
+
+
+def test_saida_libera_os_modulos_imediatamente():
+    servidor = fakeredis.FakeServer()
+    a, b = _coordenador(servidor, 'a'), _coordenador(servidor, 'b')
+    a.atualizar_nos()
+    b.atualizar_nos()
+    a.atualizar_nos()
+
+    b.sair()
+    assert a.atualizar_nos()
+    assert a.nos == ['a']
+
+
+def test_um_unico_notificador_por_modulo():
+    servidor = fakeredis.FakeServer()
+    a, b = _coordenador(servidor, 'a'), _coordenador(servidor, 'b')
+    a.atualizar_nos()
+    b.atualizar_nos()
+
+    # durante uma troca, os dois nós testam os mesmos módulos
+    a.nomes = b.nomes = lambda: NOMES
+    a.atualizar_liderancas()
+    b.atualizar_liderancas()
+    for nome in NOMES:
+        assert a.notificador(nome) and not b.notificador(nome)
+
+    # a renovação mantém o notificador
+    b.atualizar_liderancas()
+    a.atualizar_liderancas()
+    assert all(a.notificador(n) and not b.notificador(n) for n in NOMES)
+
+
+def test_notificador_e_eleito_novamente_quando_o_anterior_morre():
+    servidor = fakeredis.FakeServer()
+    a, b = _coordenador(servidor, 'a'), _coordenador(servidor, 'b')
+    a.atualizar_nos()
+    b.atualizar_nos()
+    a.nomes = b.nomes = lambda: NOMES
+    a.atualizar_liderancas()
+    b.atualizar_liderancas()
+    assert not any(b.notificador(n) for n in NOMES)
+
+    time.sleep(LEASE * 1.5)
+    b.atualizar_liderancas()
+    assert all(b.notificador(n) for n in NOMES)
+    assert not any(a.notificador(n) for n in NOMES)
+
+
+def test_sem_redis_cada_no_notifica_os_seus_modulos():
+    servidor = fakeredis.FakeServer()
+    a = _coordenador(servidor, 'a')
+    a.atualizar_nos()
+    servidor.connected = False
+    a.atualizar_nos()
+    a.atualizar_liderancas()
+    assert all(a.notificador(n) for n in NOMES)
@@ -0,0 +1,140 @@
+import asyncio
+
+from aiohttp import web
+from prometheus_client import REGISTRY
+
+from enums import Status, TipoModulo, TipoMetodoHTTP, TipoPolitica
+from models import Modulo, ParamsPort, ParamsComposto, ConfigTeste
+from conexoes import PoolHTTP
+from coalescencia import CoalescenciaTestes, chave_teste, chaves_endpoints
+from testador import criar_testador
+
+OP, MAJOR = Status.OPERATIONAL, Status.MAJOR_OUTAGE
+
+
+def _coalescidos(origem: str) -> float:
+    return REGISTRY.get_sample_value('monitor_coalesced_probes_total', {'outcome': origem}) or 0
+
+
+def test_chave_do_endpoint(modulo):
+    assert chave_teste(modulo('a', url='http://x/')) == chave_teste(modulo('b', url='http://x/'))
+    assert chave_teste(modulo('a', url='http://x/')) != chave_teste(modulo('a', url='http://x/', metodo=TipoMetodoHTTP.HEAD))
+    assert chave_teste(modulo('a', url='http://x/')) != chave_teste(modulo('a', url='http://y/'))
+
+    porta = Modulo('p', TipoModulo.PORT, ParamsPort('h', 80), None, 'p')
+    alvos = Modulo('q', TipoModulo.PORT, ParamsPort('h', 80, alvos=[('h', 80)]), None, 'q')
+    assert chave_teste(porta) == chave_teste(alvos)
+
+    composto = Modulo('c', TipoModulo.COMPOSITE, ParamsComposto([modulo('c', url='http://x/'), porta]), None, 'c')
+    assert chave_teste(composto) is None
+    assert chaves_endpoints(composto) == [chave_teste(modulo('a', url='http://x/')), chave_teste(porta)]
+
+
+async def _servidor(handler):
+    app = web.Application()
+    app.router.add_route('*', '/{caminho:.*}', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    return runner, f'http://127.0.0.1:{runner.addresses[0][1]}'
+
+
+def _cenario(testar, janela: float = 0, atraso: float = 0.1):
+    """Executa `testar(url, criar)` com um servidor que conta os requests de cada caminho, onde `criar(modulo)`
+    cria um testador com a coalescência compartilhada. Retorna os requests recebidos
+    """
+    requests = []
+
+    async def handler(request):
+        requests.append(f'{request.method} {request.path}')
+        await asyncio.sleep(atraso)
+        return web.Response(body=b'ok')
+
+    async def cenario():
+        runner, url = await _servidor(handler)
+        pool = PoolHTTP()
+        await pool.iniciar()
+        coalescencia = CoalescenciaTestes(ConfigTeste(janela_coalescencia=janela))
+        try:
+            await testar(url, lambda m: criar_testador(m, pool_http=pool, coalescencia=coalescencia))
+        finally:
+            await pool.fechar()
+            await runner.cleanup()
+
+    asyncio.run(cenario())
+    return requests
+
+
+def test_testes_simultaneos_do_mesmo_endpoint_fazem_um_request(modulo):
+    antes = _coalescidos('inflight')
+
+    async def testar(url, criar):
+        testadores = [criar(modulo(f'm{i}', url=f'{url}/a')) for i in range(5)] + [criar(modulo('b', url=f'{url}/b'))]
+        await asyncio.gather(*(t.testar() for t in testadores))
+        assert all(t.status == OP and t.informacao_adicional == '200 - OK' for t in testadores)
+        # a duração compartilhada é a do request, mesmo para quem só aguardou o resultado
+        assert all(t.duracao >= 0.1 for t in testadores)
+
+    assert sorted(_cenario(testar)) == ['GET /a', 'GET /b']
+    assert _coalescidos('inflight') == antes + 4
+
+
+def test_resultado_reaproveitado_dentro_da_janela(modulo):
+    async def testar(url, criar):
+        a, b = criar(modulo('a', url=f'{url}/')), criar(modulo('b', url=f'{url}/'))
+        await a.testar()
+        await b.testar()
+        assert b.status == OP and b.codigo == 200
+
+    antes = _coalescidos('cached')
+    assert _cenario(testar, janela=5, atraso=0) == ['GET /']
+    assert _coalescidos('cached') == antes + 1
+    # sem janela, somente os testes simultâneos são unidos
+    assert _cenario(testar, janela=0, atraso=0) == ['GET /', 'GET /']
+
+
+def test_metodos_diferentes_nao_sao_unidos(modulo):
+    async def testar(url, criar):
+        await asyncio.gather(criar(modulo('a', url=f'{url}/')).testar(),
+                             criar(modulo('b', url=f'{url}/', metodo=TipoMetodoHTTP.HEAD)).testar())
+
+    assert sorted(_cenario(testar, janela=5)) == ['GET /', 'HEAD /']
+
+
+def test_cancelar_um_modulo_nao_cancela_o_teste_compartilhado(modulo):
+    async def testar(url, criar):
+        a, b = criar(modulo('a', url=f'{url}/')), criar(modulo('b', url=f'{url}/'))
+        tarefa = asyncio.ensure_future(a.testar())
+        await asyncio.sleep(0.02)
+        tarefa.cancel()
+        await b.testar()
+        assert b.status == OP
+
+    assert _cenario(testar) == ['GET /']
+
+
+def test_testes_de_modulos_compostos_sao_unidos_aos_simples(modulo):
+    async def testar(url, criar):
+        composto = Modulo('c', TipoModulo.COMPOSITE,
+                          ParamsComposto([modulo('c', url=f'{url}/'), modulo('c', url=f'{url}/extra')], TipoPolitica.ALL),
+                          None, 'c')
+        simples = criar(modulo('s', url=f'{url}/'))
+        composto = criar(composto)
+        await asyncio.gather(simples.testar(), composto.testar())
+        assert simples.status == composto.status == OP
+
+    assert sorted(_cenario(testar)) == ['GET /', 'GET /extra']
+
+
+def test_timeout_de_quem_aguarda_o_teste_compartilhado(modulo):
+    async def testar(url, criar):
+        lento = modulo('lento', url=f'{url}/')
+        lento.timeout = 5
+        rapido = modulo('rapido', url=f'{url}/')
+        rapido.timeout = 0.1
+        a, b = criar(lento), criar(rapido)
+        await asyncio.gather(a.testar(), b.testar())
+        assert a.status == OP
+        assert b.status == MAJOR and b.informacao_adicional == 'tempo esgotado'
+
+    assert _cenario(testar, atraso=0.3) == ['GET /']
@@ -0,0 +1,146 @@
+import socket
+import asyncio
+from time import perf_counter
+
+import pytest
+from aiohttp import web
+
+from enums import Status, TipoModulo, TipoMetodoHTTP, TipoPolitica
+from models import Modulo, ParamsComposto, ParamsHTTP, ParamsPort
+from conexoes import PoolHTTP
+from prom import Prometheus
+from testador import combinar, decidir, criar_testador
+
+OP, DEG, PARTIAL, MAJOR, UNK = (Status.OPERATIONAL, Status.DEGRADED_PERFORMANCE, Status.PARTIAL_OUTAGE,
+                                Status.MAJOR_OUTAGE, Status.UNKNOWN)
+
+
+@pytest.mark.parametrize('politica,resultados,esperado', [
+    (TipoPolitica.WORST, [OP, DEG, OP], DEG),
+    (TipoPolitica.WORST, [OP, UNK], OP),
+    (TipoPolitica.WORST, [UNK, UNK], UNK),
+    (TipoPolitica.ALL, [OP, DEG], DEG),
+    (TipoPolitica.ALL, [OP, PARTIAL], MAJOR),
+    (TipoPolitica.ALL, [OP, UNK], UNK),
+    (TipoPolitica.MAJORITY, [OP, OP, MAJOR], OP),
+    (TipoPolitica.MAJORITY, [OP, MAJOR, MAJOR], MAJOR),
+    (TipoPolitica.MAJORITY, [OP, MAJOR], PARTIAL),
+    (TipoPolitica.MAJORITY, [OP, MAJOR, UNK], UNK),
+])
+def test_combinar(politica, resultados, esperado):
+    assert combinar(politica, resultados, len(resultados)) == esperado
+
+
+def test_decidir_antes_de_todos_os_testes():
+    assert decidir(TipoPolitica.WORST, [MAJOR], 3) == MAJOR
+    assert decidir(TipoPolitica.WORST, [OP], 3) is None
+    assert decidir(TipoPolitica.ALL, [PARTIAL], 3) == MAJOR
+    assert decidir(TipoPolitica.MAJORITY, [OP, OP], 3) == OP
+    assert decidir(TipoPolitica.MAJORITY, [OP, MAJOR], 3) is None
+
+
+def _porta(porta: int) -> Modulo:
+    return Modulo('composto', TipoModulo.PORT, ParamsPort('127.0.0.1', porta), None, 'sp')
+
+
+def _http(url: str) -> Modulo:
+    return Modulo('composto', TipoModulo.HTTP, ParamsHTTP(url, TipoMetodoHTTP.GET), None, 'sp')
+
+
+def _composto(testes, politica: TipoPolitica, timeout: float = 1) -> Modulo:
+    return Modulo('composto', TipoModulo.COMPOSITE, ParamsComposto(testes, politica), None, 'sp', timeout=timeout)
+
+
+async def _cenario(cache, politica: TipoPolitica, timeout: float = 1, abertas: int = 1, fechadas: int = 0,
+                   travados: int = 0):
+    """Executa um módulo composto com portas abertas, portas fechadas e requests http que nunca respondem
+
+    Returns:
+        O testador, a duração do teste e as trocas de status no cache
+    """
+    servidor = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0)
+    # aceita a conexão, mas nunca responde ao request
+    conexoes = []
+    travado = await asyncio.start_server(lambda r, w: conexoes.append(w), '127.0.0.1', 0)
+    fechada = socket.socket()
+    fechada.bind(('127.0.0.1', 0))
+
+    aberta = servidor.sockets[0].getsockname()[1]
+    url = f'http://127.0.0.1:{travado.sockets[0].getsockname()[1]}/'
+    testes = ([_porta(aberta)] * abertas + [_porta(fechada.getsockname()[1])] * fechadas
+              + [_http(url)] * travados)
+
+    pool = PoolHTTP()
+    await pool.iniciar()
+    testador = criar_testador(_composto(testes, politica, timeout), armazenamento=cache, pool_http=pool)
+    try:
+        async with servidor, travado:
+            inicio = perf_counter()
+            await testador.testar()
+            duracao = perf_counter() - inicio
+    finally:
+        fechada.close()
+        await pool.fechar()
+    return testador, duracao, cache.trocas
+
+
+def test_todos_os_testes_disponiveis(cache):
+    testador, _, trocas = asyncio.run(_cenario(cache, TipoPolitica.ALL, abertas=2))
+    assert testador.status == OP
+    assert trocas == [('composto', OP)]
+    assert testador.informacao_adicional.startswith('port#1: ')
+
+
+def test_resultado_decidido_cancela_os_testes_restantes(cache):
+    testador, duracao, trocas = asyncio.run(_cenario(cache, TipoPolitica.WORST, timeout=2, abertas=0, fechadas=1,
+                                                     travados=1))
+    assert testador.status == MAJOR
+    assert duracao < 1
+    assert 'http: cancelado' in testador.informacao_adicional
+    assert trocas == [('composto', MAJOR)]
+
+
+def test_maioria_decidida_cancela_o_teste_travado(cache):
+    testador, duracao, _ = asyncio.run(_cenario(cache, TipoPolitica.MAJORITY, timeout=2, abertas=2, travados=1))
+    assert testador.status == OP
+    assert duracao < 1
+
+
+def test_testes_sem_resposta_no_prazo_estao_fora_do_ar(cache):
+    testador, duracao, _ = asyncio.run(_cenario(cache, TipoPolitica.WORST, timeout=0.3, abertas=1, travados=1))
+    assert testador.status == MAJOR
+    assert 0.3 <= duracao < 1
+    assert 'http: tempo esgotado' in testador.informacao_adicional
+
+
+def test_codigo_publicado_uma_vez_pelo_composto():
+    async def rapido(_request):
+        return web.Response(text='ok')
+
+    async def lento(_request):
+        await asyncio.sleep(0.1)
+        return web.Response(status=404)
+
+    async def cenario():
+        app = web.Application()
+        app.router.add_get('/rapido', rapido)
+        app.router.add_get('/lento', lento)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+        pool = PoolHTTP()
+        await pool.iniciar()
+        modulo = _composto([_http(f'{url}/rapido'), _http(f'{url}/lento')], TipoPolitica.WORST)
+        testador = criar_testador(modulo, pool_http=pool)
+        try:
+            await testador.testar()
+        finally:
+            await pool.fechar()
+            await runner.cleanup()
+        return testador
+
+    testador = asyncio.run(cenario())
+    assert testador.status == MAJOR and testador.codigo == 200
+    # o teste interno que termina por último não sobrescreve o código do módulo
+    assert b'monitor_http_status_code{monitorName="composto"} 200.0' in Prometheus.renderizar_tabela()
@@ -0,0 +1,113 @@
+import asyncio
+
+from aiohttp import web
+
+from enums import Status, TipoModulo, TipoMetodoHTTP
+from conexoes import PoolHTTP
+from models import ConfigHTTP, Modulo, ParamsSize
+from testador import TestadorHTTP as _TestadorHTTP, TestadorSize as _TestadorSize
+
+GRANDE = b'x' * (4 * 1024 * 1024)
+
+
+class _Servidor:
+    """Servidor local que registra as conexões usadas por cada request"""
+
+    def __init__(self):
+        self.conexoes = []
+
+    async def _registrar(self, request: web.Request):
+        self.conexoes.append(request.transport.get_extra_info('peername'))
+
+    async def pequeno(self, request: web.Request) -> web.Response:
+        await self._registrar(request)
+        return web.Response(body=b'ok')
+
+    async def grande(self, request: web.Request) -> web.Response:
+        await self._registrar(request)
+        return web.Response(body=GRANDE)
+
+    async def size(self, request: web.Request) -> web.Response:
+        return web.json_response({'porcentagem': 0.6})
+
+    async def size_sem_fim(self, request: web.Request) -> web.StreamResponse:
+        # corpo sem Content-Length, maior que o limite
+        resposta = web.StreamResponse()
+        await resposta.prepare(request)
+        for _ in range(64):
+            await resposta.write(b' ' * 65536)
+        return resposta
+
+
+async def _iniciar(servidor: _Servidor):
+    app = web.Application()
+    app.router.add_route('*', '/pequeno', servidor.pequeno)
+    app.router.add_route('*', '/grande', servidor.grande)
+    app.router.add_get('/size', servidor.size)
+    app.router.add_get('/size-sem-fim', servidor.size_sem_fim)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    return runner, f'http://127.0.0.1:{runner.addresses[0][1]}'
+
+
+def _size(url: str) -> Modulo:
+    return Modulo('size', TipoModulo.SIZE, ParamsSize(url, TipoMetodoHTTP.GET), None, 'sp')
+
+
+def test_http_so_le_corpos_pequenos(modulo):
+    async def cenario():
+        servidor = _Servidor()
+        runner, base = await _iniciar(servidor)
+        pool = PoolHTTP(ConfigHTTP(max_body=1024))
+        await pool.iniciar()
+        try:
+            pequeno = _TestadorHTTP(modulo('http', url=f'{base}/pequeno'), pool_http=pool)
+            for _ in range(2):
+                await pequeno.testar()
+                assert pequeno.status == Status.OPERATIONAL
+            # corpo pequeno lido: a conexão é reutilizada
+            assert servidor.conexoes[0] == servidor.conexoes[1]
+
+            servidor.conexoes.clear()
+            grande = _TestadorHTTP(modulo('http', url=f'{base}/grande'), pool_http=pool)
+            for _ in range(2):
+                await grande.testar()
+                assert grande.status == Status.OPERATIONAL
+            # corpo grande não lido: a conexão é fechada
+            assert servidor.conexoes[0] != servidor.conexoes[1]
+
+            # HEAD não tem corpo, e mantém a conexão mesmo com um Content-Length grande
+            servidor.conexoes.clear()
+            head = _TestadorHTTP(modulo('http', url=f'{base}/grande', metodo=TipoMetodoHTTP.HEAD), pool_http=pool)
+            for _ in range(2):
+                await head.testar()
+                assert head.status == Status.OPERATIONAL
+            assert servidor.conexoes[0] == servidor.conexoes[1]
+        finally:
+            await pool.fechar()
+            await runner.cleanup()
+
+    asyncio.run(cenario())
+
+
+def test_size_limita_o_corpo():
+    async def cenario():
+        runner, base = await _iniciar(_Servidor())
+        pool = PoolHTTP(ConfigHTTP(max_body=1024))
+        await pool.iniciar()
+        try:
+            size = _TestadorSize(_size(f'{base}/size'), pool_http=pool)
+            await size.testar()
+            assert size.status == Status.DEGRADED_PERFORMANCE
+
+            for caminho in ['/grande', '/size-sem-fim']:
+                size = _TestadorSize(_size(f'{base}{caminho}'), pool_http=pool)
+                await size.testar()
+                assert size.status == Status.MAJOR_OUTAGE
+                assert 'maior que 1024 bytes' in size.informacao_adicional
+        finally:
+            await pool.fechar()
+            await runner.cleanup()
+
+    asyncio.run(cenario())
@@ -0,0 +1,247 @@
+import pytest
+
+from enums import TipoModulo, TipoPolitica
+from configuracao import Configuracao, InvalidConfigFile
+
+BASE = '''
+version = 1.0
+interval = 10
+port = 2112
+{extra}
+[statuspage]
+    apikey = "k"
+    pageid = "p"
+[discord]
+    role_id = "r"
+    id = "i"
+    token = "t"
+[redis]
+    host = "127.0.0.1"
+    port = 6379
+[[modules]]
+    name = "{nome}"
+    statuspage_id = "c1"
+    {modulo}
+    [[modules.test]]
+        type = "http"
+        url = "http://127.0.0.1/"
+        method = "get"
+'''
+
+
+def _configuracao(tmp_path, extra: str = '', nome: str = 'modulo', modulo: str = '') -> Configuracao:
+    arquivo = tmp_path / 'config.toml'
+    arquivo.write_text(BASE.format(extra=extra, nome=nome, modulo=modulo))
+    return Configuracao(str(arquivo))
+
+
+def test_configuracao_valida(tmp_path):
+    c = _configuracao(tmp_path)
+    assert [m.nome for m in c.modules] == ['modulo']
+    assert c.concurrency == 100
+
+
+@pytest.mark.parametrize('nome', ['', 'x' * 129, 'ç' * 65])
+def test_nome_de_modulo_invalido(tmp_path, nome):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, nome=nome)
+
+
+def test_nome_de_modulo_no_limite(tmp_path):
+    assert _configuracao(tmp_path, nome='x' * 128).modules[0].nome == 'x' * 128
+
+
+@pytest.mark.parametrize('concorrencia', ['0', '-1', '"10"'])
+def test_concorrencia_invalida(tmp_path, concorrencia):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, extra=f'concurrency = {concorrencia}')
+
+
+@pytest.mark.parametrize('extra, modulo', [
+    ('', 'interval = "x"'),
+    ('', 'timeout = 0'),
+    ('', 'jitter = -1'),
+    ('reload_interval = "5"', ''),
+    ('workers = 1.5', ''),
+    ('[http]\n    timeout = "3"', ''),
+    ('[metrics]\n    buckets = [0.1, "x"]', ''),
+])
+def test_valores_com_tipo_ou_intervalo_invalido(tmp_path, extra, modulo):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, extra=extra, modulo=modulo)
+
+
+def test_toml_invalido(tmp_path):
+    arquivo = tmp_path / 'config.toml'
+    arquivo.write_text('interval = ')
+    with pytest.raises(InvalidConfigFile):
+        Configuracao(str(arquivo))
+
+
+def test_metodos_http(tmp_path):
+    c = _configuracao(tmp_path, modulo='''[[modules.test]]
+        type = "http"
+        url = "http://127.0.0.1/"
+        method = "HEAD"''')
+    assert [m.params.metodo.name for m in c.modules[0].params.testes] == ['HEAD', 'GET']
+
+
+@pytest.mark.parametrize('tipo,metodo', [('http', 'put'), ('size', 'head')])
+def test_metodo_http_invalido(tmp_path, tipo, metodo):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, modulo=f'''[[modules.test]]
+        type = "{tipo}"
+        url = "http://127.0.0.1/"
+        method = "{metodo}"''')
+
+
+def test_varios_alvos_port(tmp_path):
+    c = _configuracao(tmp_path, modulo='''[[modules.test]]
+        type = "port"
+        targets = ["db1:5432", "[::1]:5433"]
+        require = "any"''')
+    params = c.modules[0].params.testes[0].params
+    assert params.alvos == [('db1', 5432), ('::1', 5433)]
+    assert params.minimo == 1
+
+
+@pytest.mark.parametrize('teste', [
+    'targets = ["db1"]',
+    'targets = []',
+    'targets = ["db1:99999"]',
+    'targets = ["db1:1", "db2:1"]\n        require = 3',
+    'targets = ["db1:1"]\n        require = "some"',
+])
+def test_alvos_port_invalidos(tmp_path, teste):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, modulo=f'''[[modules.test]]
+        type = "port"
+        {teste}''')
+
+
+def test_varios_testes_formam_um_unico_modulo(tmp_path):
+    c = _configuracao(tmp_path, modulo='''policy = "majority"
+    [[modules.test]]
+        type = "port"
+        host = "127.0.0.1"
+        port = 22''')
+    assert len(c.modules) == 1
+    modulo = c.modules[0]
+    assert modulo.tipo == TipoModulo.COMPOSITE
+    assert modulo.params.politica == TipoPolitica.MAJORITY
+    assert [t.tipo for t in modulo.params.testes] == [TipoModulo.PORT, TipoModulo.HTTP]
+    assert all(t.nome == 'modulo' for t in modulo.params.testes)
+
+
+def test_politica_invalida(tmp_path):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, modulo='policy = "best"')
+
+
+def test_nome_de_modulo_repetido(tmp_path):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, extra='''[[modules]]
+    name = "modulo"
+    statuspage_id = "c2"
+    [[modules.test]]
+        type = "http"
+        url = "http://127.0.0.1/"
+        method = "get"''')
+
+
+def test_intervalo_adaptativo(tmp_path):
+    c = _configuracao(tmp_path, extra='[adaptive]\n    max_interval = 300\n    fast_interval = 2',
+                      modulo='adaptive = false')
+    assert (c.adaptive.intervalo_maximo, c.adaptive.fator, c.adaptive.estaveis,
+            c.adaptive.intervalo_rapido) == (300, 2, 3, 2)
+    assert c.modules[0].adaptativo is False
+    assert _configuracao(tmp_path).adaptive is None
+
+
+@pytest.mark.parametrize('extra, modulo', [
+    ('[adaptive]\n    factor = 2', ''),
+    ('[adaptive]\n    max_interval = 300\n    factor = 1', ''),
+    ('[adaptive]\n    max_interval = 300\n    stable_probes = 0', ''),
+    ('', 'adaptive = "sim"'),
+])
+def test_intervalo_adaptativo_invalido(tmp_path, extra, modulo):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, extra=extra, modulo=modulo)
+
+
+def test_confirmacao_e_timeout_adaptativo(tmp_path):
+    c = _configuracao(tmp_path, extra='[probe]\n    retries = 2\n    budget = 0.5\n    adaptive_timeout = true\n'
+                                      '    coalesce_window = 5')
+    assert (c.probe.tentativas, c.probe.orcamento, c.probe.timeout_adaptativo) == (2, 0.5, True)
+    assert c.probe.janela_coalescencia == 5
+    assert (_configuracao(tmp_path).probe.tentativas, _configuracao(tmp_path).probe.janela_coalescencia) == (0, 0)
+
+
+@pytest.mark.parametrize('extra', [
+    '[probe]\n    retries = -1',
+    '[probe]\n    budget = 1.5',
+    '[probe]\n    timeout_percentile = 0',
+    '[probe]\n    adaptive_timeout = "sim"',
+    '[probe]\n    min_samples = 0',
+    '[probe]\n    coalesce_window = -1',
+])
+def test_confirmacao_invalida(tmp_path, extra):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, extra=extra)
+
+
+def test_dependencias_entre_modulos(tmp_path):
+    dependente = '''
+[[modules]]
+    name = "app"
+    statuspage_id = "c2"
+    depends_on = ["modulo"]
+    [[modules.test]]
+        type = "http"
+        url = "http://127.0.0.1/app"
+        method = "get"
+'''
+    arquivo = tmp_path / 'config.toml'
+    # o dependente vem antes da dependência no arquivo
+    texto = BASE.format(extra='', nome='modulo', modulo='')
+    arquivo.write_text(texto.replace('[[modules]]', dependente + '[[modules]]', 1))
+    c = Configuracao(str(arquivo))
+    assert [(m.nome, m.dependencias, m.grupo) for m in c.modules] == [('modulo', (), 'app'),
+                                                                       ('app', ('modulo',), 'app')]
+
+
+@pytest.mark.parametrize('modulo', ['depends_on = ["inexistente"]', 'depends_on = ["modulo"]', 'depends_on = "x"'])
+def test_dependencias_invalidas(tmp_path, modulo):
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, modulo=modulo)
+
+
+def test_modulos_com_o_mesmo_endpoint_no_mesmo_grupo(tmp_path):
+    outros = '''
+[[modules]]
+    name = "mesma_url"
+    statuspage_id = "c2"
+    [[modules.test]]
+        type = "http"
+        url = "http://127.0.0.1/"
+        method = "get"
+[[modules]]
+    name = "outro_metodo"
+    statuspage_id = "c3"
+    [[modules.test]]
+        type = "http"
+        url = "http://127.0.0.1/"
+        method = "head"
+'''
+    arquivo = tmp_path / 'config.toml'
+    arquivo.write_text(BASE.format(extra='', nome='modulo', modulo='') + outros)
+    c = Configuracao(str(arquivo))
+    assert [(m.nome, m.grupo) for m in c.modules] == [('modulo', 'mesma_url'), ('mesma_url', 'mesma_url'),
+                                                      ('outro_metodo', None)]
+
+
+def test_falhas_de_dns(tmp_path):
+    assert _configuracao(tmp_path).dns.max_falhas == 3
+    assert _configuracao(tmp_path, extra='[dns]\n    max_failures = 0').dns.max_falhas == 0
+    with pytest.raises(InvalidConfigFile):
+        _configuracao(tmp_path, extra='[dns]\n    max_failures = 1.5')
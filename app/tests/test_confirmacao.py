@@ -0,0 +1,192 @@
+import asyncio
+from time import perf_counter
+
+import pytest
+from aiohttp import web
+from prometheus_client import REGISTRY
+
+from enums import Status, TipoModulo, TipoMetodoHTTP
+from models import Modulo, ParamsHTTP, ConfigTeste
+from conexoes import PoolHTTP
+from latencias import JanelaLatencias
+from coalescencia import CoalescenciaTestes
+from prom import Prometheus
+from testador import TestadorHTTP as _TestadorHTTP
+
+OP, MAJOR = Status.OPERATIONAL, Status.MAJOR_OUTAGE
+
+
+def _confirmacoes(resultado: str) -> float:
+    return REGISTRY.get_sample_value('monitor_failure_confirmations_total', {'outcome': resultado}) or 0
+
+
+def test_timeout_adaptativo_usa_o_percentil_com_margem():
+    janela = JanelaLatencias(ConfigTeste(timeout_adaptativo=True, percentil=0.9, fator=2, timeout_minimo=0.1,
+                                         amostras=10))
+    for i in range(9):
+        janela.registrar(0.1 * (i + 1))
+    # amostras insuficientes: usa o timeout configurado
+    assert janela.timeout(5) == 5
+
+    janela.registrar(1.0)
+    assert janela.percentil() == 0.9
+    assert abs(janela.timeout(5) - 1.8) < 1e-9
+    # limitado pelo timeout configurado
+    assert janela.timeout(1) == 1
+
+
+def test_timeout_adaptativo_minimo_e_desligado():
+    config = ConfigTeste(timeout_adaptativo=True, fator=3, timeout_minimo=0.2, amostras=1)
+    janela = JanelaLatencias(config)
+    janela.registrar(0.001)
+    assert janela.timeout(5) == 0.2
+    config.timeout_adaptativo = False
+    assert janela.timeout(5) == 5
+
+
+@pytest.fixture
+def testar(cache, testador_simulado):
+    """Testa um módulo que falha nos primeiros `falhas` testes (somando as confirmações), com o status
+    armazenado fornecido. Retorna o testador e a duração do teste
+    """
+    def executar(falhas: int, armazenado=None, tentativas: int = 2, espera: float = 0, intervalo=None,
+                 orcamento: float = 1):
+        modulo = Modulo('instavel', TipoModulo.HTTP, ParamsHTTP('http://x', TipoMetodoHTTP.GET), None, 'sp',
+                        intervalo=intervalo, timeout=1)
+        cache.status, cache.trocas = {'instavel': armazenado} if armazenado else {}, []
+        testador = testador_simulado(modulo, *[MAJOR] * falhas, OP, espera=espera, armazenamento=cache,
+                                     teste=ConfigTeste(tentativas=tentativas, orcamento=orcamento))
+        inicio = perf_counter()
+        asyncio.run(testador.testar())
+        return testador, perf_counter() - inicio
+    return executar
+
+
+def test_falha_isolada_nao_muda_o_status(testar, cache):
+    antes = _confirmacoes('recovered')
+    testador, _ = testar(falhas=1, armazenado=OP)
+    assert testador.status == OP and testador.informacao_adicional == OP.nome()
+    assert cache.trocas == [('instavel', OP)]
+    assert testador.testes == 3
+    assert _confirmacoes('recovered') == antes + 1
+
+
+def test_falha_confirmada_por_todas_as_tentativas(testar, cache):
+    antes = _confirmacoes('confirmed')
+    testador, _ = testar(falhas=10, armazenado=OP)
+    assert testador.status == MAJOR
+    assert testador.informacao_adicional == f'{MAJOR.nome()} (confirmado por 2 tentativas)'
+    assert cache.trocas == [('instavel', MAJOR)] and testador.testes == 3
+    assert _confirmacoes('confirmed') == antes + 1
+
+
+def test_falha_que_nao_muda_o_status_nao_e_confirmada(testar):
+    testador, _ = testar(falhas=10, armazenado=MAJOR)
+    assert testador.status == MAJOR and testador.testes == 1
+    testador, _ = testar(falhas=10, armazenado=OP, tentativas=0)
+    assert testador.testes == 1
+
+
+def test_teste_e_confirmacoes_respeitam_o_orcamento_do_ciclo(testar):
+    antes = _confirmacoes('no_budget')
+    # o primeiro teste usa todo o orçamento (metade do intervalo), sem tempo para confirmar
+    testador, duracao = testar(falhas=0, armazenado=OP, espera=5, intervalo=0.4, orcamento=0.5)
+    assert testador.status == MAJOR and testador.testes == 1
+    assert 0.2 <= duracao < 0.35
+    assert _confirmacoes('no_budget') == antes + 1
+
+
+def test_timeout_adaptativo_libera_um_request_travado():
+    travar = asyncio.Event()
+
+    async def handler(_request):
+        if travar.is_set():
+            await asyncio.sleep(1.5)
+        return web.Response(body=b'ok')
+
+    async def cenario():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', 0).start()
+        pool = PoolHTTP()
+        await pool.iniciar()
+        modulo = Modulo('travado', TipoModulo.HTTP,
+                        ParamsHTTP(f'http://127.0.0.1:{runner.addresses[0][1]}/', TipoMetodoHTTP.GET), None, 'sp')
+        teste = ConfigTeste(timeout_adaptativo=True, fator=3, timeout_minimo=0.2, amostras=3)
+        testador = _TestadorHTTP(modulo, pool_http=pool, teste=teste)
+        try:
+            for _ in range(3):
+                await testador.testar()
+            assert testador.status == OP and len(testador.latencias) == 3
+
+            travar.set()
+            inicio = perf_counter()
+            await testador.testar()
+            return testador.status, perf_counter() - inicio
+        finally:
+            await pool.fechar()
+            await runner.cleanup()
+
+    status, duracao = asyncio.run(cenario())
+    assert status == MAJOR
+    assert duracao < 1
+
+
+async def _servidor(handler):
+    app = web.Application()
+    app.router.add_get('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    return runner, f'http://127.0.0.1:{runner.addresses[0][1]}/'
+
+
+def _cenario_http(handler, modulos: int, tentativas: int = 2, coalescencia: bool = False):
+    """Testa ao mesmo tempo `modulos` módulos HTTP do mesmo endpoint, cada um confirmando as suas falhas"""
+    async def cenario():
+        runner, url = await _servidor(handler)
+        pool = PoolHTTP()
+        await pool.iniciar()
+        teste = ConfigTeste(tentativas=tentativas)
+        compartilhada = CoalescenciaTestes(teste) if coalescencia else None
+        testadores = [_TestadorHTTP(Modulo(f'confirmado{i}', TipoModulo.HTTP, ParamsHTTP(url, TipoMetodoHTTP.GET),
+                                           None, 'sp'), pool_http=pool, teste=teste, coalescencia=compartilhada)
+                      for i in range(modulos)]
+        try:
+            await asyncio.gather(*(t.testar() for t in testadores))
+        finally:
+            await pool.fechar()
+            await runner.cleanup()
+        return testadores
+
+    return asyncio.run(cenario())
+
+
+def test_confirmacoes_nao_publicam_o_codigo():
+    codigos = iter([500, 502, 503])
+
+    async def handler(_request):
+        codigo = next(codigos)
+        # a última confirmação termina depois da primeira
+        await asyncio.sleep(0.05 if codigo == 503 else 0)
+        return web.Response(status=codigo)
+
+    testador, = _cenario_http(handler, modulos=1)
+    assert testador.status == MAJOR and testador.codigo == 500
+    assert b'monitor_http_status_code{monitorName="confirmado0"} 500.0' in Prometheus.renderizar_tabela()
+
+
+def test_confirmacoes_de_modulos_do_mesmo_endpoint_sao_unidas():
+    requests = []
+
+    async def handler(_request):
+        requests.append(1)
+        await asyncio.sleep(0.05)
+        return web.Response(status=500)
+
+    testadores = _cenario_http(handler, modulos=3, coalescencia=True)
+    assert all(t.status == MAJOR for t in testadores)
+    # um teste e as duas tentativas de confirmação, compartilhados pelos três módulos
+    assert len(requests) == 3
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from enums import Status
+from models import ConfigDiscord
+from notificacao import FilaDiscord
+from dependencias import GrafoDependencias
+from configuracao import _ordenar_dependencias
+from prom import Prometheus
+
+OP, MAJOR = Status.OPERATIONAL, Status.MAJOR_OUTAGE
+
+
+def test_modulos_ordenados_depois_das_dependencias(modulo):
+    modulos = [modulo('app', 'db', 'host'), modulo('solto'), modulo('db', 'host'), modulo('host'),
+               modulo('outro', 'solto2'), modulo('solto2')]
+    ordenados = _ordenar_dependencias(modulos)
+    assert [m.nome for m in ordenados] == ['solto', 'host', 'db', 'app', 'solto2', 'outro']
+    assert {m.nome: m.grupo for m in modulos} == {'app': 'app', 'db': 'app', 'host': 'app', 'solto': None,
+                                                  'outro': 'outro', 'solto2': 'outro'}
+
+
+@pytest.mark.parametrize('dependencias', [
+    {'a': ['inexistente']},
+    {'a': ['a']},
+    {'a': ['b'], 'b': ['c'], 'c': ['a']},
+])
+def test_dependencias_invalidas(modulo, dependencias):
+    with pytest.raises(ValueError):
+        _ordenar_dependencias([modulo(nome, *d) for nome, d in dependencias.items()])
+
+
+def test_causa_raiz_e_afetados(modulo):
+    modulos = [modulo('host'), modulo('db', 'host'), modulo('app', 'db'), modulo('web', 'host')]
+    _ordenar_dependencias(modulos)
+    grafo = GrafoDependencias(modulos)
+    app = modulos[2]
+
+    # dependência sem status conhecido não impede o teste
+    assert grafo.causa(app) is None
+    grafo.registrar('host', MAJOR)
+    grafo.registrar('db', MAJOR, causa='host')
+    assert grafo.causa(app) == 'host'
+    assert [m.nome for m in grafo.afetados('host')] == ['db', 'web', 'app']
+
+    grafo.registrar('db', Status.UNKNOWN)
+    assert grafo.causa(app) == 'host'
+    grafo.registrar('db', OP)
+    assert grafo.causa(app) is None
+
+
+def _enviar(fila: FilaDiscord):
+    """Simula o envio das transições prontas, retornando (módulo, status, afetados) de cada uma"""
+    prontas = fila._retirar_prontas()
+    fila._confirmar(prontas)
+    return [(t.modulo.nome, t.status, [m.nome for m in t.afetados]) for t in prontas]
+
+
+def test_dependentes_nao_sao_testados_enquanto_a_dependencia_esta_fora_do_ar(modulo, cache, testador_simulado):
+    modulos = [modulo('host'), modulo('db', 'host'), modulo('app', 'db')]
+    _ordenar_dependencias(modulos)
+    grafo = GrafoDependencias(modulos)
+    fila = FilaDiscord(ConfigDiscord('infra', 'i', 't'), 'monitor')
+    host, db, app = (testador_simulado(m, armazenamento=cache, discord=fila, dependencias=grafo) for m in modulos)
+
+    async def ciclo():
+        for testador in (host, db, app):
+            await testador.testar()
+
+    try:
+        asyncio.run(ciclo())
+        assert _enviar(fila) == [('host', OP, []), ('db', OP, []), ('app', OP, [])]
+
+        # o host cai: somente ele é testado e notificado, com os módulos afetados
+        host.definir(MAJOR)
+        asyncio.run(ciclo())
+        assert (host.testes, db.testes, app.testes) == (2, 1, 1)
+        assert cache.status == {'host': MAJOR, 'db': MAJOR, 'app': MAJOR}
+        assert app.informacao_adicional == 'Inacessível: host fora do ar'
+        assert _enviar(fila) == [('host', MAJOR, ['db', 'app'])]
+
+        # o host volta: os dependentes voltam a ser testados, sem notificar a recuperação deles
+        host.definir(OP)
+        db.definir(MAJOR)
+        asyncio.run(ciclo())
+        assert (host.testes, db.testes, app.testes) == (3, 2, 1)
+        assert cache.status == {'host': OP, 'db': MAJOR, 'app': MAJOR}
+        # o db continua fora do ar por conta própria, e passa a ser a causa do app
+        assert _enviar(fila) == [('host', OP, []), ('db', MAJOR, ['app'])]
+        assert app.informacao_adicional == 'Inacessível: db fora do ar'
+
+        db.definir(OP)
+        asyncio.run(ciclo())
+        assert _enviar(fila) == [('db', OP, [])]
+        assert cache.status == {'host': OP, 'db': OP, 'app': OP}
+    finally:
+        Prometheus.reter([])
+
+
+def test_notificacao_da_causa_marca_as_roles_dos_afetados(monkeypatch, modulo):
+    enviados = []
+
+    class _Webhook:
+        def __init__(self, **kwargs):
+            enviados.append(kwargs)
+
+        def execute(self):
+            return type('Resposta', (), {'ok': True, 'status_code': 200})()
+
+    monkeypatch.setattr('notificacao.DiscordWebhook', _Webhook)
+    fila = FilaDiscord(ConfigDiscord('infra', 'i', 't'), 'monitor')
+    fila.notificar(modulo('host'), OP, MAJOR, 'recusada', afetados=[modulo('db', 'host')])
+    fila._enviar(fila._retirar_prontas())
+
+    assert enviados[0]['content'] == '<@&infra><@&role_host><@&role_db>'
+    campos = enviados[0]['embeds'][0]['fields']
+    assert campos[-1] == {'name': 'Módulos Afetados', 'value': 'db', 'inline': False}
@@ -0,0 +1,78 @@
+import os
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from enums import Status
+from historico import Historico, LogHistorico
+from models import ConfigHistorico
+from servidor import ServidorMetricas
+
+
+def test_disponibilidade_por_janela(tmp_path):
+    log = LogHistorico(str(tmp_path / 'm.hist'), 'modulo', 1000)
+    # 100 testes, um por segundo: os 20 do meio falharam, e um ficou sem resultado
+    for t in range(100):
+        if t == 10:
+            status = Status.UNKNOWN
+        elif 40 <= t < 60:
+            status = Status.MAJOR_OUTAGE
+        else:
+            status = Status.OPERATIONAL
+        log.adicionar(status, duracao=0.1234, codigo=200, horario=1000 + t)
+
+    assert log.disponibilidade(1000, 1100) == 79 / 99
+    assert log.disponibilidade(1040, 1060) == 0
+    assert log.disponibilidade(1030, 1050) == 0.5
+    assert log.disponibilidade(1010, 1011) is None      # só um teste sem resultado
+    assert log.disponibilidade(2000, 3000) is None
+
+    [registro] = log.registros(1005, 1006)
+    assert registro.horario == 1005 and registro.status == Status.OPERATIONAL
+    assert registro.duracao == 0.123 and registro.codigo == 200 and registro.ocupacao is None
+    log.fechar()
+
+
+def test_registros_antigos_sao_sobrescritos(tmp_path):
+    caminho = str(tmp_path / 'm.hist')
+    log = LogHistorico(caminho, 'modulo', 10)
+    for t in range(25):
+        log.adicionar(Status.OPERATIONAL if t % 2 else Status.MAJOR_OUTAGE, horario=t)
+    assert os.path.getsize(caminho) == 4 + 2 + 2 + 4 + 8 + 128 + 10 * 18
+    assert [r.horario for r in log.registros(0, 100)] == list(range(15, 25))
+    assert log.disponibilidade(0, 100) == 5 / 10
+    assert log.disponibilidade(16, 19) == 1 / 3
+    log.fechar()
+
+    # o arquivo é reaberto (inclusive somente para leitura) mantendo os registros
+    leitura = LogHistorico(caminho)
+    assert leitura.nome == 'modulo' and leitura.total == 25
+    assert leitura.disponibilidade(0, 100) == 5 / 10
+    leitura.fechar()
+
+
+def test_historico_e_consultas_http(tmp_path):
+    historico = Historico(ConfigHistorico(path=str(tmp_path / 'historico'), max_records=100))
+    historico.registrar('a', Status.OPERATIONAL, 0.5, 200)
+    historico.registrar('a', Status.MAJOR_OUTAGE, 1.0, 503)
+    historico.registrar('b', Status.DEGRADED_PERFORMANCE, 0.2, 200, 0.65)
+
+    async def cenario():
+        # o servidor lê os arquivos com a sua própria instância, como no modo com vários processos
+        servidor = ServidorMetricas(0, historico=Historico(historico.config))
+        async with TestClient(TestServer(servidor.app)) as cliente:
+            resposta = await cliente.get('/history/uptime', params={'module': 'a'})
+            assert (await resposta.json())['uptime'] == 0.5
+
+            resposta = await cliente.get('/history', params={'module': 'b'})
+            [registro] = (await resposta.json())['records']
+            assert registro['status'] == 'DEGRADED_PERFORMANCE' and registro['size'] == 0.65
+
+            resposta = await cliente.get('/history/uptime', params={'module': 'c'})
+            assert (await resposta.json())['uptime'] is None
+
+            assert (await cliente.get('/history/uptime')).status == 400
+            assert (await cliente.get('/history', params={'module': 'a', 'start': 'x'})).status == 400
+
+    asyncio.run(cenario())
+    historico.fechar()
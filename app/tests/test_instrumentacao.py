@@ -0,0 +1,95 @@
+import time
+import asyncio
+import threading
+
+import fakeredis
+from prometheus_client import REGISTRY
+
+from enums import Status
+from motor import Motor
+from prom import Prometheus
+from armazenamento import Armazenamento
+from instrumentacao import ExecutorMonitorado, medir_chamada
+
+
+def _valor(nome: str, **labels) -> float:
+    return REGISTRY.get_sample_value(nome, labels) or 0
+
+
+def test_executor_conta_tarefas_na_fila_e_em_execucao():
+    executor = ExecutorMonitorado(max_workers=1)
+    liberar = threading.Event()
+    try:
+        primeira = executor.submit(liberar.wait)
+        segunda = executor.submit(lambda x: x * 2, 21)
+        time.sleep(0.05)
+        assert (executor.executando, executor.na_fila, executor.tamanho) == (1, 1, 1)
+
+        liberar.set()
+        assert primeira.result(1) and segunda.result(1) == 42
+        assert (executor.executando, executor.na_fila) == (0, 0)
+    finally:
+        liberar.set()
+        executor.shutdown()
+
+
+def test_chamadas_sao_medidas_por_servico_e_resultado():
+    antes_ok = _valor('monitor_external_call_seconds_count', service='teste', result='ok')
+    antes_erro = _valor('monitor_external_call_seconds_count', service='teste', result='error')
+
+    with medir_chamada('teste'):
+        pass
+    with medir_chamada('teste') as medicao:
+        medicao.falhou()
+    try:
+        with medir_chamada('teste'):
+            raise ConnectionError('recusada')
+    except ConnectionError:
+        pass
+
+    assert _valor('monitor_external_call_seconds_count', service='teste', result='ok') == antes_ok + 1
+    assert _valor('monitor_external_call_seconds_count', service='teste', result='error') == antes_erro + 2
+
+
+def test_comandos_do_redis_sao_medidos():
+    antes = _valor('monitor_external_call_seconds_count', service='redis', result='ok')
+    a = Armazenamento('', 0, cliente=fakeredis.FakeRedis())
+    a.guardar_muitos({'x': Status.OPERATIONAL})
+    a.coletar_muitos(['x'])
+    assert _valor('monitor_external_call_seconds_count', service='redis', result='ok') == antes + 2
+
+
+def test_motor_exporta_prazos_pulados_e_estourados_e_o_atraso_do_loop(modulo, testador_simulado):
+    atraso_antes = _valor('monitor_event_loop_lag_seconds_sum')
+    antes = {r: _valor('monitor_schedule_ticks_total', outcome=r) for r in ('started', 'skipped', 'overrun')}
+    # o teste demora mais que o próprio intervalo
+    lento = testador_simulado(modulo('lento', intervalo=0.1), espera=0.25)
+
+    async def cenario():
+        motor = Motor([lento], intervalo=100, concorrencia=10)
+        motor.INTERVALO_INSTRUMENTACAO = 0.05
+        tarefa = asyncio.create_task(motor.executar())
+        await asyncio.sleep(0.3)
+        # bloqueia o event loop, que deve ser medido como atraso
+        time.sleep(0.2)
+        await asyncio.sleep(0.3)
+        tarefa.cancel()
+        try:
+            await tarefa
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(cenario())
+    finally:
+        Prometheus.reter([])
+
+    depois = {r: _valor('monitor_schedule_ticks_total', outcome=r) for r in ('started', 'skipped', 'overrun')}
+    assert depois['started'] > antes['started']
+    assert depois['skipped'] > antes['skipped']
+    assert depois['overrun'] > antes['overrun']
+    assert REGISTRY.get_sample_value('monitor_active_tests', {'state': 'running'}) is not None
+    assert _valor('monitor_thread_pool_tasks', state='size') > 0
+    assert _valor('monitor_threads') >= 1
+    assert _valor('monitor_cycle_completion_ratio_count') > 0
+    assert _valor('monitor_event_loop_lag_seconds_sum') - atraso_antes >= 0.15
@@ -0,0 +1,77 @@
+import asyncio
+
+from enums import Status
+from models import Modulo
+from motor import Motor
+from prom import Prometheus
+from testador import TestadorBase as _TestadorBase
+
+
+class _TestadorLento(_TestadorBase):
+    """Testador que só termina quando `liberar` for marcado"""
+
+    def __init__(self, modulo: Modulo):
+        super().__init__(modulo)
+        self.iniciado = asyncio.Event()
+        self.liberar = asyncio.Event()
+        self.terminados = 0
+
+    async def testar_custom(self):
+        self.iniciado.set()
+        await self.liberar.wait()
+        self.status = Status.OPERATIONAL
+        self.terminados += 1
+
+
+def test_testador_removido_durante_o_teste_nao_publica_o_resultado(modulo):
+    async def cenario():
+        testador = _TestadorLento(modulo('removido'))
+        motor = Motor([testador], intervalo=100, concorrencia=10)
+        tarefa = asyncio.create_task(motor.executar())
+        await asyncio.wait_for(testador.iniciado.wait(), 1)
+
+        # como no Recarregador: remove o testador e as métricas do módulo
+        motor.remover(testador)
+        Prometheus.reter([])
+        testador.liberar.set()
+        await asyncio.sleep(0.05)
+        tarefa.cancel()
+        return testador
+
+    testador = asyncio.run(cenario())
+    assert testador.terminados == 0
+    assert b'monitorName="removido"' not in Prometheus.renderizar_tabela()
+
+
+def test_testador_adicionado_e_executado(modulo):
+    async def cenario():
+        testador = _TestadorLento(modulo('adicionado'))
+        testador.liberar.set()
+        motor = Motor([], intervalo=100, concorrencia=10)
+        tarefa = asyncio.create_task(motor.executar())
+        await asyncio.sleep(0.01)
+        await motor.adicionar(testador, imediato=True)
+        await asyncio.wait_for(testador.iniciado.wait(), 1)
+        await asyncio.sleep(0.01)
+        tarefa.cancel()
+        return testador
+
+    assert asyncio.run(cenario()).terminados == 1
+    assert b'monitor_status{monitorName="adicionado"} 1.0' in Prometheus.renderizar_tabela()
+    Prometheus.reter([])
+
+
+def test_servico_com_erro_interrompe_o_motor():
+    class _Quebrado:
+        async def executar(self):
+            raise OSError('porta em uso')
+
+    async def cenario():
+        await Motor([], intervalo=100, concorrencia=10, servicos=[_Quebrado()]).executar()
+
+    try:
+        asyncio.run(asyncio.wait_for(cenario(), 1))
+    except OSError as e:
+        assert 'porta em uso' in str(e)
+    else:
+        raise AssertionError('o motor deveria ter sido interrompido')
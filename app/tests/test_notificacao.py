@@ -0,0 +1,102 @@
+import asyncio
+
+from enums import Status
+from models import ConfigDiscord
+from notificacao import FilaDiscord
+
+
+class _FilaFalha(FilaDiscord):
+    """Fila cujos envios falham (com o código `erro`) enquanto `falhas` for maior que zero"""
+
+    def __init__(self, falhas: int, erro: int = 500):
+        super().__init__(ConfigDiscord('role', 'id', 'token'), 'teste', janela=0.05)
+        self.falhas = falhas
+        self.erro = erro
+        self.tentativas = 0
+        self.enviados = []
+
+    def _enviar(self, transicoes):
+        self.tentativas += 1
+        if self.falhas > 0:
+            self.falhas -= 1
+            return self.erro
+        self.enviados.append([(t.modulo.nome, t.status) for t in transicoes])
+        return 200
+
+
+async def _executar(fila: FilaDiscord, duracao: float, durante=None):
+    tarefa = asyncio.create_task(fila.executar())
+    await asyncio.sleep(duracao / 2)
+    if durante is not None:
+        durante()
+    await asyncio.sleep(duracao / 2)
+    tarefa.cancel()
+
+
+def test_envio_com_falha_e_repetido(modulo):
+    fila = _FilaFalha(falhas=2)
+    fila.notificar(modulo('a'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'fora')
+    fila.notificar(modulo('b'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'fora')
+    asyncio.run(_executar(fila, 0.5))
+
+    assert fila.enviados == [[('a', Status.MAJOR_OUTAGE), ('b', Status.MAJOR_OUTAGE)]]
+    assert fila.pendentes == 0
+
+
+def test_envio_rejeitado_e_descartado(modulo):
+    fila = _FilaFalha(falhas=1, erro=400)
+    fila.notificar(modulo('a'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'fora')
+    asyncio.run(_executar(fila, 0.5))
+
+    # a rejeição não é repetida, e o status conta como notificado
+    assert fila.tentativas == 1 and fila.enviados == []
+    assert fila.pendentes == 0
+    fila.notificar(modulo('a'), Status.MAJOR_OUTAGE, Status.MAJOR_OUTAGE, 'fora')
+    assert fila.pendentes == 0
+
+
+def test_limite_de_requests_e_repetido(modulo):
+    fila = _FilaFalha(falhas=1, erro=429)
+    fila.notificar(modulo('a'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'fora')
+    asyncio.run(_executar(fila, 0.5))
+    assert fila.enviados == [[('a', Status.MAJOR_OUTAGE)]]
+
+
+def test_mudanca_durante_envio_com_falha_mantem_a_mais_nova(modulo):
+    fila = _FilaFalha(falhas=1)
+    fila.notificar(modulo('a'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'fora')
+    fila.notificar(modulo('b'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'fora')
+
+    def mudar():
+        fila.notificar(modulo('a'), Status.MAJOR_OUTAGE, Status.PARTIAL_OUTAGE, 'parcial')
+
+    asyncio.run(_executar(fila, 0.04, durante=mudar))
+    asyncio.run(_executar(fila, 0.3))
+    enviados = dict(x for lote in fila.enviados for x in lote)
+    assert enviados == {'a': Status.PARTIAL_OUTAGE, 'b': Status.MAJOR_OUTAGE}
+
+
+def test_volta_ao_status_notificado_apos_falha_nao_envia(modulo):
+    fila = _FilaFalha(falhas=100)
+    fila.notificar(modulo('a'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'fora')
+    lote = fila._retirar_prontas()
+    # volta ao status anterior enquanto o envio está em andamento
+    fila.notificar(modulo('a'), Status.MAJOR_OUTAGE, Status.OPERATIONAL, 'ok')
+    fila._devolver(lote)
+    assert fila.pendentes == 0
+
+
+def test_oscilacao_dentro_da_histerese_nao_envia(modulo):
+    fila = _FilaFalha(falhas=0)
+    fila.histerese = 10
+    fila.notificar(modulo('a'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'fora')
+    fila.notificar(modulo('a'), Status.MAJOR_OUTAGE, Status.OPERATIONAL, 'ok')
+    assert fila.pendentes == 0
+
+
+def test_embed_sem_informacao_tem_valor(modulo):
+    fila = _FilaFalha(falhas=0)
+    fila.notificar(modulo('a'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, None)
+    fila.notificar(modulo('b'), Status.OPERATIONAL, Status.MAJOR_OUTAGE, 'x' * 2000)
+    campos = [c for t in fila._retirar_prontas() for c in fila._embed(t)['fields']]
+    assert all(c['value'] and len(c['value']) <= 1024 for c in campos)
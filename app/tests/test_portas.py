@@ -0,0 +1,93 @@
+import socket
+import asyncio
+
+import pytest
+
+from enums import Status, TipoModulo
+from models import Modulo, ParamsPort
+from portas import VerificadorPortas
+from testador import TestadorPort as _TestadorPort
+
+
+def _porta_fechada() -> int:
+    """Porta livre, sem ninguém escutando"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def _servidor():
+    servidor = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0, backlog=1024)
+    return servidor, servidor.sockets[0].getsockname()[1]
+
+
+def test_verificador_em_lote():
+    async def cenario():
+        servidor, aberta = await _servidor()
+        fechada = _porta_fechada()
+        verificador = VerificadorPortas()
+        async with servidor:
+            # vários testadores pedindo verificações na mesma iteração do event loop
+            lotes = await asyncio.gather(*(
+                verificador.verificar([('127.0.0.1', aberta, socket.AF_INET),
+                                       ('127.0.0.1', fechada, socket.AF_INET)], 1)
+                for _ in range(200)
+            ))
+        for aberto, fechado in lotes:
+            assert aberto.aberta and aberto.latencia is not None and aberto.porta == aberta
+            assert not fechado.aberta and fechado.erro == 'ECONNREFUSED'
+
+    asyncio.run(cenario())
+
+
+def test_verificacao_cancelada_fecha_os_sockets():
+    async def cenario():
+        servidor, aberta = await _servidor()
+        verificador = VerificadorPortas()
+        async with servidor:
+            tarefa = asyncio.create_task(verificador.verificar([('127.0.0.1', aberta, socket.AF_INET)], 1))
+            await asyncio.sleep(0)
+            tarefa.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await tarefa
+            # o verificador continua funcionando
+            [resultado] = await verificador.verificar([('127.0.0.1', aberta, socket.AF_INET)], 1)
+            assert resultado.aberta
+
+    asyncio.run(cenario())
+
+
+@pytest.mark.parametrize('abertas,fechadas,minimo,status', [
+    (2, 1, 1, Status.OPERATIONAL),
+    (2, 1, None, Status.PARTIAL_OUTAGE),
+    (2, 1, 2, Status.OPERATIONAL),
+    (1, 2, 2, Status.PARTIAL_OUTAGE),
+    (0, 2, 1, Status.MAJOR_OUTAGE),
+])
+def test_varios_alvos(abertas, fechadas, minimo, status):
+    async def cenario():
+        servidores = [await _servidor() for _ in range(abertas)]
+        alvos = [('127.0.0.1', p) for _, p in servidores] + [('127.0.0.1', _porta_fechada()) for _ in range(fechadas)]
+        modulo = Modulo('portas', TipoModulo.PORT, ParamsPort(*alvos[0], alvos=alvos, minimo=minimo), None, 'sp')
+        testador = _TestadorPort(modulo)
+        await testador.testar()
+        for servidor, _ in servidores:
+            servidor.close()
+        assert testador.status == status
+        assert testador.informacao_adicional.startswith(f'{abertas}/{abertas + fechadas} alvos abertos')
+
+    asyncio.run(cenario())
+
+
+def test_alvo_unico_aberto_tem_informacao():
+    async def cenario():
+        servidor, porta = await _servidor()
+        testador = _TestadorPort(Modulo('porta', TipoModulo.PORT, ParamsPort('127.0.0.1', porta), None, 'sp'))
+        await testador.testar()
+        servidor.close()
+        return testador
+
+    testador = asyncio.run(cenario())
+    assert testador.status == Status.OPERATIONAL
+    # o discord rejeita um campo sem valor
+    assert testador.informacao_adicional == '-'
@@ -0,0 +1,32 @@
+from prometheus_client import REGISTRY
+
+from prom import Prometheus, TipoPrometheus
+from tabela import TabelaResultados, tamanho_buffer
+
+
+def _descartadas() -> float:
+    return REGISTRY.get_sample_value('monitor_metric_series_dropped_total')
+
+
+def test_tabela_cheia_descarta_contando_as_series(caplog):
+    original = Prometheus._tabela
+    # tabela em um buffer externo (como a memória compartilhada de um trabalhador), com uma única linha
+    Prometheus._tabela = TabelaResultados(buffer=bytearray(tamanho_buffer(1)))
+    try:
+        antes = _descartadas()
+        Prometheus.get(TipoPrometheus.STATUS, 'cabe').set(1)
+        Prometheus.get(TipoPrometheus.STATUS, 'nao_cabe').set(1)
+        Prometheus.get(TipoPrometheus.STATUS, 'tambem_nao').set(1)
+
+        assert _descartadas() == antes + 2
+        assert sum('Tabela de resultados cheia' in r.message for r in caplog.records) == 1
+        texto = Prometheus.renderizar_tabela()
+        assert b'monitorName="cabe"' in texto and b'nao_cabe' not in texto
+
+        # ao liberar uma linha, um novo módulo cabe novamente
+        Prometheus.reter([])
+        Prometheus.get(TipoPrometheus.STATUS, 'nao_cabe').set(1)
+        assert b'monitorName="nao_cabe"' in Prometheus.renderizar_tabela()
+    finally:
+        Prometheus.reter([])
+        Prometheus._tabela = original
@@ -0,0 +1,58 @@
+import os
+import asyncio
+
+from test_configuracao import BASE
+
+from configuracao import Configuracao
+from recarregador import Recarregador
+
+
+class _Motor:
+    """Motor falso, que somente registra os testadores"""
+
+    def __init__(self):
+        self.testadores = []
+        self.cache = None
+
+    async def adicionar(self, testador, imediato=False):
+        self.testadores.append(testador)
+
+    def remover(self, testador):
+        self.testadores.remove(testador)
+
+
+class _Testador:
+    def __init__(self, modulo):
+        self.modulo = modulo
+
+
+def _escrever(arquivo, modulo='', nome='modulo'):
+    arquivo.write_text(BASE.format(extra='', nome=nome, modulo=modulo))
+    # garante um horário de modificação diferente do anterior
+    os.utime(arquivo, (os.stat(arquivo).st_atime, os.stat(arquivo).st_mtime + 1))
+
+
+def test_arquivo_invalido_nao_interrompe_o_recarregamento(tmp_path):
+    arquivo = tmp_path / 'config.toml'
+    _escrever(arquivo)
+
+    async def cenario():
+        motor = _Motor()
+        recarregador = Recarregador(str(arquivo), Configuracao(str(arquivo)), motor, _Testador, intervalo=0.01)
+        tarefa = asyncio.create_task(recarregador.executar())
+
+        # tipo errado: a configuração atual é mantida
+        _escrever(arquivo, modulo='interval = "x"')
+        await asyncio.sleep(0.1)
+        assert not tarefa.done()
+        assert motor.testadores == []
+
+        # o arquivo corrigido ainda é recarregado
+        _escrever(arquivo, nome='outro')
+        await asyncio.sleep(0.1)
+        assert not tarefa.done()
+        tarefa.cancel()
+        return motor
+
+    motor = asyncio.run(cenario())
+    assert [t.modulo.nome for t in motor.testadores] == ['outro']
@@ -0,0 +1,175 @@
+import asyncio
+
+from enums import Status, TipoModulo, TipoMetodoHTTP
+from models import ConfigDNS, Modulo, ParamsHTTP, ParamsPort
+from conexoes import PoolHTTP
+from resolvedor import ErroDNS, ResolvedorDNS
+from testador import TestadorHTTP as _TestadorHTTP, TestadorPort as _TestadorPort
+
+
+class _Resolvedor(ResolvedorDNS):
+    """Resolvedor com as consultas simuladas, contando as consultas feitas"""
+
+    def __init__(self, config: ConfigDNS, enderecos=('127.0.0.1',), espera: float = 0):
+        super().__init__(config)
+        self.enderecos = list(enderecos)
+        self.espera = espera
+        self.consultas = 0
+
+    async def _consultar(self, host, family):
+        self.consultas += 1
+        await asyncio.sleep(self.espera)
+        if not self.enderecos:
+            raise ErroDNS(f"{host}: não encontrado")
+        return self.enderecos, self.config.ttl
+
+
+def test_respostas_ficam_no_cache_e_consultas_simultaneas_sao_unidas():
+    async def cenario():
+        resolvedor = _Resolvedor(ConfigDNS(ttl=60), espera=0.05)
+        resultados = await asyncio.gather(*(resolvedor.resolve('servico.local', 80) for _ in range(10)))
+        assert resolvedor.consultas == 1
+        assert all(r[0]['host'] == '127.0.0.1' and r[0]['port'] == 80 for r in resultados)
+
+        # a porta não faz parte do cache
+        assert (await resolvedor.resolve('servico.local', 443))[0]['port'] == 443
+        assert resolvedor.consultas == 1
+
+    asyncio.run(cenario())
+
+
+def test_resposta_expirada_e_consultada_novamente():
+    async def cenario():
+        resolvedor = _Resolvedor(ConfigDNS(ttl=0.05))
+        await resolvedor.resolve('servico.local')
+        await asyncio.sleep(0.1)
+        await resolvedor.resolve('servico.local')
+        assert resolvedor.consultas == 2
+
+    asyncio.run(cenario())
+
+
+def test_falhas_ficam_no_cache_por_negative_ttl():
+    async def cenario():
+        resolvedor = _Resolvedor(ConfigDNS(negative_ttl=0.1), enderecos=())
+        for _ in range(3):
+            try:
+                await resolvedor.resolve('inexistente.local')
+                assert False, "a resolução deveria falhar"
+            except ErroDNS:
+                pass
+        assert resolvedor.consultas == 1
+
+        await asyncio.sleep(0.15)
+        resolvedor.enderecos = ['127.0.0.1']
+        assert (await resolvedor.resolve('inexistente.local'))[0]['host'] == '127.0.0.1'
+        assert resolvedor.consultas == 2
+
+    asyncio.run(cenario())
+
+
+def test_resolucao_lenta_e_uma_falha_de_dns():
+    async def cenario():
+        resolvedor = _Resolvedor(ConfigDNS(timeout=0.05), espera=1)
+        try:
+            await resolvedor.resolve('lento.local')
+            assert False, "a resolução deveria falhar"
+        except ErroDNS as e:
+            assert 'tempo esgotado' in str(e)
+
+    asyncio.run(cenario())
+
+
+def test_enderecos_ip_nao_sao_consultados():
+    async def cenario():
+        resolvedor = _Resolvedor(ConfigDNS())
+        assert (await resolvedor.resolve('10.0.0.1', 22))[0]['host'] == '10.0.0.1'
+        assert resolvedor.consultas == 0
+
+    asyncio.run(cenario())
+
+
+def test_getaddrinfo_do_sistema():
+    async def cenario():
+        resolvedor = ResolvedorDNS(ConfigDNS())
+        try:
+            resultado = await resolvedor.resolve('localhost', 80)
+        finally:
+            await resolvedor.close()
+        assert resultado and all(r['port'] == 80 for r in resultado)
+
+    asyncio.run(cenario())
+
+
+def test_port_usa_o_resolvedor_compartilhado():
+    async def cenario():
+        servidor = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        resolvedor = _Resolvedor(ConfigDNS())
+        pool = PoolHTTP(resolvedor=resolvedor)
+        modulo = Modulo('porta-dns', TipoModulo.PORT, ParamsPort('servico.local', porta), None, 'sp')
+        testador = _TestadorPort(modulo, pool_http=pool)
+        async with servidor:
+            await testador.testar()
+            await testador.testar()
+        assert testador.status == Status.OPERATIONAL
+        assert resolvedor.consultas == 1
+
+    asyncio.run(cenario())
+
+
+def test_falha_de_dns_nao_e_uma_queda_do_modulo(cache):
+    async def cenario():
+        resolvedor = _Resolvedor(ConfigDNS(), enderecos=())
+        pool = PoolHTTP(resolvedor=resolvedor)
+        await pool.iniciar()
+        testadores = [
+            _TestadorPort(Modulo('porta', TipoModulo.PORT, ParamsPort('inexistente.local', 80), None, 'sp'),
+                          armazenamento=cache, pool_http=pool),
+            _TestadorHTTP(Modulo('http', TipoModulo.HTTP, ParamsHTTP('http://inexistente.local/', TipoMetodoHTTP.GET),
+                                 None, 'sp'),
+                          armazenamento=cache, pool_http=pool),
+        ]
+        try:
+            for testador in testadores:
+                await testador.testar()
+                assert testador.status == Status.UNKNOWN
+                assert testador.informacao_adicional.startswith('DNS')
+        finally:
+            await pool.fechar()
+        # o status armazenado não muda, e nada é notificado
+        assert cache.trocas == []
+
+    asyncio.run(cenario())
+
+
+def test_falhas_de_dns_seguidas_sao_uma_queda(cache):
+    async def cenario():
+        servidor = await asyncio.start_server(lambda r, w: w.close(), '127.0.0.1', 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        resolvedor = _Resolvedor(ConfigDNS(ttl=0, negative_ttl=0, max_falhas=3), enderecos=())
+        pool = PoolHTTP(resolvedor=resolvedor)
+        testador = _TestadorPort(Modulo('removido', TipoModulo.PORT, ParamsPort('removido.local', porta), None, 'sp'),
+                                 armazenamento=cache, pool_http=pool)
+        status = []
+        async with servidor:
+            for _ in range(4):
+                await testador.testar()
+                status.append(testador.status)
+            assert testador.informacao_adicional.endswith('(4 testes seguidos)')
+
+            # o nome volta a ser resolvido: a contagem recomeça
+            resolvedor.enderecos = ['127.0.0.1']
+            await testador.testar()
+            status.append(testador.status)
+            resolvedor.enderecos = []
+            await testador.testar()
+            status.append(testador.status)
+        # cada teste consultou o resolvedor novamente
+        assert resolvedor.consultas == 6
+        return status, cache.trocas
+
+    status, trocas = asyncio.run(cenario())
+    UNK, MAJOR, OP = Status.UNKNOWN, Status.MAJOR_OUTAGE, Status.OPERATIONAL
+    assert status == [UNK, UNK, MAJOR, MAJOR, OP, UNK]
+    assert trocas == [('removido', MAJOR), ('removido', MAJOR), ('removido', OP)]
@@ -0,0 +1,77 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+from prometheus_client import REGISTRY
+
+from enums import Status
+from servidor import ServidorMetricas
+from sla import AgregadorSLA, JanelaRolante
+
+INICIO = 1_700_000_000
+
+
+def test_janela_descarta_os_baldes_antigos():
+    janela = JanelaRolante(10, 10)
+    for t in range(10):
+        janela.somar(t, 0, 1)
+    assert janela.totais[0] == 10
+    janela.somar(14.5, 0, 1)        # baldes 0 a 4 saíram da janela
+    assert janela.totais[0] == 6
+    janela.avancar(100)             # mais de uma volta: tudo saiu
+    assert janela.totais[0] == 0
+
+
+def test_disponibilidade_rolante():
+    sla = AgregadorSLA(lacuna_max=120)
+    # um teste por minuto: 10 operacionais, 5 fora do ar, 1 sem resultado e 4 operacionais
+    status = [Status.OPERATIONAL] * 10 + [Status.MAJOR_OUTAGE] * 5 + [Status.UNKNOWN] + [Status.OPERATIONAL] * 4
+    for i, s in enumerate(status):
+        sla.registrar('modulo-sla', s, duracao=0.003, horario=INICIO + 60 * i)
+
+    janela = sla.resumo('modulo-sla', horario=INICIO + 60 * 19)['24h']
+    # o tempo de cada status vai até o teste seguinte, e o tempo em UNKNOWN não conta
+    assert janela['seconds'] == 18 * 60
+    assert janela['downtime_seconds'] == 5 * 60
+    assert janela['availability'] == 1 - 5 / 18
+    assert janela['probes'] == {'OPERATIONAL': 14, 'MAJOR_OUTAGE': 5, 'UNKNOWN': 1}
+    assert janela['latency']['p99'] == 0.004
+
+    assert REGISTRY.get_sample_value('monitor_sla_downtime_seconds',
+                                     {'monitorName': 'modulo-sla', 'window': '30d'}) == 5 * 60
+
+    # sem testes, os baldes saem da janela de 24h, mas continuam na de 7 dias
+    resumo = sla.resumo('modulo-sla', horario=INICIO + 2 * 86400)
+    assert resumo['24h']['seconds'] == 0 and resumo['24h']['availability'] is None
+    assert resumo['7d']['downtime_seconds'] == 5 * 60
+
+
+def test_lacuna_maxima():
+    sla = AgregadorSLA(lacuna_max=120)
+    sla.registrar('lacuna', Status.MAJOR_OUTAGE, horario=INICIO)
+    sla.registrar('lacuna', Status.OPERATIONAL, horario=INICIO + 3600)
+    assert sla.resumo('lacuna', horario=INICIO + 3600)['24h']['downtime_seconds'] == 120
+
+
+def test_rota_sla():
+    sla = AgregadorSLA()
+    sla.registrar('rota', Status.OPERATIONAL, horario=INICIO)
+    sla.registrar('rota', Status.OPERATIONAL, horario=INICIO + 60)
+
+    async def cenario():
+        servidor = ServidorMetricas(0, sla=lambda: sla.resumos(horario=INICIO + 60))
+        async with TestClient(TestServer(servidor.app)) as cliente:
+            corpo = await (await cliente.get('/sla')).json()
+            assert corpo['rota']['7d']['availability'] == 1
+            assert (await cliente.get('/sla', params={'module': 'outro'})).status == 404
+
+    asyncio.run(cenario())
+
+
+def test_sla_do_registro():
+    from prometheus_client import CollectorRegistry, Gauge
+    from servidor import sla_do_registro
+
+    registro = CollectorRegistry()
+    disponibilidade = Gauge('monitor_sla_availability', '', ['monitorName', 'window'], registry=registro)
+    disponibilidade.labels('a', '24h').set(0.5)
+    assert sla_do_registro(registro) == {'a': {'24h': {'availability': 0.5}}}
@@ -0,0 +1,106 @@
+import asyncio
+from time import monotonic
+
+from aiohttp import web
+
+from enums import Status
+from conexoes import PoolHTTP
+from models import ConfigStatuspage
+from statuspage import DespachanteStatuspage
+
+
+class _Stub:
+    """Api da statuspage local, respondendo os códigos fornecidos em ordem (depois, 200)"""
+
+    def __init__(self, respostas):
+        self.respostas = list(respostas)
+        self.recebidos = []     # (instante, componente, status)
+
+    async def put(self, request: web.Request) -> web.Response:
+        corpo = await request.json()
+        self.recebidos.append(
+            (monotonic(), request.match_info['componente'], corpo['component']['status'])
+        )
+        assert request.headers['Authorization'] == 'OAuth chave'
+        if not self.respostas:
+            return web.json_response({})
+        codigo, headers = self.respostas.pop(0)
+        return web.json_response({'message': 'erro'}, status=codigo, headers=headers)
+
+
+async def _executar(stub: _Stub, envios, esperados: int, backoff: float = 0.05, limite: float = 5):
+    """Executa o despachante contra o stub até receber `esperados` requests (ou o limite de tempo)"""
+    app = web.Application()
+    app.router.add_put('/v1/pages/pagina/components/{componente}', stub.put)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    porta = runner.addresses[0][1]
+
+    pool = PoolHTTP()
+    await pool.iniciar()
+    despachante = DespachanteStatuspage(
+        ConfigStatuspage(api_key='chave', page_id='pagina', url=f'http://127.0.0.1:{porta}/v1'), pool
+    )
+    despachante.BACKOFF_INICIAL = backoff
+    for componente, status in envios:
+        despachante.enviar(componente, status)
+
+    tarefa = asyncio.create_task(despachante.executar())
+    inicio = monotonic()
+    while len(stub.recebidos) < esperados and monotonic() - inicio < limite:
+        await asyncio.sleep(0.01)
+    # tempo para requests extras (que não deveriam acontecer)
+    await asyncio.sleep(0.2)
+    tarefa.cancel()
+    await pool.fechar()
+    await runner.cleanup()
+    return despachante
+
+
+def test_envios_repetidos_sao_unidos():
+    stub = _Stub([])
+    asyncio.run(_executar(stub, [('c1', Status.MAJOR_OUTAGE), ('c1', Status.OPERATIONAL)], esperados=1))
+    assert [(c, s) for _, c, s in stub.recebidos] == [('c1', 'operational')]
+
+
+def test_status_ja_enviado_nao_e_reenviado():
+    stub = _Stub([])
+
+    async def cenario():
+        despachante = await _executar(stub, [('c1', Status.OPERATIONAL)], esperados=1)
+        despachante.enviar('c1', Status.OPERATIONAL)
+        assert despachante.pendentes == 0
+
+    asyncio.run(cenario())
+    assert len(stub.recebidos) == 1
+
+
+def test_429_respeita_retry_after():
+    stub = _Stub([(429, {'Retry-After': '0.3'})])
+    despachante = asyncio.run(_executar(stub, [('c1', Status.MAJOR_OUTAGE)], esperados=2))
+    assert len(stub.recebidos) == 2
+    assert stub.recebidos[1][0] - stub.recebidos[0][0] >= 0.3
+    assert despachante.pendentes == 0
+
+
+def test_erros_temporarios_usam_backoff_exponencial():
+    stub = _Stub([(500, {}), (503, {}), (502, {})])
+    asyncio.run(_executar(stub, [('c1', Status.MAJOR_OUTAGE)], esperados=4, backoff=0.1))
+    assert len(stub.recebidos) == 4
+    esperas = [b[0] - a[0] for a, b in zip(stub.recebidos, stub.recebidos[1:])]
+    assert esperas[0] >= 0.1 and esperas[1] >= 0.2 and esperas[2] >= 0.4
+
+
+def test_erros_permanentes_nao_sao_repetidos():
+    stub = _Stub([(404, {})])
+    despachante = asyncio.run(_executar(stub, [('c1', Status.MAJOR_OUTAGE)], esperados=2, limite=0.5))
+    assert len(stub.recebidos) == 1
+    assert despachante.pendentes == 0
+
+
+def test_status_desconhecido_nao_e_enviado():
+    stub = _Stub([])
+    asyncio.run(_executar(stub, [('c1', Status.UNKNOWN)], esperados=1, limite=0.3))
+    assert stub.recebidos == []